@@ -1,31 +1,70 @@
+import os
+import time
+import asyncio
 import logging
+from dotenv import load_dotenv
+load_dotenv() # Before the app modules below read their settings from the environment
+
 from fastapi import FastAPI, Request
 from fastapi.staticfiles import StaticFiles
 from fastapi.templating import Jinja2Templates
 from fastapi.responses import HTMLResponse
 
-from app.routes import home, assistant
-from app.services.groq_client import logger as groq_logger # Import logger for config check
+from app.routes import home, assistant, batch, search, metrics
+from app.utils.pdf_parser import load_pdf_backend, shutdown_extraction_pool
+from app.services.ingestion import ingestion_queue
+from app.services.metrics import MetricsMiddleware
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# Load the LLM clients, chat graph and PDF backend in the background once the
+# server is up, so workers pass /health immediately and the first chat request
+# does not pay for them (override via environment)
+WARM_UP_ON_STARTUP = os.getenv("WARM_UP_ON_STARTUP", "true").lower() in ("1", "true", "yes")
+
+def warm_up() -> None:
+    """Performs the initialization deferred from import time. Blocking; run it in a thread."""
+    started = time.perf_counter()
+    try:
+        load_pdf_backend()
+        from app.services import langgraph_flow
+        langgraph_flow.get_app_graph()
+        langgraph_flow.get_chat_llm()
+    except Exception as e:
+        logger.error(f"Warm-up failed; components will initialize on first use: {e}", exc_info=True)
+        return
+    logger.info(f"Warm-up finished in {time.perf_counter() - started:.2f}s")
+
 app = FastAPI(title="LegalMind AI Assistant")
 
+# Per-route request latency, exported with the other metrics at /metrics
+app.add_middleware(MetricsMiddleware)
+
 # Mount static files (CSS, JS)
 app.mount("/static", StaticFiles(directory="app/static"), name="static")
 
 # Include routers
 app.include_router(home.router, tags=["Homepage & Upload"])
-app.include_router(assistant.router, prefix="/assistant", tags=["AI Assistant"]) # Add prefix here
+app.include_router(assistant.router, tags=["AI Assistant"]) # Routes already carry the /assistant prefix
+app.include_router(batch.router, tags=["Batch Analysis"])
+app.include_router(search.router, tags=["Search"])
+app.include_router(metrics.router, tags=["System"])
 
 @app.on_event("startup")
 async def startup_event():
     logger.info("LegalMind application starting up...")
-    if not groq_logger.handlers: # Check if groq_client logged its API key status
-         pass # Already handled in groq_client import
+    ingestion_queue.start() # Background workers for document extraction/indexing
+    if WARM_UP_ON_STARTUP:
+        app.state.warm_up = asyncio.create_task(asyncio.to_thread(warm_up))
     # Add any other startup logic here (e.g., DB connections)
 
+@app.on_event("shutdown")
+async def shutdown_event():
+    logger.info("LegalMind application shutting down...")
+    await ingestion_queue.stop()
+    shutdown_extraction_pool()
+
 @app.get("/health", tags=["System"])
 async def health_check():
     """Basic health check endpoint."""
@@ -1,11 +1,13 @@
 # app/routes/assistant.py
+import json
+import asyncio
 import logging
 from fastapi import APIRouter, Request, Form, HTTPException, Path as FastApiPath
-from fastapi.responses import HTMLResponse, JSONResponse
+from fastapi.responses import HTMLResponse, JSONResponse, StreamingResponse
 from fastapi.templating import Jinja2Templates
 
-from app.services.langgraph_flow import run_chat_flow, run_contract_flow
-from app.routes.home import document_store # Import the in-memory store
+from app.routes.home import document_store # Shared bounded document store
+from app.services.ingestion import ingestion_queue
 
 router = APIRouter()
 templates = Jinja2Templates(directory="app/templates")
@@ -13,29 +15,49 @@ templates = Jinja2Templates(directory="app/templates")
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# LangGraph and the LLM stack are imported on first use (normally by the startup
+# warm-up) so that workers boot and answer /health without loading them
+
+async def run_chat_flow(*args, **kwargs):
+    from app.services import langgraph_flow
+    return await langgraph_flow.run_chat_flow(*args, **kwargs)
+
+async def run_contract_flow(*args, **kwargs):
+    from app.services import langgraph_flow
+    return await langgraph_flow.run_contract_flow(*args, **kwargs)
+
+async def stream_chat_flow(*args, **kwargs):
+    from app.services import langgraph_flow
+    async for event in langgraph_flow.stream_chat_flow(*args, **kwargs):
+        yield event
+
 @router.get("/assistant/{session_id}", response_class=HTMLResponse)
 async def chat_page(request: Request, session_id: str = FastApiPath(...)):
     """Serves the chat interface page for a specific session."""
     # Check if the session exists (i.e., if a document was uploaded for it)
-    doc_context = document_store.get(session_id)
-    has_document = doc_context is not None # Check if key exists
-    logger.info(f"Serving chat page for session {session_id}. Document context present: {has_document}")
+    # Membership check avoids loading spilled text; the store queries SQLite, so keep it off the event loop
+    has_document = await asyncio.to_thread(document_store.__contains__, session_id)
+    status = await ingestion_queue.status(session_id) # The upload may be ingested by another worker
+    document_processing = status is not None and status["status"] not in ("done", "failed")
+    logger.info(f"Serving chat page for session {session_id}. Document context present: {has_document}, processing: {document_processing}")
     return templates.TemplateResponse("chat.html", {
         "request": request,
         "session_id": session_id,
         "has_document": has_document,
-        "initial_message": "Hello! How can I help you today? Ask a question about your uploaded document or general legal topics, or request a contract generation." if has_document else "Hello! How can I help you today? Ask general legal questions or request a contract generation."
+        "document_processing": document_processing,
+        "initial_message": "Hello! How can I help you today? Ask a question about your uploaded document or general legal topics, or request a contract generation." if has_document or document_processing else "Hello! How can I help you today? Ask general legal questions or request a contract generation."
     })
 
 @router.post("/assistant/chat/{session_id}")
 async def handle_chat(
     request: Request,
     session_id: str = FastApiPath(...),
-    user_input: str = Form(...)
+    user_input: str = Form(...),
+    bypass_cache: bool = Form(False)
 ):
-    """Handles incoming chat messages via LangGraph flow."""
+    """Handles incoming chat messages via LangGraph flow. Set bypass_cache to force a fresh LLM answer."""
     logger.info(f"Received chat input for session {session_id}: '{user_input[:50]}...'")
-    doc_context = document_store.get(session_id) # Retrieve context if available
+    document_key = await asyncio.to_thread(document_store.document_key, session_id) # The flow loads the text by this key
 
     if user_input.lower().startswith("generate contract:"):
          # Handle contract generation requests initiated via chat
@@ -48,7 +70,7 @@ async def handle_chat(
              details = parts[2].strip()
              logger.info(f"Contract generation request detected: Type='{contract_type}', Details='{details[:50]}...'")
 
-             response = await run_contract_flow(contract_type, details, session_id)
+             response = await run_contract_flow(contract_type, details, session_id, bypass_cache=bypass_cache)
              return JSONResponse({"response": response})
 
          except Exception as e:
@@ -57,25 +79,65 @@ async def handle_chat(
     else:
         # Handle general chat or document Q&A
         try:
-            response = await run_chat_flow(user_input, session_id, doc_context)
+            response = await run_chat_flow(user_input, session_id, document_key, bypass_cache=bypass_cache)
             logger.info(f"LangGraph chat response generated for session {session_id}")
             return JSONResponse({"response": response})
         except Exception as e:
             logger.error(f"Error running LangGraph chat flow: {e}", exc_info=True)
             raise HTTPException(status_code=500, detail="Error processing chat message.")
 
+@router.post("/assistant/chat/{session_id}/stream")
+async def handle_chat_stream(
+    request: Request,
+    session_id: str = FastApiPath(...),
+    user_input: str = Form(...),
+    bypass_cache: bool = Form(False)
+):
+    """
+    Streams the chat response as newline-delimited JSON.
+
+    Each line is a {"type": "token", "content": ...} event while the LLM is generating,
+    followed by a single {"type": "done", "response": ...} (or {"type": "error", ...}) event.
+    Contract generation commands are not streamed; they arrive as a single "done" event.
+    """
+    logger.info(f"Received streaming chat input for session {session_id}: '{user_input[:50]}...'")
+
+    if user_input.lower().startswith("generate contract:"):
+        # Reuse the blocking handler and wrap its reply in the stream protocol
+        reply = await handle_chat(request, session_id=session_id, user_input=user_input, bypass_cache=bypass_cache)
+        response_text = json.loads(reply.body)["response"]
+
+        async def contract_events():
+            yield json.dumps({"type": "done", "response": response_text}) + "\n"
+
+        return StreamingResponse(contract_events(), media_type="application/x-ndjson")
+
+    document_key = await asyncio.to_thread(document_store.document_key, session_id)
+
+    async def chat_events():
+        try:
+            async for event in stream_chat_flow(user_input, session_id, document_key, bypass_cache=bypass_cache):
+                yield json.dumps(event) + "\n"
+            logger.info(f"LangGraph streamed chat response completed for session {session_id}")
+        except Exception as e:
+            logger.error(f"Error streaming LangGraph chat flow: {e}", exc_info=True)
+            yield json.dumps({"type": "error", "detail": "Error processing chat message."}) + "\n"
+
+    return StreamingResponse(chat_events(), media_type="application/x-ndjson")
+
 # Optional: Add a specific endpoint for contract generation if preferred over chat command
 @router.post("/assistant/generate/{session_id}")
 async def handle_generate_contract(
     request: Request,
     session_id: str = FastApiPath(...),
     contract_type: str = Form(...),
-    details: str = Form(...)
+    details: str = Form(...),
+    bypass_cache: bool = Form(False)
 ):
     """Handles contract generation requests."""
     logger.info(f"Received contract generation request for session {session_id}: Type='{contract_type}', Details='{details[:50]}...'")
     try:
-        response = await run_contract_flow(contract_type, details, session_id)
+        response = await run_contract_flow(contract_type, details, session_id, bypass_cache=bypass_cache)
         logger.info(f"LangGraph contract response generated for session {session_id}")
         # Could return JSON or perhaps trigger a file download later
         return JSONResponse({"response": response, "contract_type": contract_type})
@@ -0,0 +1,167 @@
+# app/routes/batch.py
+import json
+import hashlib
+import logging
+import secrets
+from pathlib import Path
+from typing import AsyncIterator, List, Optional, Tuple
+import aiofiles
+from fastapi import APIRouter, Request, HTTPException
+from fastapi.responses import StreamingResponse
+
+from app.routes.home import MAX_UPLOAD_BYTES, UPLOAD_DIR
+from app.services.batch_analysis import BATCH_MAX_BYTES, BATCH_MAX_DOCUMENTS, BATCH_MAX_QUESTIONS, analyze_batch
+from app.services.ingestion import IngestionJob
+from app.utils.form_stream import FormStreamError, iter_form_parts
+
+router = APIRouter()
+
+# Form fields (questions, flags) are small; a longer one is rejected rather than buffered
+BATCH_MAX_FIELD_BYTES = 64 * 1024
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+class BatchUploadReader:
+    """
+    Reads a batch request body part by part.
+
+    The form fields are read first. Files are then saved one at a time as the
+    batch asks for them, i.e. when an extraction slot is free, so documents are
+    extracted while later ones are still arriving and only the files waiting
+    for extraction are on disk.
+    """
+
+    def __init__(self, request: Request):
+        self.received = 0
+        self._events = iter_form_parts(request.headers.get("content-type", ""), self._count(request.stream()))
+        self._next_part: Optional[Tuple[str, Optional[str]]] = None
+
+    async def _count(self, stream: AsyncIterator[bytes]) -> AsyncIterator[bytes]:
+        async for chunk in stream:
+            self.received += len(chunk)
+            yield chunk
+
+    async def _part_data(self) -> AsyncIterator[bytes]:
+        async for kind, payload in self._events:
+            if kind == "end":
+                return
+            yield payload
+
+    async def _advance(self) -> Optional[Tuple[str, Optional[str]]]:
+        """Skips to the next part's headers; None at the end of the body."""
+        async for kind, payload in self._events:
+            if kind == "part":
+                return payload
+        return None
+
+    async def read_fields(self) -> List[Tuple[str, str]]:
+        """Reads the form fields sent before the first file."""
+        fields = []
+        while (part := await self._advance()) is not None:
+            name, filename = part
+            if filename is not None:
+                self._next_part = part
+                break
+            value = bytearray()
+            async for data in self._part_data():
+                value += data
+                if len(value) > BATCH_MAX_FIELD_BYTES:
+                    raise HTTPException(status_code=400, detail=f"Form field '{name}' is too long")
+            fields.append((name, value.decode("utf-8", "replace")))
+            if self.received > BATCH_MAX_BYTES:
+                raise HTTPException(status_code=413, detail=_too_large_detail())
+        return fields
+
+    async def files(self) -> AsyncIterator[IngestionJob]:
+        """Saves and yields each uploaded file in turn; limit violations end the batch with a failed document."""
+        count = 0
+        part, self._next_part = self._next_part, None
+        while part is not None:
+            name, filename = part
+            if filename is None:
+                logger.warning(f"Ignoring batch form field '{name}' sent after the files")
+                async for _ in self._part_data():
+                    pass
+                part = await self._advance()
+                continue
+
+            count += 1
+            session_id = secrets.token_hex(16)
+            filename = filename or "unnamed"
+            job = IngestionJob(session_id=session_id, filename=filename, file_path=UPLOAD_DIR / f"{session_id}_{Path(filename).name}", sha256="")
+            if count > BATCH_MAX_DOCUMENTS:
+                job.status, job.error = "failed", f"At most {BATCH_MAX_DOCUMENTS} documents are allowed per batch"
+                yield job
+                return
+            try:
+                job.sha256 = await self._save(job.file_path)
+            except HTTPException as e:
+                job.status, job.error = "failed", e.detail
+            except (FormStreamError, OSError) as e:
+                logger.error(f"Error saving batch upload {filename}: {e}", exc_info=True)
+                job.status, job.error = "failed", "Failed to save file"
+            finally:
+                if not job.sha256: # Failed or interrupted: drop the partial file
+                    job.file_path.unlink(missing_ok=True)
+            yield job
+            if self.received > BATCH_MAX_BYTES:
+                return # The failed document above carries the reason
+            part = await self._advance()
+
+    async def _save(self, destination: Path) -> str:
+        """Streams the current file part to disk, like save_upload in home; returns its SHA-256."""
+        digest = hashlib.sha256()
+        size = 0
+        destination.parent.mkdir(parents=True, exist_ok=True)
+        async with aiofiles.open(destination, "wb") as out_file:
+            async for chunk in self._part_data():
+                size += len(chunk)
+                if self.received > BATCH_MAX_BYTES:
+                    raise HTTPException(status_code=413, detail=_too_large_detail())
+                if size > MAX_UPLOAD_BYTES:
+                    continue # Read past the rest of the file so the next part can be parsed
+                digest.update(chunk)
+                await out_file.write(chunk)
+        if size > MAX_UPLOAD_BYTES:
+            raise HTTPException(status_code=413, detail=f"File exceeds the {MAX_UPLOAD_BYTES // (1024 * 1024)} MB upload limit")
+        return digest.hexdigest()
+
+def _too_large_detail() -> str:
+    return f"Batch exceeds the {BATCH_MAX_BYTES // (1024 * 1024)} MB request limit"
+
+@router.post("/batch/analyze")
+async def handle_batch_analysis(request: Request):
+    """
+    Answers the same questions about many documents, streaming results as newline-delimited JSON.
+
+    The multipart form carries `questions` fields (and optionally `bypass_cache`)
+    followed by `files`. Each file is ingested as soon as it has been read. Each
+    line is a {"type": "document", ...} event carrying the document's ingestion
+    status, its session_id and its answers, in the order documents finish,
+    followed by a single {"type": "done", ...} summary. A document that cannot be
+    saved or extracted is reported as failed without stopping the batch; a file
+    past BATCH_MAX_DOCUMENTS or BATCH_MAX_BYTES is reported as failed and ends it.
+    """
+    content_length = request.headers.get("content-length")
+    if content_length and content_length.isdigit() and int(content_length) > BATCH_MAX_BYTES:
+        raise HTTPException(status_code=413, detail=_too_large_detail())
+
+    reader = BatchUploadReader(request)
+    try:
+        fields = await reader.read_fields()
+    except FormStreamError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    questions = [value.strip() for name, value in fields if name == "questions" and value.strip()]
+    bypass_cache = any(name == "bypass_cache" and value.strip().lower() in ("1", "true", "on", "yes") for name, value in fields)
+    if not questions:
+        raise HTTPException(status_code=400, detail="At least one question is required, sent before the files")
+    if len(questions) > BATCH_MAX_QUESTIONS:
+        raise HTTPException(status_code=400, detail=f"At most {BATCH_MAX_QUESTIONS} questions are allowed per batch")
+    logger.info(f"Starting batch analysis with {len(questions)} questions")
+
+    async def batch_events():
+        async for event in analyze_batch(reader.files(), questions, bypass_cache=bypass_cache):
+            yield json.dumps(event) + "\n"
+
+    return StreamingResponse(batch_events(), media_type="application/x-ndjson")
@@ -1,4 +1,7 @@
 # app/routes/home.py
+import os
+import asyncio
+import hashlib
 import logging
 import secrets
 import shutil
@@ -8,15 +11,17 @@ from fastapi.responses import HTMLResponse, RedirectResponse
 from fastapi.templating import Jinja2Templates
 import aiofiles
 
-from app.utils.pdf_parser import extract_text
+from app.services.search_index import corpus_index
+from app.services.ingestion import IngestionJob, IngestionQueueFull, ingestion_queue
+from app.services.document_store import document_store # Shared bounded document store
 
 router = APIRouter()
 templates = Jinja2Templates(directory="app/templates")
 
-# Simple in-memory storage for document context (replace with DB/Cache in production)
-document_store: dict[str, str] = {}
-UPLOAD_DIR = Path("temp_uploads")
-UPLOAD_DIR.mkdir(exist_ok=True)
+UPLOAD_DIR = Path("temp_uploads") # Created by the first upload
+# Uploads are streamed to disk in chunks of this size; larger files are rejected
+UPLOAD_CHUNK_SIZE = int(os.getenv("UPLOAD_CHUNK_SIZE", str(1024 * 1024)))
+MAX_UPLOAD_BYTES = int(os.getenv("MAX_UPLOAD_BYTES", str(50 * 1024 * 1024)))
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
@@ -31,6 +36,31 @@ async def upload_form(request: Request):
     """Serves the file upload page."""
     return templates.TemplateResponse("upload.html", {"request": request})
 
+async def save_upload(file: UploadFile, destination: Path) -> tuple[int, str]:
+    """
+    Streams an upload to disk in fixed-size chunks, hashing it on the way.
+
+    Peak memory is one chunk regardless of file size. Raises a 413
+    HTTPException (and removes the partial file) if MAX_UPLOAD_BYTES is exceeded.
+
+    Returns:
+        The size in bytes and the hex SHA-256 digest of the content.
+    """
+    digest = hashlib.sha256()
+    size = 0
+    destination.parent.mkdir(parents=True, exist_ok=True)
+    async with aiofiles.open(destination, 'wb') as out_file:
+        while chunk := await file.read(UPLOAD_CHUNK_SIZE):
+            size += len(chunk)
+            if size > MAX_UPLOAD_BYTES:
+                break
+            digest.update(chunk)
+            await out_file.write(chunk)
+    if size > MAX_UPLOAD_BYTES:
+        destination.unlink(missing_ok=True)
+        raise HTTPException(status_code=413, detail=f"File exceeds the {MAX_UPLOAD_BYTES // (1024 * 1024)} MB upload limit")
+    return size, digest.hexdigest()
+
 @router.post("/upload")
 async def handle_upload(
     request: Request,
@@ -44,36 +74,22 @@ async def handle_upload(
     session_id = secrets.token_hex(16)
     logger.info(f"Handling upload for file: {file.filename}, session: {session_id}")
 
-    # Save file temporarily (optional, could process in memory)
-    temp_file_path = UPLOAD_DIR / f"{session_id}_{file.filename}"
-    file_content = b""
+    # Stream the file to disk; extraction reads it from there rather than from a bytes copy
+    temp_file_path = UPLOAD_DIR / f"{session_id}_{Path(file.filename).name}"
     try:
-        async with aiofiles.open(temp_file_path, 'wb') as out_file:
-            content = await file.read() # Read content
-            file_content = content
-            await out_file.write(content)
-        logger.info(f"File saved temporarily to {temp_file_path}")
-
-        # Extract text based on file type
-        extracted_content = await extract_text(file.filename, file_content)
-
-        if not extracted_content:
-            logger.warning(f"Could not extract text from {file.filename} or unsupported type.")
-            # Optionally delete temp file if text extraction failed
-            temp_file_path.unlink(missing_ok=True)
-            # Redirect back to upload with error? Or proceed without context?
-            # Let's proceed but store empty context.
-            document_store[session_id] = "" # Store empty context
-            # Maybe raise an HTTP exception instead?
-            # raise HTTPException(status_code=400, detail="Could not extract text from file or unsupported file type.")
-
-        else:
-            logger.info(f"Extracted {len(extracted_content)} characters from {file.filename}.")
-            # Store extracted text associated with the session ID
-            document_store[session_id] = extracted_content
-            # Clean up the temporary file after processing
-            # temp_file_path.unlink(missing_ok=True) # Keep file for potential debugging? Or delete.
+        size, sha256 = await save_upload(file, temp_file_path)
+        logger.info(f"File saved temporarily to {temp_file_path} ({size} bytes, sha256 {sha256[:12]})")
+
+        # Extraction and indexing happen in the background; the chat page polls for progress
+        job = IngestionJob(session_id=session_id, filename=file.filename, file_path=temp_file_path, sha256=sha256)
+        await ingestion_queue.submit(job)
 
+    except HTTPException:
+        raise
+    except IngestionQueueFull:
+        temp_file_path.unlink(missing_ok=True)
+        logger.warning(f"Ingestion queue full, rejecting upload of {file.filename}")
+        raise HTTPException(status_code=503, detail="Too many documents are being processed. Please try again shortly.", headers={"Retry-After": "10"})
     except Exception as e:
         logger.error(f"Error processing upload for {file.filename}: {e}", exc_info=True)
         temp_file_path.unlink(missing_ok=True) # Ensure cleanup on error
@@ -87,3 +103,26 @@ async def handle_upload(
     redirect_url = request.url_for("chat_page", session_id=session_id)
     logger.info(f"Redirecting to chat page: {redirect_url}")
     return RedirectResponse(url=redirect_url, status_code=303) # Use 303 See Other for POST->GET redirect
+
+@router.get("/upload/status/{session_id}")
+async def upload_status(session_id: str):
+    """Reports ingestion progress for an uploaded document."""
+    status = await ingestion_queue.status(session_id)
+    if status is None:
+        if await asyncio.to_thread(document_store.__contains__, session_id):
+            return {"session_id": session_id, "status": "done"}
+        raise HTTPException(status_code=404, detail="No upload found for this session")
+    return status
+
+@router.delete("/documents/{session_id}")
+async def delete_document(session_id: str):
+    """Removes an uploaded document from the session stores and the corpus index."""
+    in_session = await asyncio.to_thread(document_store.pop, session_id, None) is not None
+    in_corpus = await asyncio.to_thread(corpus_index.delete_document, session_id)
+    for temp_file in UPLOAD_DIR.glob(f"{session_id}_*"):
+        temp_file.unlink(missing_ok=True)
+
+    if not (in_session or in_corpus):
+        raise HTTPException(status_code=404, detail="Document not found")
+    logger.info(f"Deleted document for session {session_id}")
+    return {"deleted": session_id}
@@ -0,0 +1,110 @@
+# app/routes/metrics.py
+import os
+import sys
+import asyncio
+from typing import Dict, Iterable
+
+from fastapi import APIRouter
+from fastapi.responses import Response
+from prometheus_client.core import CounterMetricFamily, GaugeMetricFamily, Metric
+from prometheus_client.registry import Collector
+
+from app.services import metrics
+from app.services.document_store import document_store
+from app.services.extraction_cache import extraction_cache
+from app.services.ingestion import ingestion_queue
+
+router = APIRouter()
+
+def _loaded(module: str, name: str):
+    """A shared instance from an app.services module some request already imported, else None.
+
+    A scrape must not import the LLM stack into a worker that has not needed it yet;
+    until then the services it would report on have done nothing.
+    """
+    return getattr(sys.modules.get(f"app.services.{module}"), name, None) # None while still importing, too
+
+def loop_stats() -> Dict[str, float]:
+    """Reads the state owned by the event loop; must run on it, not in the render thread."""
+    scheduler, breaker, flights = _loaded("llm_scheduler", "llm_scheduler"), _loaded("resilience", "llm_breaker"), _loaded("single_flight", "llm_flights")
+    scheduler_stats = scheduler.stats() if scheduler else {"active": 0, "queued": 0}
+    return {
+        "llm_active": scheduler_stats["active"],
+        "llm_queued": scheduler_stats["queued"],
+        "llm_coalesced": flights.stats()["coalesced"] if flights else 0,
+        "circuit_open": 1 if breaker and breaker.state == "open" else 0,
+        "ingestion_queued": ingestion_queue.queued(),
+    }
+
+class ServiceStatsCollector(Collector):
+    """Gauges and totals copied from the services' own counters at scrape time.
+
+    These describe the worker answering the scrape; in multiprocess mode they carry its pid.
+    """
+
+    def __init__(self, loop_stats: Dict[str, float]):
+        self.loop_stats = loop_stats
+        self.pid = {"pid": str(os.getpid())} if metrics.MULTIPROC_DIR else {}
+
+    def _family(self, kind, name: str, documentation: str, labels: Iterable[str] = ()) -> Metric:
+        return kind(name, documentation, labels=[*self.pid, *labels])
+
+    def _add(self, family: Metric, value: float, *labels: str) -> None:
+        family.add_metric([*self.pid.values(), *labels], value)
+
+    def collect(self) -> Iterable[Metric]:
+        checkpoints, response_cache, token_usage = _loaded("langgraph_flow", "memory"), _loaded("llm_cache", "response_cache"), _loaded("token_usage", "token_usage")
+
+        hits = self._family(CounterMetricFamily, "legalmind_cache_hits", "Cache hits.", ("cache",))
+        misses = self._family(CounterMetricFamily, "legalmind_cache_misses", "Cache misses.", ("cache",))
+        ratio = self._family(GaugeMetricFamily, "legalmind_cache_hit_ratio", "Hits / (hits + misses) since start.", ("cache",))
+
+        def record_cache(name: str, hit_count: int, miss_count: int) -> None:
+            self._add(hits, hit_count, name)
+            self._add(misses, miss_count, name)
+            self._add(ratio, hit_count / (hit_count + miss_count) if hit_count + miss_count else 0.0, name)
+
+        if response_cache is not None:
+            llm_stats = response_cache.stats()
+            record_cache("llm_response", llm_stats["hits"], llm_stats["misses"])
+        extraction_stats = extraction_cache.stats()
+        record_cache("extraction", extraction_stats["hits"], extraction_stats["misses"])
+        store_stats = document_store.stats()
+        record_cache("document_store", store_stats["hits"] + store_stats["disk_loads"], store_stats["misses"])
+        if checkpoints is not None: # Created with the graph on first use
+            checkpoint_stats = checkpoints.stats()
+            record_cache("checkpoint", checkpoint_stats["cache_hits"], checkpoint_stats["cache_misses"])
+        yield from (hits, misses, ratio)
+
+        resident = self._family(GaugeMetricFamily, "legalmind_document_store_resident_bytes", "Bytes of document text held in memory.")
+        self._add(resident, store_stats["resident_bytes"])
+        documents = self._family(GaugeMetricFamily, "legalmind_document_store_documents", "Documents in the store.", ("location",))
+        self._add(documents, store_stats["resident_documents"], "memory")
+        self._add(documents, store_stats["spilled_documents"], "disk")
+        yield from (resident, documents)
+
+        for kind, name, documentation, key in (
+            (GaugeMetricFamily, "legalmind_llm_active_calls", "Upstream LLM calls currently running.", "llm_active"),
+            (GaugeMetricFamily, "legalmind_llm_queued_calls", "LLM calls waiting for the rate-limit scheduler.", "llm_queued"),
+            (CounterMetricFamily, "legalmind_llm_coalesced", "LLM requests served by an identical in-flight call.", "llm_coalesced"),
+            (GaugeMetricFamily, "legalmind_llm_circuit_open", "1 while the upstream circuit breaker is open.", "circuit_open"),
+            (GaugeMetricFamily, "legalmind_ingestion_queued_jobs", "Uploads waiting for an ingestion worker.", "ingestion_queued"),
+        ):
+            family = self._family(kind, name, documentation)
+            self._add(family, self.loop_stats[key])
+            yield family
+
+        tokens = self._family(CounterMetricFamily, "legalmind_llm_tokens", "Tokens sent to and received from the LLM.", ("endpoint", "kind"))
+        for endpoint, usage in (token_usage.stats()["endpoints"] if token_usage else {}).items():
+            self._add(tokens, usage["prompt_tokens"], endpoint, "prompt")
+            self._add(tokens, usage["completion_tokens"], endpoint, "completion")
+        yield tokens
+
+@router.get("/metrics", include_in_schema=False)
+async def prometheus_metrics():
+    """Prometheus scrape endpoint."""
+    # Scheduler and single-flight state belong to the event loop; the rest reads SQLite
+    # (checkpoint stats) and the multiprocess sample files, so it is rendered off the loop
+    collector = ServiceStatsCollector(loop_stats())
+    body = await asyncio.to_thread(metrics.render, collector)
+    return Response(content=body, media_type=metrics.CONTENT_TYPE)
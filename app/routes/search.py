@@ -0,0 +1,25 @@
+# app/routes/search.py
+import asyncio
+import logging
+import time
+from fastapi import APIRouter, Query
+from fastapi.responses import JSONResponse
+
+from app.services.search_index import corpus_index
+
+router = APIRouter()
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+@router.get("/search")
+async def search_documents(
+    q: str = Query(..., min_length=1, description='Search terms, or a "quoted phrase" for an exact match'),
+    limit: int = Query(10, ge=1, le=100)
+):
+    """Searches passages across every uploaded document."""
+    started = time.perf_counter()
+    results = await asyncio.to_thread(corpus_index.search, q, limit)
+    took_ms = (time.perf_counter() - started) * 1000
+    logger.info(f"Corpus search for '{q[:50]}' returned {len(results)} passages in {took_ms:.1f} ms")
+    return JSONResponse({"query": q, "results": results, "took_ms": round(took_ms, 2)})
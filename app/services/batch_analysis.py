@@ -0,0 +1,137 @@
+# app/services/batch_analysis.py
+import os
+import time
+import asyncio
+import logging
+from typing import Any, AsyncIterable, AsyncIterator, Dict, Iterable, List, Optional, Sequence, Union
+
+from app.services.ingestion import IngestionJob, ingest_document
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Batch analysis settings (override via environment)
+BATCH_MAX_DOCUMENTS = int(os.getenv("BATCH_MAX_DOCUMENTS", "500"))
+BATCH_MAX_QUESTIONS = int(os.getenv("BATCH_MAX_QUESTIONS", "20"))
+# Upper bound on a batch request's body, checked against Content-Length and while it is read
+BATCH_MAX_BYTES = int(os.getenv("BATCH_MAX_BYTES", str(500 * 1024 * 1024)))
+# Documents extracted at once; PDF pages are parsed in the shared process pool either way
+BATCH_EXTRACTION_CONCURRENCY = int(os.getenv("BATCH_EXTRACTION_CONCURRENCY", "4"))
+# LLM calls in flight per batch; the shared scheduler still applies the account rate limits
+BATCH_LLM_CONCURRENCY = int(os.getenv("BATCH_LLM_CONCURRENCY", "8"))
+
+async def _answer(question: str, text: str, job: IngestionJob, llm_slots: asyncio.Semaphore, bypass_cache: bool) -> Dict[str, Any]:
+    from app.services import langgraph_flow # Loaded on first use, like the chat routes
+    async with llm_slots:
+        try:
+            answer = await langgraph_flow.answer_document_question(question, text, job.session_id, job.sha256, bypass_cache=bypass_cache)
+            return {"question": question, "answer": answer}
+        except Exception as e:
+            logger.error(f"Error answering '{question[:50]}' for {job.filename}: {e}", exc_info=True)
+            return {"question": question, "error": "Failed to answer this question"}
+
+async def _analyze_document(
+    job: IngestionJob,
+    questions: Sequence[str],
+    extraction_slot: asyncio.Semaphore,
+    llm_slots: asyncio.Semaphore,
+    bypass_cache: bool,
+) -> Dict[str, Any]:
+    """Ingests one document, then answers every question about it. Releases the extraction slot taken for it."""
+    text = None
+    try:
+        if not job.finished: # Uploads rejected while reading the request arrive already failed
+            try:
+                text = await ingest_document(job, with_digest=False) # Batch questions do not use the digest
+            except Exception as e:
+                logger.error(f"Error ingesting {job.filename} for batch: {e}", exc_info=True)
+                job.status, job.error = "failed", "Failed to process file"
+            finally:
+                job.finished_at = time.time()
+    finally:
+        extraction_slot.release()
+
+    result = {"type": "document", **job.to_dict(), "answers": []}
+    if text:
+        result["answers"] = list(await asyncio.gather(*(_answer(q, text, job, llm_slots, bypass_cache) for q in questions)))
+    return result
+
+async def _iterate(jobs: Union[Iterable[IngestionJob], AsyncIterable[IngestionJob]]) -> AsyncIterator[IngestionJob]:
+    if isinstance(jobs, AsyncIterable):
+        async for job in jobs:
+            yield job
+    else:
+        for job in jobs:
+            yield job
+
+async def analyze_batch(
+    jobs: Union[Iterable[IngestionJob], AsyncIterable[IngestionJob]],
+    questions: Sequence[str],
+    *,
+    extraction_concurrency: int = BATCH_EXTRACTION_CONCURRENCY,
+    llm_concurrency: int = BATCH_LLM_CONCURRENCY,
+    bypass_cache: bool = False,
+) -> AsyncIterator[Dict[str, Any]]:
+    """
+    Extracts a set of documents and answers the same questions about each one.
+
+    `jobs` may be an async iterable that produces documents as they are
+    uploaded: the next one is only requested once an extraction slot is free,
+    so a slow extraction holds back reading the request instead of piling
+    files up on disk. Yields one {"type": "document", ...} event per document
+    as soon as its answers are ready, in completion order, followed by a single
+    {"type": "done", ...} summary. Each document is ingested into its own
+    session, so it can be opened in the chat afterwards. Stopping the
+    iteration early (e.g. the client disconnected) cancels the remaining work.
+    """
+    started = time.perf_counter()
+    extraction_slots = asyncio.Semaphore(max(1, extraction_concurrency))
+    llm_slots = asyncio.Semaphore(max(1, llm_concurrency))
+    tasks: List[asyncio.Task] = []
+    scheduled: List[IngestionJob] = []
+    results: "asyncio.Queue[Optional[Dict[str, Any]]]" = asyncio.Queue()
+
+    async def analyze(job: IngestionJob) -> None:
+        await results.put(await _analyze_document(job, questions, extraction_slots, llm_slots, bypass_cache))
+
+    async def schedule() -> None:
+        try:
+            source = _iterate(jobs)
+            while True:
+                await extraction_slots.acquire()
+                try:
+                    job = await source.__anext__()
+                except BaseException:
+                    extraction_slots.release()
+                    raise
+                scheduled.append(job)
+                tasks.append(asyncio.create_task(analyze(job)))
+        except StopAsyncIteration:
+            pass
+        finally:
+            await results.put(None) # No more documents are coming
+
+    producer = asyncio.create_task(schedule())
+    failed = 0
+    reported = 0
+    reading = True
+    try:
+        while reading or reported < len(tasks):
+            result = await results.get()
+            if result is None:
+                reading = False
+                await producer # Re-raises an error reading the documents, e.g. a client disconnect
+                continue
+            reported += 1
+            failed += result["status"] != "done"
+            yield result
+    finally:
+        producer.cancel()
+        for task in tasks:
+            task.cancel()
+        for job in scheduled: # Uploads of documents cancelled before their extraction started
+            job.file_path.unlink(missing_ok=True)
+
+    elapsed = time.perf_counter() - started
+    logger.info(f"Analyzed {reported} documents x {len(questions)} questions in {elapsed:.2f}s ({failed} failed)")
+    yield {"type": "done", "documents": reported, "failed": failed, "elapsed_s": round(elapsed, 3)}
@@ -0,0 +1,457 @@
+# app/services/checkpoint_store.py
+import os
+import time
+import asyncio
+import sqlite3
+import logging
+import threading
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, AsyncIterator, Dict, Iterator, Optional, Sequence, Tuple
+
+from langchain_core.runnables import RunnableConfig
+from langgraph.checkpoint.base import (
+    WRITES_IDX_MAP,
+    BaseCheckpointSaver,
+    ChannelVersions,
+    Checkpoint,
+    CheckpointMetadata,
+    CheckpointTuple,
+    get_checkpoint_id,
+    get_checkpoint_metadata,
+    writes_sort_key,
+)
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Checkpoint store settings (override via environment)
+CHECKPOINT_DB_PATH = Path(os.getenv("CHECKPOINT_DB_PATH", "data/checkpoints.sqlite3"))
+CHECKPOINT_TTL_SECONDS = float(os.getenv("CHECKPOINT_TTL_SECONDS", str(7 * 24 * 3600)))
+CHECKPOINT_KEEP_LATEST = int(os.getenv("CHECKPOINT_KEEP_LATEST", "3"))
+CHECKPOINT_CACHE_MAX_BYTES = int(os.getenv("CHECKPOINT_CACHE_MAX_BYTES", str(32 * 1024 * 1024)))
+# Minimum time between TTL sweeps, which piggyback on checkpoint writes
+CHECKPOINT_SWEEP_INTERVAL_SECONDS = 60.0
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS checkpoints (
+    thread_id TEXT NOT NULL,
+    checkpoint_ns TEXT NOT NULL,
+    checkpoint_id TEXT NOT NULL,
+    parent_checkpoint_id TEXT,
+    checkpoint_type TEXT NOT NULL,
+    checkpoint BLOB NOT NULL,
+    metadata_type TEXT NOT NULL,
+    metadata BLOB NOT NULL,
+    PRIMARY KEY (thread_id, checkpoint_ns, checkpoint_id)
+);
+CREATE TABLE IF NOT EXISTS writes (
+    thread_id TEXT NOT NULL,
+    checkpoint_ns TEXT NOT NULL,
+    checkpoint_id TEXT NOT NULL,
+    task_id TEXT NOT NULL,
+    idx INTEGER NOT NULL,
+    channel TEXT NOT NULL,
+    value_type TEXT NOT NULL,
+    value BLOB NOT NULL,
+    task_path TEXT NOT NULL,
+    PRIMARY KEY (thread_id, checkpoint_ns, checkpoint_id, task_id, idx)
+);
+CREATE TABLE IF NOT EXISTS threads (
+    thread_id TEXT PRIMARY KEY,
+    updated_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS threads_updated_at ON threads (updated_at);
+"""
+
+# (checkpoint_id, parent_id, checkpoint (type, bytes), metadata (type, bytes), writes)
+_Row = Tuple[str, Optional[str], Tuple[str, bytes], Tuple[str, bytes], list]
+
+class _LatestCheckpointCache:
+    """
+    LRU cache of each thread's latest serialized checkpoint, capped by bytes.
+
+    Holding serialized rows keeps the accounting exact and means callers never
+    share mutable checkpoint objects.
+    """
+
+    def __init__(self, max_bytes: int):
+        self.max_bytes = max_bytes
+        self.resident_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self._entries: "OrderedDict[Tuple[str, str], Tuple[_Row, int]]" = OrderedDict()
+        # Entries to recheck against the database before their next use
+        self.unverified: set = set()
+
+    @staticmethod
+    def _size(row: _Row) -> int:
+        return len(row[2][1]) + len(row[3][1]) + sum(len(w[3][1]) for w in row[4])
+
+    def peek(self, key: Tuple[str, str]) -> Optional[_Row]:
+        entry = self._entries.get(key)
+        return entry[0] if entry is not None else None
+
+    def invalidate_all(self) -> None:
+        self.unverified = set(self._entries)
+
+    def get(self, key: Tuple[str, str]) -> Optional[_Row]:
+        entry = self._entries.get(key)
+        if entry is None:
+            self.misses += 1
+            return None
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return entry[0]
+
+    def put(self, key: Tuple[str, str], row: _Row) -> None:
+        self.discard(key)
+        size = self._size(row)
+        if size > self.max_bytes:
+            return
+        self._entries[key] = (row, size)
+        self.resident_bytes += size
+        while self.resident_bytes > self.max_bytes:
+            _, (_, evicted_size) = self._entries.popitem(last=False)
+            self.resident_bytes -= evicted_size
+
+    def discard(self, key: Tuple[str, str]) -> None:
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            self.resident_bytes -= entry[1]
+        self.unverified.discard(key)
+
+    def discard_thread(self, thread_id: str) -> None:
+        for key in [k for k in self._entries if k[0] == thread_id]:
+            self.discard(key)
+
+class SqliteCheckpointSaver(BaseCheckpointSaver):
+    """
+    Durable LangGraph checkpointer backed by a single SQLite file.
+
+    Unlike MemorySaver it keeps memory bounded:
+    - only the latest `keep_latest` checkpoints per thread are retained,
+    - threads idle for longer than `ttl_seconds` are deleted,
+    - the in-process cache of latest checkpoints is capped at `cache_max_bytes`.
+
+    Several worker processes can share one file. Once another process has
+    committed, each cached checkpoint is revalidated against the database
+    before it is served again, so a conversation continues correctly on
+    whichever worker receives the next turn.
+
+    Channel values are stored inline with each checkpoint, so pruning older
+    checkpoints never breaks reconstruction of the ones that remain.
+    """
+
+    def __init__(
+        self,
+        path: Path = CHECKPOINT_DB_PATH,
+        *,
+        ttl_seconds: float = CHECKPOINT_TTL_SECONDS,
+        keep_latest: int = CHECKPOINT_KEEP_LATEST,
+        cache_max_bytes: int = CHECKPOINT_CACHE_MAX_BYTES,
+        serde=None,
+    ):
+        super().__init__(serde=serde)
+        self.path = Path(path)
+        self.ttl_seconds = ttl_seconds
+        self.keep_latest = max(1, keep_latest)
+        self.cache = _LatestCheckpointCache(cache_max_bytes)
+        self._lock = threading.Lock()
+        self._conn: Optional[sqlite3.Connection] = None
+        self._last_sweep = 0.0
+        self._data_version: Optional[int] = None
+
+    # --- Connection handling ---
+
+    def _connection(self) -> sqlite3.Connection:
+        """Opens the database on first use. Callers must hold self._lock."""
+        if self._conn is None:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            conn = sqlite3.connect(self.path, timeout=30, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.executescript(_SCHEMA)
+            self._conn = conn
+            logger.info(f"Opened checkpoint store at {self.path}")
+        return self._conn
+
+    def close(self) -> None:
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+                self._data_version = None
+
+    # --- Helpers ---
+
+    def _cached_latest(self, conn: sqlite3.Connection, thread_id: str, checkpoint_ns: str) -> Optional[_Row]:
+        """The cached latest checkpoint for a thread, unless another process has since changed it."""
+        key = (thread_id, checkpoint_ns)
+        # data_version only changes when a *different* connection commits
+        version = conn.execute("PRAGMA data_version").fetchone()[0]
+        if version != self._data_version:
+            if self._data_version is not None:
+                self.cache.invalidate_all()
+            self._data_version = version
+        row = self.cache.peek(key)
+        if row is not None and key in self.cache.unverified:
+            latest = conn.execute(
+                "SELECT checkpoint_id FROM checkpoints WHERE thread_id = ? AND checkpoint_ns = ? ORDER BY checkpoint_id DESC LIMIT 1",
+                (thread_id, checkpoint_ns),
+            ).fetchone()
+            writes = conn.execute(
+                "SELECT COUNT(*) FROM writes WHERE thread_id = ? AND checkpoint_ns = ? AND checkpoint_id = ?",
+                (thread_id, checkpoint_ns, row[0]),
+            ).fetchone()[0]
+            if latest is None or latest[0] != row[0] or writes != len(row[4]):
+                self.cache.discard(key)
+            else:
+                self.cache.unverified.discard(key)
+        return self.cache.get(key)
+
+    def _load_row(self, conn: sqlite3.Connection, thread_id: str, checkpoint_ns: str, checkpoint_id: Optional[str]) -> Optional[_Row]:
+        if checkpoint_id:
+            found = conn.execute(
+                "SELECT checkpoint_id, parent_checkpoint_id, checkpoint_type, checkpoint, metadata_type, metadata "
+                "FROM checkpoints WHERE thread_id = ? AND checkpoint_ns = ? AND checkpoint_id = ?",
+                (thread_id, checkpoint_ns, checkpoint_id),
+            ).fetchone()
+        else:
+            found = conn.execute(
+                "SELECT checkpoint_id, parent_checkpoint_id, checkpoint_type, checkpoint, metadata_type, metadata "
+                "FROM checkpoints WHERE thread_id = ? AND checkpoint_ns = ? ORDER BY checkpoint_id DESC LIMIT 1",
+                (thread_id, checkpoint_ns),
+            ).fetchone()
+        if found is None:
+            return None
+        cp_id, parent_id, cp_type, cp_blob, md_type, md_blob = found
+        writes = conn.execute(
+            "SELECT task_id, channel, value_type, value, task_path, idx FROM writes "
+            "WHERE thread_id = ? AND checkpoint_ns = ? AND checkpoint_id = ?",
+            (thread_id, checkpoint_ns, cp_id),
+        ).fetchall()
+        writes.sort(key=lambda w: writes_sort_key(w[4], w[0], w[5]))
+        return (cp_id, parent_id, (cp_type, cp_blob), (md_type, md_blob),
+                [(task_id, channel, (v_type, v_blob)) for task_id, channel, v_type, v_blob, _, _ in writes])
+
+    def _to_tuple(self, thread_id: str, checkpoint_ns: str, row: _Row) -> CheckpointTuple:
+        cp_id, parent_id, checkpoint, metadata, writes = row
+        return CheckpointTuple(
+            config={"configurable": {"thread_id": thread_id, "checkpoint_ns": checkpoint_ns, "checkpoint_id": cp_id}},
+            checkpoint=self.serde.loads_typed(checkpoint),
+            metadata=self.serde.loads_typed(metadata),
+            parent_config=(
+                {"configurable": {"thread_id": thread_id, "checkpoint_ns": checkpoint_ns, "checkpoint_id": parent_id}}
+                if parent_id else None
+            ),
+            pending_writes=[(task_id, channel, self.serde.loads_typed(value)) for task_id, channel, value in writes],
+        )
+
+    def _prune(self, conn: sqlite3.Connection, thread_id: str, checkpoint_ns: str) -> None:
+        """Drops all but the newest keep_latest checkpoints (and their writes) for a thread."""
+        stale = conn.execute(
+            "SELECT checkpoint_id FROM checkpoints WHERE thread_id = ? AND checkpoint_ns = ? "
+            "ORDER BY checkpoint_id DESC LIMIT -1 OFFSET ?",
+            (thread_id, checkpoint_ns, self.keep_latest),
+        ).fetchall()
+        if not stale:
+            return
+        params = [(thread_id, checkpoint_ns, cp_id) for (cp_id,) in stale]
+        conn.executemany("DELETE FROM checkpoints WHERE thread_id = ? AND checkpoint_ns = ? AND checkpoint_id = ?", params)
+        conn.executemany("DELETE FROM writes WHERE thread_id = ? AND checkpoint_ns = ? AND checkpoint_id = ?", params)
+
+    def _delete_threads(self, conn: sqlite3.Connection, thread_ids: Sequence[str]) -> None:
+        params = [(thread_id,) for thread_id in thread_ids]
+        for table in ("checkpoints", "writes", "threads"):
+            conn.executemany(f"DELETE FROM {table} WHERE thread_id = ?", params)
+        for thread_id in thread_ids:
+            self.cache.discard_thread(thread_id)
+
+    def _maybe_sweep(self, conn: sqlite3.Connection, now: float) -> None:
+        if now - self._last_sweep >= CHECKPOINT_SWEEP_INTERVAL_SECONDS:
+            self._last_sweep = now
+            self._expire(conn, now)
+
+    def _expire(self, conn: sqlite3.Connection, now: float) -> int:
+        expired = [row[0] for row in conn.execute(
+            "SELECT thread_id FROM threads WHERE updated_at < ?", (now - self.ttl_seconds,)
+        ).fetchall()]
+        if expired:
+            self._delete_threads(conn, expired)
+            logger.info(f"Expired {len(expired)} idle checkpoint threads.")
+        return len(expired)
+
+    # --- BaseCheckpointSaver API ---
+
+    def get_tuple(self, config: RunnableConfig) -> Optional[CheckpointTuple]:
+        thread_id = config["configurable"]["thread_id"]
+        checkpoint_ns = config["configurable"].get("checkpoint_ns", "")
+        checkpoint_id = get_checkpoint_id(config)
+        with self._lock:
+            conn = self._connection()
+            if not checkpoint_id:
+                row = self._cached_latest(conn, thread_id, checkpoint_ns)
+                if row is not None:
+                    return self._to_tuple(thread_id, checkpoint_ns, row)
+            row = self._load_row(conn, thread_id, checkpoint_ns, checkpoint_id)
+            if row is not None and not checkpoint_id:
+                self.cache.put((thread_id, checkpoint_ns), row)
+        return self._to_tuple(thread_id, checkpoint_ns, row) if row is not None else None
+
+    def list(
+        self,
+        config: Optional[RunnableConfig],
+        *,
+        filter: Optional[Dict[str, Any]] = None,
+        before: Optional[RunnableConfig] = None,
+        limit: Optional[int] = None,
+    ) -> Iterator[CheckpointTuple]:
+        query = "SELECT thread_id, checkpoint_ns, checkpoint_id FROM checkpoints"
+        clauses, params = [], []
+        if config:
+            clauses.append("thread_id = ?")
+            params.append(config["configurable"]["thread_id"])
+            if config["configurable"].get("checkpoint_ns") is not None:
+                clauses.append("checkpoint_ns = ?")
+                params.append(config["configurable"]["checkpoint_ns"])
+            if checkpoint_id := get_checkpoint_id(config):
+                clauses.append("checkpoint_id = ?")
+                params.append(checkpoint_id)
+        if before and (before_id := get_checkpoint_id(before)):
+            clauses.append("checkpoint_id < ?")
+            params.append(before_id)
+        if clauses:
+            query += " WHERE " + " AND ".join(clauses)
+        query += " ORDER BY thread_id, checkpoint_ns, checkpoint_id DESC"
+
+        with self._lock:
+            conn = self._connection()
+            keys = conn.execute(query, params).fetchall()
+            rows = [(t, ns, self._load_row(conn, t, ns, cp_id)) for t, ns, cp_id in keys]
+
+        for thread_id, checkpoint_ns, row in rows:
+            if row is None:
+                continue
+            item = self._to_tuple(thread_id, checkpoint_ns, row)
+            if filter and not all(item.metadata.get(k) == v for k, v in filter.items()):
+                continue
+            if limit is not None:
+                if limit <= 0:
+                    break
+                limit -= 1
+            yield item
+
+    def put(
+        self,
+        config: RunnableConfig,
+        checkpoint: Checkpoint,
+        metadata: CheckpointMetadata,
+        new_versions: ChannelVersions,
+    ) -> RunnableConfig:
+        thread_id = config["configurable"]["thread_id"]
+        checkpoint_ns = config["configurable"].get("checkpoint_ns", "")
+        parent_id = config["configurable"].get("checkpoint_id")
+        cp_type, cp_blob = self.serde.dumps_typed(checkpoint)
+        md_type, md_blob = self.serde.dumps_typed(get_checkpoint_metadata(config, metadata))
+        now = time.time()
+
+        with self._lock:
+            conn = self._connection()
+            with conn:
+                conn.execute(
+                    "INSERT OR REPLACE INTO checkpoints VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                    (thread_id, checkpoint_ns, checkpoint["id"], parent_id, cp_type, cp_blob, md_type, md_blob),
+                )
+                conn.execute("INSERT OR REPLACE INTO threads VALUES (?, ?)", (thread_id, now))
+                self._prune(conn, thread_id, checkpoint_ns)
+                self._maybe_sweep(conn, now)
+            self.cache.put((thread_id, checkpoint_ns), (checkpoint["id"], parent_id, (cp_type, cp_blob), (md_type, md_blob), []))
+
+        return {"configurable": {"thread_id": thread_id, "checkpoint_ns": checkpoint_ns, "checkpoint_id": checkpoint["id"]}}
+
+    def put_writes(
+        self,
+        config: RunnableConfig,
+        writes: Sequence[Tuple[str, Any]],
+        task_id: str,
+        task_path: str = "",
+    ) -> None:
+        thread_id = config["configurable"]["thread_id"]
+        checkpoint_ns = config["configurable"].get("checkpoint_ns", "")
+        checkpoint_id = config["configurable"]["checkpoint_id"]
+        rows = []
+        for idx, (channel, value) in enumerate(writes):
+            write_idx = WRITES_IDX_MAP.get(channel, idx)
+            value_type, value_blob = self.serde.dumps_typed(value)
+            rows.append((write_idx, (thread_id, checkpoint_ns, checkpoint_id, task_id, write_idx, channel, value_type, value_blob, task_path)))
+
+        with self._lock:
+            conn = self._connection()
+            with conn:
+                # Regular writes are idempotent; special (negative index) writes overwrite
+                conn.executemany("INSERT OR IGNORE INTO writes VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)", [r for i, r in rows if i >= 0])
+                conn.executemany("INSERT OR REPLACE INTO writes VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)", [r for i, r in rows if i < 0])
+            self.cache.discard((thread_id, checkpoint_ns))
+
+    def delete_thread(self, thread_id: str) -> None:
+        with self._lock:
+            conn = self._connection()
+            with conn:
+                self._delete_threads(conn, [thread_id])
+
+    def expire_idle_threads(self, now: Optional[float] = None) -> int:
+        """Deletes threads idle for longer than the TTL. Returns how many were removed."""
+        with self._lock:
+            conn = self._connection()
+            with conn:
+                return self._expire(conn, time.time() if now is None else now)
+
+    def stats(self) -> Dict[str, int]:
+        """Cache and storage counters for monitoring."""
+        with self._lock:
+            threads = self._connection().execute("SELECT COUNT(*) FROM threads").fetchone()[0]
+        return {
+            "threads": threads,
+            "cache_hits": self.cache.hits,
+            "cache_misses": self.cache.misses,
+            "cache_resident_bytes": self.cache.resident_bytes,
+        }
+
+    # --- Async API: run the blocking SQLite calls off the event loop ---
+
+    async def aget_tuple(self, config: RunnableConfig) -> Optional[CheckpointTuple]:
+        return await asyncio.to_thread(self.get_tuple, config)
+
+    async def alist(
+        self,
+        config: Optional[RunnableConfig],
+        *,
+        filter: Optional[Dict[str, Any]] = None,
+        before: Optional[RunnableConfig] = None,
+        limit: Optional[int] = None,
+    ) -> AsyncIterator[CheckpointTuple]:
+        items = await asyncio.to_thread(lambda: list(self.list(config, filter=filter, before=before, limit=limit)))
+        for item in items:
+            yield item
+
+    async def aput(
+        self,
+        config: RunnableConfig,
+        checkpoint: Checkpoint,
+        metadata: CheckpointMetadata,
+        new_versions: ChannelVersions,
+    ) -> RunnableConfig:
+        return await asyncio.to_thread(self.put, config, checkpoint, metadata, new_versions)
+
+    async def aput_writes(
+        self,
+        config: RunnableConfig,
+        writes: Sequence[Tuple[str, Any]],
+        task_id: str,
+        task_path: str = "",
+    ) -> None:
+        await asyncio.to_thread(self.put_writes, config, writes, task_id, task_path)
+
+    async def adelete_thread(self, thread_id: str) -> None:
+        await asyncio.to_thread(self.delete_thread, thread_id)
@@ -0,0 +1,169 @@
+# app/services/digest.py
+import os
+import re
+import json
+import asyncio
+import logging
+from dataclasses import dataclass, field, asdict
+from typing import Any, Dict, List, Optional
+
+from langchain_core.messages import HumanMessage, SystemMessage
+
+from app.services.extraction_cache import document_hash, extraction_cache
+from app.services.llm_cache import cached_ainvoke
+from app.services.llm_scheduler import Priority
+from app.services.summarization import summarize_document, summary_token_budget
+from app.services.token_usage import usage_scope
+from app.utils.tokens import estimate_tokens
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Digest settings (override via environment)
+DOCUMENT_DIGEST_ENABLED = os.getenv("DOCUMENT_DIGEST_ENABLED", "true").lower() in ("1", "true", "yes")
+# Document excerpts sent alongside the digest for the overview questions it answers
+DIGEST_EXCERPT_TOKENS = int(os.getenv("DIGEST_EXCERPT_TOKENS", "400"))
+
+# Overview questions about the document as a whole. Questions about a particular
+# clause ("what is the termination notice period?") are left to retrieval, which
+# finds the clause itself rather than the digest's one-line account of it.
+_DIGEST_QUESTION_RE = re.compile(
+    r"\b(summar(y|ize|ise)|overview|gist|tl;?dr|key (facts|terms|points)|"
+    r"who are the (parties|signatories)|who (is|are) (this|the) (document|agreement|contract|lease) between|"
+    r"what (is|kind of|type of|sort of) (this|the) (document|agreement|contract|lease|filing)|"
+    r"what (kind|type|sort) of (document|agreement|contract|lease|filing) is (this|it))\b",
+    re.IGNORECASE,
+)
+_JSON_OBJECT_RE = re.compile(r"\{.*\}", re.DOTALL)
+
+_DIGEST_INSTRUCTIONS = (
+    "You extract key facts from legal documents. Reply with a single JSON object and nothing else, with these keys: "
+    '"parties" (list of party names with their roles), "effective_date", "expiration" (end date or how the '
+    'document ends), "term" (duration and renewal), "governing_law", "obligations" (list of the main obligations, '
+    'each naming the party bound) and "outline" (list of the main section headings in order). '
+    "Use null or an empty list for anything the document does not state. Do not guess."
+)
+
+@dataclass
+class DocumentDigest:
+    """Key facts extracted once from a document, used to answer basic questions with a small prompt."""
+    parties: List[str] = field(default_factory=list)
+    effective_date: Optional[str] = None
+    expiration: Optional[str] = None
+    term: Optional[str] = None
+    governing_law: Optional[str] = None
+    obligations: List[str] = field(default_factory=list)
+    outline: List[str] = field(default_factory=list)
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "DocumentDigest":
+        def text(value: Any) -> Optional[str]:
+            if value is None or isinstance(value, (list, dict)):
+                return None
+            return str(value).strip() or None
+        def items(value: Any) -> List[str]:
+            values = value if isinstance(value, list) else [value] if value else []
+            return [str(v).strip() for v in values if str(v).strip()]
+        return cls(
+            parties=items(data.get("parties")),
+            effective_date=text(data.get("effective_date")),
+            expiration=text(data.get("expiration")),
+            term=text(data.get("term")),
+            governing_law=text(data.get("governing_law")),
+            obligations=items(data.get("obligations")),
+            outline=items(data.get("outline")),
+        )
+
+    def to_dict(self) -> Dict[str, Any]:
+        return asdict(self)
+
+    def format(self) -> str:
+        """Renders the digest as the plain-text block sent to the LLM."""
+        lines = [
+            f"Parties: {'; '.join(self.parties) or 'not stated'}",
+            f"Effective date: {self.effective_date or 'not stated'}",
+            f"Expiration: {self.expiration or 'not stated'}",
+            f"Term: {self.term or 'not stated'}",
+            f"Governing law: {self.governing_law or 'not stated'}",
+        ]
+        if self.obligations:
+            lines.append("Obligations:\n" + "\n".join(f"- {o}" for o in self.obligations))
+        if self.outline:
+            lines.append("Outline:\n" + "\n".join(f"- {s}" for s in self.outline))
+        return "\n".join(lines)
+
+# Digests being generated in the background, by document key; holding the tasks keeps them from being garbage collected
+_digest_tasks: Dict[str, asyncio.Task] = {}
+
+def answers_from_digest(query: str) -> bool:
+    """True for overview questions ("summarize this", "who are the parties?", "what is this document?")."""
+    return bool(_DIGEST_QUESTION_RE.search(query))
+
+def digest_fits_one_prompt(llm, text: str) -> bool:
+    """Whether digesting the document takes a single LLM call rather than a map-reduce summary first."""
+    return estimate_tokens(text) <= summary_token_budget(getattr(llm, "model_name", None))
+
+def parse_digest(content: str) -> Optional[DocumentDigest]:
+    """Reads the digest from the model's reply, tolerating code fences or text around the JSON."""
+    match = _JSON_OBJECT_RE.search(content)
+    if match is None:
+        return None
+    try:
+        data = json.loads(match.group())
+    except ValueError:
+        return None
+    return DocumentDigest.from_dict(data) if isinstance(data, dict) else None
+
+async def generate_digest(llm, text: str, key: Optional[str] = None) -> Optional[DocumentDigest]:
+    """
+    Extracts the digest of a document with one LLM call.
+
+    Documents too long for one prompt are digested from their map-reduce
+    summary, whose chunk summaries are cached for later questions as well.
+    """
+    if digest_fits_one_prompt(llm, text):
+        source = text
+    else:
+        source = await summarize_document(llm, text, summary_token_budget(getattr(llm, "model_name", None)), priority=Priority.BATCH)
+    messages = [SystemMessage(content=_DIGEST_INSTRUCTIONS), HumanMessage(content=f"Document:\n---\n{source}\n---")]
+    response = await cached_ainvoke(llm, messages, document_hash=key or document_hash(text), priority=Priority.BATCH)
+    digest = parse_digest(response.content)
+    if digest is None:
+        logger.warning("Could not parse the document digest returned by the LLM.")
+    return digest
+
+async def load_digest(key: str) -> Optional[DocumentDigest]:
+    """The stored digest of the document with this content hash (see extraction_cache.document_hash), if generated."""
+    data = await asyncio.to_thread(extraction_cache.get_digest, key)
+    return DocumentDigest.from_dict(data) if data is not None else None
+
+async def ensure_digest(llm, text: str, key: Optional[str] = None) -> Optional[DocumentDigest]:
+    """Generates and stores the digest of a document unless it already has one. Pass key if the text's hash is known."""
+    key = key or await asyncio.to_thread(document_hash, text)
+    data = await asyncio.to_thread(extraction_cache.get_digest, key)
+    if data is not None:
+        return DocumentDigest.from_dict(data)
+    digest = await generate_digest(llm, text, key)
+    if digest is not None:
+        await asyncio.to_thread(extraction_cache.put_digest, key, digest.to_dict())
+        logger.info(f"Stored digest for document {key[:12]}.")
+    return digest
+
+async def _digest_in_background(llm, text: str, key: str, session_id: Optional[str]) -> None:
+    try:
+        with usage_scope(session_id, "digest"):
+            await ensure_digest(llm, text, key)
+    except Exception as e:
+        logger.error(f"Error generating digest for document {key[:12]}: {e}", exc_info=True)
+
+def start_digest(llm, text: str, key: str, session_id: Optional[str] = None) -> None:
+    """
+    Generates and stores the document's digest in the background, unless disabled or already under way.
+
+    Until it exists, questions are answered from excerpts alone.
+    """
+    if not DOCUMENT_DIGEST_ENABLED or key in _digest_tasks:
+        return
+    task = asyncio.create_task(_digest_in_background(llm, text, key, session_id))
+    _digest_tasks[key] = task
+    task.add_done_callback(lambda _: _digest_tasks.pop(key, None))
@@ -0,0 +1,342 @@
+# app/services/document_store.py
+import os
+import sys
+import json
+import time
+import zlib
+import sqlite3
+import logging
+import threading
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional
+
+from app.services.extraction_cache import document_hash
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Document store settings (override via environment)
+DOCUMENT_STORE_MAX_BYTES = int(os.getenv("DOCUMENT_STORE_MAX_BYTES", str(256 * 1024 * 1024)))
+DOCUMENT_STORE_IDLE_TTL_SECONDS = float(os.getenv("DOCUMENT_STORE_IDLE_TTL_SECONDS", "3600"))
+# Stored documents are deleted once their session has not used them for this long;
+# the default matches CHECKPOINT_TTL_SECONDS, so a document lives as long as its conversation
+DOCUMENT_RETENTION_SECONDS = float(os.getenv("DOCUMENT_RETENTION_SECONDS", str(7 * 24 * 3600)))
+# Shared by every worker process on the host, so any worker can serve any session
+DOCUMENT_DB_PATH = Path(os.getenv("DOCUMENT_DB_PATH", "data/documents.sqlite3"))
+# A session's last access is written at most this often, and expired rows swept at most this often
+DOCUMENT_TOUCH_INTERVAL_SECONDS = 60.0
+DOCUMENT_SWEEP_INTERVAL_SECONDS = 60.0
+
+_MISSING = object()
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS contents (
+    content_key TEXT PRIMARY KEY,
+    text BLOB NOT NULL
+);
+CREATE TABLE IF NOT EXISTS sessions (
+    session_id TEXT PRIMARY KEY,
+    content_key TEXT NOT NULL,
+    accessed_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS sessions_by_content ON sessions (content_key);
+CREATE TABLE IF NOT EXISTS ingestion_jobs (
+    session_id TEXT PRIMARY KEY,
+    status TEXT NOT NULL,
+    updated_at REAL NOT NULL
+);
+"""
+
+class DocumentStore:
+    """
+    Bounded store for extracted document text, keyed by session ID.
+
+    Every document is written through, compressed, to a SQLite file that all
+    worker processes share, so a chat request can land on any worker. Text is
+    stored once per content hash: sessions only reference it, so identical
+    uploads share one copy on disk and in memory. A session that has not been
+    used for `retention_seconds` is deleted, along with text no remaining
+    session references.
+
+    Recently used texts are also kept in memory up to `max_bytes`; least
+    recently used ones, or ones idle for longer than `idle_ttl_seconds`, are
+    dropped from memory and loaded back from the database on the next access.
+    Text never changes under its content hash, so a resident copy is always
+    current; only the small session row is read on each access, which is how
+    other workers' replacements and deletions are seen.
+
+    Ingestion job progress is kept in the same database, so a status poll
+    can be answered by any worker, not just the one extracting the upload.
+    Supports the dict operations the routes use (`get`, `[]`, `in`, `pop`,
+    `clear`) so it can stand in for a plain dict.
+    """
+
+    def __init__(
+        self,
+        max_bytes: int = DOCUMENT_STORE_MAX_BYTES,
+        idle_ttl_seconds: float = DOCUMENT_STORE_IDLE_TTL_SECONDS,
+        path: Path = DOCUMENT_DB_PATH,
+        retention_seconds: float = DOCUMENT_RETENTION_SECONDS,
+    ):
+        self.max_bytes = max_bytes
+        self.idle_ttl_seconds = idle_ttl_seconds
+        self.path = Path(path)
+        self.retention_seconds = retention_seconds
+        # content key -> (text, size in bytes, last access time); oldest access first
+        self._resident: "OrderedDict[str, tuple[str, int, float]]" = OrderedDict()
+        self._resident_bytes = 0
+        self._lock = threading.Lock()
+        self._conn: Optional[sqlite3.Connection] = None
+        self._last_sweep = 0.0
+        self._expiry_listeners: List[Callable[[List[str]], None]] = []
+        self.hits = 0
+        self.misses = 0
+        self.disk_loads = 0
+        self.evictions = 0
+
+    # --- Internal helpers (callers hold self._lock) ---
+
+    def _connection(self) -> sqlite3.Connection:
+        """Opens the database on first use."""
+        if self._conn is None:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            conn = sqlite3.connect(self.path, timeout=30, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.executescript(_SCHEMA)
+            self._conn = conn
+            logger.info(f"Opened document store at {self.path}")
+        return self._conn
+
+    def _drop(self, key: str) -> None:
+        entry = self._resident.pop(key, None)
+        if entry is not None:
+            self._resident_bytes -= entry[1]
+
+    def _evict(self, key: str) -> None:
+        """Drops a resident text from memory; it stays in the database."""
+        size = self._resident[key][1]
+        self._drop(key)
+        self.evictions += 1
+        logger.info(f"Evicted document {key[:12]} ({size} bytes) from memory")
+
+    def _enforce_limits(self, now: float) -> None:
+        # Entries are ordered by last access, so idle ones are at the front
+        while self._resident:
+            key, (_, _, last_access) = next(iter(self._resident.items()))
+            if now - last_access <= self.idle_ttl_seconds:
+                break
+            self._evict(key)
+        while self._resident_bytes > self.max_bytes and self._resident:
+            self._evict(next(iter(self._resident)))
+
+    def _store(self, key: str, text: str, now: float) -> None:
+        size = sys.getsizeof(text)
+        self._resident[key] = (text, size, now)
+        self._resident_bytes += size
+
+    def _delete_unreferenced(self, conn: sqlite3.Connection, keys=None) -> None:
+        """Deletes texts no session references any more (among `keys`, or all)."""
+        query = "SELECT content_key FROM contents WHERE content_key NOT IN (SELECT content_key FROM sessions)"
+        if keys is not None:
+            query += f" AND content_key IN ({','.join('?' * len(keys))})"
+        orphans = [row[0] for row in conn.execute(query, tuple(keys or ())).fetchall()]
+        conn.executemany("DELETE FROM contents WHERE content_key = ?", [(key,) for key in orphans])
+        for key in orphans:
+            self._drop(key)
+
+    def _maybe_sweep(self, conn: sqlite3.Connection, now: float) -> None:
+        if now - self._last_sweep < DOCUMENT_SWEEP_INTERVAL_SECONDS:
+            return
+        self._last_sweep = now
+        cutoff = now - self.retention_seconds
+        with conn:
+            candidates = [row[0] for row in conn.execute("SELECT session_id FROM sessions WHERE accessed_at < ?", (cutoff,))]
+            # Re-checked per row, since another worker may have used the session since the select
+            expired = [key for key in candidates if conn.execute(
+                "DELETE FROM sessions WHERE session_id = ? AND accessed_at < ?", (key, cutoff),
+            ).rowcount]
+            if expired:
+                self._delete_unreferenced(conn)
+                logger.info(f"Expired {len(expired)} idle documents.")
+        for listener in self._expiry_listeners if expired else ():
+            try:
+                listener(expired)
+            except Exception as e:
+                logger.warning(f"Document expiry listener failed: {e}", exc_info=True)
+
+    def _session_key(self, conn: sqlite3.Connection, key: str) -> Optional[str]:
+        """The content key a session refers to, recording the access so the session is retained."""
+        row = conn.execute("SELECT content_key, accessed_at FROM sessions WHERE session_id = ?", (key,)).fetchone()
+        if row is None:
+            return None
+        now = time.time()
+        if now - row[1] >= DOCUMENT_TOUCH_INTERVAL_SECONDS:
+            with conn:
+                conn.execute("UPDATE sessions SET accessed_at = ? WHERE session_id = ?", (now, key))
+        return row[0]
+
+    # --- Public API ---
+
+    def add_expiry_listener(self, listener: Callable[[List[str]], None]) -> None:
+        """
+        Registers a callback given the session IDs each retention sweep deletes,
+        e.g. to drop them from the search index. Listeners run while the store is
+        locked, so they must not call back into it.
+        """
+        self._expiry_listeners.append(listener)
+
+    def put(self, key: str, text: str, content_key: Optional[str] = None) -> None:
+        """Stores a session's document; pass content_key if the text's hash is already known."""
+        content_key = content_key or document_hash(text)
+        now = time.monotonic()
+        with self._lock:
+            conn = self._connection()
+            self._maybe_sweep(conn, time.time())
+            with conn: # The session row is written first, so no sweep can delete the text in between
+                previous = conn.execute("SELECT content_key FROM sessions WHERE session_id = ?", (key,)).fetchone()
+                conn.execute(
+                    "INSERT OR REPLACE INTO sessions (session_id, content_key, accessed_at) VALUES (?, ?, ?)",
+                    (key, content_key, time.time()),
+                )
+                if conn.execute("SELECT 1 FROM contents WHERE content_key = ?", (content_key,)).fetchone() is None:
+                    conn.execute("INSERT INTO contents (content_key, text) VALUES (?, ?)", (content_key, zlib.compress(text.encode("utf-8"))))
+                if previous is not None and previous[0] != content_key:
+                    self._delete_unreferenced(conn, [previous[0]])
+            if content_key not in self._resident:
+                self._store(content_key, text, now)
+            self._resident.move_to_end(content_key)
+            self._enforce_limits(now)
+
+    def __setitem__(self, key: str, text: str) -> None:
+        self.put(key, text)
+
+    def _load(self, conn: sqlite3.Connection, content_key: Optional[str], now: float) -> Optional[str]:
+        """The text stored under content_key, from memory or disk; None if there is none."""
+        entry = self._resident.get(content_key) if content_key is not None else None
+        if entry is not None:
+            self.hits += 1
+            self._resident[content_key] = (entry[0], entry[1], now)
+            self._resident.move_to_end(content_key)
+            text = entry[0]
+        else:
+            row = conn.execute("SELECT text FROM contents WHERE content_key = ?", (content_key,)).fetchone() if content_key else None
+            if row is None:
+                self.misses += 1
+                return None
+            text = zlib.decompress(row[0]).decode("utf-8")
+            self.disk_loads += 1
+            self._store(content_key, text, now)
+        self._enforce_limits(now)
+        return text
+
+    def get(self, key: str, default: Optional[str] = None) -> Optional[str]:
+        now = time.monotonic()
+        with self._lock:
+            conn = self._connection()
+            self._maybe_sweep(conn, time.time())
+            text = self._load(conn, self._session_key(conn, key), now)
+            return default if text is None else text
+
+    def get_text(self, content_key: str) -> Optional[str]:
+        """The document stored under a content hash (see document_key), None once no session refers to it."""
+        now = time.monotonic()
+        with self._lock:
+            return self._load(self._connection(), content_key, now)
+
+    def __getitem__(self, key: str) -> str:
+        text = self.get(key, _MISSING)
+        if text is _MISSING:
+            raise KeyError(key)
+        return text
+
+    def __contains__(self, key: object) -> bool:
+        with self._lock:
+            return self._connection().execute("SELECT 1 FROM sessions WHERE session_id = ?", (key,)).fetchone() is not None
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._connection().execute("SELECT COUNT(*) FROM sessions").fetchone()[0]
+
+    def document_key(self, key: str) -> Optional[str]:
+        """
+        Content hash of the session's document (see extraction_cache.document_hash),
+        None if it has none. Like get, this counts as a use of the session for retention.
+        """
+        with self._lock:
+            conn = self._connection()
+            self._maybe_sweep(conn, time.time())
+            return self._session_key(conn, key)
+
+    def pop(self, key: str, default=_MISSING):
+        text = self.get(key, _MISSING)
+        with self._lock:
+            conn = self._connection()
+            with conn:
+                row = conn.execute("SELECT content_key FROM sessions WHERE session_id = ?", (key,)).fetchone()
+                conn.execute("DELETE FROM sessions WHERE session_id = ?", (key,))
+                if row is not None:
+                    self._delete_unreferenced(conn, [row[0]])
+        if text is _MISSING:
+            if default is _MISSING:
+                raise KeyError(key)
+            return default
+        return text
+
+    def clear(self) -> None:
+        with self._lock:
+            conn = self._connection()
+            with conn:
+                conn.execute("DELETE FROM sessions")
+                conn.execute("DELETE FROM contents")
+            for key in list(self._resident):
+                self._drop(key)
+
+    def close(self) -> None:
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+    # --- Ingestion job status shared between workers (see ingestion.py) ---
+
+    def put_job(self, key: str, status: Dict[str, Any]) -> None:
+        with self._lock:
+            with self._connection() as conn:
+                conn.execute(
+                    "INSERT OR REPLACE INTO ingestion_jobs (session_id, status, updated_at) VALUES (?, ?, ?)",
+                    (key, json.dumps(status), time.time()),
+                )
+
+    def get_job(self, key: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            row = self._connection().execute("SELECT status FROM ingestion_jobs WHERE session_id = ?", (key,)).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def prune_jobs(self, max_age_seconds: float) -> int:
+        """Forgets jobs not updated for max_age_seconds, including ones left behind by a crashed worker."""
+        with self._lock:
+            with self._connection() as conn:
+                return conn.execute("DELETE FROM ingestion_jobs WHERE updated_at < ?", (time.time() - max_age_seconds,)).rowcount
+
+    @property
+    def resident_bytes(self) -> int:
+        return self._resident_bytes
+
+    def stats(self) -> Dict[str, int]:
+        """Counters for monitoring memory use and cache effectiveness."""
+        with self._lock:
+            stored = self._connection().execute("SELECT COUNT(*) FROM contents").fetchone()[0]
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "disk_loads": self.disk_loads,
+                "evictions": self.evictions,
+                "resident_documents": len(self._resident),
+                "resident_bytes": self._resident_bytes,
+                "spilled_documents": max(0, stored - len(self._resident)),
+            }
+
+# Extracted document text per session, shared by the routes and the ingestion workers
+document_store = DocumentStore()
@@ -0,0 +1,206 @@
+# app/services/extraction_cache.py
+import os
+import json
+import zlib
+import pickle
+import time
+import hashlib
+import logging
+import tempfile
+import threading
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+from app.services.retrieval import BM25Index, chunk_text
+from app.services.structure_index import StructureIndex
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+EXTRACTION_CACHE_DIR = Path(os.getenv("EXTRACTION_CACHE_DIR", "data/extraction_cache"))
+# Bump when extraction or chunking output changes so stale entries are ignored
+EXTRACTION_CACHE_VERSION = "v1"
+# Disk budget; least recently used entries are deleted once it is exceeded
+EXTRACTION_CACHE_MAX_BYTES = int(os.getenv("EXTRACTION_CACHE_MAX_BYTES", str(2 * 1024 * 1024 * 1024)))
+# Eviction trims to this fraction of the budget, so it does not rerun on every write
+EXTRACTION_CACHE_EVICT_TO = 0.9
+# Temporary files older than this were left by an interrupted write and are removed during eviction
+STALE_TEMP_FILE_SECONDS = 3600
+
+def cache_key(sha256: str, filename: str) -> str:
+    """Content-addressed key: the upload's SHA-256 plus its file type (the same bytes parse differently as .txt and .pdf)."""
+    suffix = Path(filename).suffix.lower().lstrip(".") or "bin"
+    return f"{sha256}.{suffix}"
+
+def document_hash(text: str) -> str:
+    """Content key of extracted text, for entries derived from the text rather than the upload (summaries, digests)."""
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+class ExtractionCache:
+    """
+    On-disk cache of extracted text, chunk and structure indexes, summaries and digests, keyed by content.
+
+    Repeated uploads of the same file skip parsing and indexing entirely, and
+    each distinct document is stored once no matter how many sessions use it.
+    Methods are blocking; call them via asyncio.to_thread from async code.
+
+    Total size is kept under `max_bytes` by deleting the least recently read
+    or written entries. Unreadable entries are deleted and treated as misses.
+    """
+
+    def __init__(self, cache_dir: Path = EXTRACTION_CACHE_DIR, max_bytes: int = EXTRACTION_CACHE_MAX_BYTES):
+        self.cache_dir = Path(cache_dir) / EXTRACTION_CACHE_VERSION
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._bytes: Optional[int] = None # Measured on the first write
+        self._lock = threading.Lock()
+
+    def _path(self, key: str, kind: str) -> Path:
+        # Shard by hash prefix to keep directories small
+        return self.cache_dir / key[:2] / f"{key}.{kind}"
+
+    def _read(self, path: Path) -> bytes:
+        data = path.read_bytes()
+        try:
+            os.utime(path) # The modification time orders entries for eviction
+        except FileNotFoundError:
+            pass # Evicted by another worker since; the data read is still valid
+        return data
+
+    def _discard(self, path: Path, error: Exception) -> None:
+        logger.warning(f"Discarding unreadable cache entry {path.name}: {error!r}")
+        path.unlink(missing_ok=True)
+
+    def _write(self, path: Path, data: bytes) -> None:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        # A unique temporary name per write, so concurrent writers of one entry do not interleave
+        tmp_path = None
+        try:
+            with tempfile.NamedTemporaryFile(dir=path.parent, prefix=f"{path.name}.", suffix=".tmp", delete=False) as f:
+                tmp_path = Path(f.name)
+                f.write(data)
+            os.replace(tmp_path, path) # Atomic, so concurrent readers never see partial files
+        except BaseException:
+            if tmp_path is not None:
+                tmp_path.unlink(missing_ok=True)
+            raise
+        self._account(len(data))
+
+    def _account(self, written: int) -> None:
+        with self._lock:
+            if self._bytes is None:
+                self._bytes = self._scan()[0]
+            else:
+                self._bytes += written
+            if self._bytes > self.max_bytes:
+                self._evict()
+
+    def _scan(self) -> Tuple[int, List[Tuple[float, int, Path]]]:
+        """Total size of the cache and its entries as (mtime, size, path); removes stale temporary files."""
+        total, entries, now = 0, [], time.time()
+        for path in self.cache_dir.glob("*/*"):
+            try:
+                stat = path.stat()
+            except FileNotFoundError:
+                continue # Deleted by another worker
+            if path.suffix == ".tmp":
+                if now - stat.st_mtime > STALE_TEMP_FILE_SECONDS:
+                    path.unlink(missing_ok=True)
+                continue
+            total += stat.st_size
+            entries.append((stat.st_mtime, stat.st_size, path))
+        return total, entries
+
+    def _evict(self) -> None:
+        # Rescanned because other workers share the directory; this worker's running total is only an estimate
+        total, entries = self._scan()
+        target = self.max_bytes * EXTRACTION_CACHE_EVICT_TO
+        evicted = 0
+        for _, size, path in sorted(entries, key=lambda entry: entry[0]):
+            if total <= target:
+                break
+            path.unlink(missing_ok=True)
+            total -= size
+            evicted += 1
+        if evicted:
+            logger.info(f"Evicted {evicted} extraction cache entries; {total} bytes remain.")
+        self._bytes = total
+
+    def get_text(self, key: str) -> Optional[str]:
+        path = self._path(key, "txt.z")
+        try:
+            text = zlib.decompress(self._read(path)).decode("utf-8")
+        except FileNotFoundError:
+            self.misses += 1
+            return None
+        except (zlib.error, UnicodeDecodeError) as e:
+            self._discard(path, e)
+            self.misses += 1
+            return None
+        self.hits += 1
+        logger.info(f"Extraction cache hit for {key[:12]}")
+        return text
+
+    def put_text(self, key: str, text: str) -> None:
+        self._write(self._path(key, "txt.z"), zlib.compress(text.encode("utf-8")))
+
+    def get_or_build_index(self, key: str, text: str) -> BM25Index:
+        """Loads the cached chunk index for a document, building and caching it on a miss."""
+        path = self._path(key, "index.pkl")
+        try:
+            return pickle.loads(self._read(path))
+        except FileNotFoundError:
+            pass
+        except (pickle.UnpicklingError, EOFError, AttributeError, ImportError) as e:
+            self._discard(path, e) # Truncated, or pickled by an incompatible version of the class
+        index = BM25Index(chunk_text(text))
+        self._write(path, pickle.dumps(index, protocol=pickle.HIGHEST_PROTOCOL))
+        return index
+
+    def get_or_build_structure(self, key: str, text: str) -> StructureIndex:
+        """Loads the cached section/definition/exhibit index for a document, building and caching it on a miss."""
+        path = self._path(key, "structure.pkl")
+        try:
+            return pickle.loads(self._read(path))
+        except FileNotFoundError:
+            pass
+        except (pickle.UnpicklingError, EOFError, AttributeError, ImportError) as e:
+            self._discard(path, e) # Truncated, or pickled by an incompatible version of the class
+        structure = StructureIndex(text)
+        self._write(path, pickle.dumps(structure, protocol=pickle.HIGHEST_PROTOCOL))
+        return structure
+
+    def get_summaries(self, key: str) -> Optional[List[str]]:
+        """Partial summaries of a document's chunks (see summarization.py), if cached."""
+        path = self._path(key, "summaries.json.z")
+        try:
+            return json.loads(zlib.decompress(self._read(path)))
+        except FileNotFoundError:
+            return None
+        except (zlib.error, ValueError) as e:
+            self._discard(path, e)
+            return None
+
+    def put_summaries(self, key: str, summaries: List[str]) -> None:
+        self._write(self._path(key, "summaries.json.z"), zlib.compress(json.dumps(summaries).encode("utf-8")))
+
+    def get_digest(self, key: str) -> Optional[Dict[str, Any]]:
+        """Key facts extracted from a document (see digest.py), if generated."""
+        path = self._path(key, "digest.json")
+        try:
+            return json.loads(self._read(path))
+        except FileNotFoundError:
+            return None
+        except ValueError as e:
+            self._discard(path, e)
+            return None
+
+    def put_digest(self, key: str, digest: Dict[str, Any]) -> None:
+        self._write(self._path(key, "digest.json"), json.dumps(digest).encode("utf-8"))
+
+    def stats(self) -> Dict[str, int]:
+        return {"hits": self.hits, "misses": self.misses}
+
+# Shared instance used by the upload route
+extraction_cache = ExtractionCache()
@@ -1,10 +1,19 @@
 #app/services/groq_client.py
 import os
 import logging
-from groq import Groq, AsyncGroq # Use AsyncGroq for FastAPI
-from langchain_groq import ChatGroq
+import threading
+from typing import TYPE_CHECKING, Optional
 from dotenv import load_dotenv
 
+from app.services.resilience import call_with_resilience
+from app.services.llm_scheduler import LLM_COMPLETION_TOKENS_ESTIMATE, Priority, llm_scheduler
+from app.services.token_usage import token_usage
+from app.utils.tokens import estimate_tokens
+
+if TYPE_CHECKING:
+    from groq import AsyncGroq
+    from langchain_groq import ChatGroq
+
 load_dotenv() # Load environment variables from .env
 
 logging.basicConfig(level=logging.INFO)
@@ -12,22 +21,44 @@ logger = logging.getLogger(__name__)
 
 API_KEY = os.getenv("GROQ_API_KEY")
 MODEL_NAME = os.getenv("GROQ_MODEL_NAME", "llama3-8b-8192")
+# Point at another OpenAI-compatible endpoint, e.g. benchmarks/fake_groq.py for offline load tests
+BASE_URL = os.getenv("GROQ_BASE_URL") or None
+
+# Clients are created on first use (or by the startup warm-up), not at import,
+# so workers boot quickly and a missing key only fails the calls that need it
+async_groq_client: Optional["AsyncGroq"] = None
+chat_llm: Optional["ChatGroq"] = None
+# Set once the chat model failed to initialize (e.g. no API key), so later calls neither retry nor log again
+_chat_llm_unavailable = False
+_init_lock = threading.Lock()
 
-if not API_KEY:
-    logger.error("GROQ_API_KEY not found in environment variables.")
-    raise ValueError("GROQ_API_KEY is required.")
+def _require_api_key() -> str:
+    if not API_KEY:
+        logger.error("GROQ_API_KEY not found in environment variables.")
+        raise ValueError("GROQ_API_KEY is required.")
+    return API_KEY
 
 # Use AsyncGroq for direct async calls if needed outside LangChain/LangGraph
-async_groq_client = AsyncGroq(api_key=API_KEY)
+def get_async_groq_client() -> "AsyncGroq":
+    """Returns the shared AsyncGroq client, creating it on first use."""
+    global async_groq_client
+    with _init_lock:
+        if async_groq_client is None:
+            from groq import AsyncGroq
+            async_groq_client = AsyncGroq(api_key=_require_api_key(), base_url=BASE_URL, max_retries=0) # Retries are handled by resilience.call_with_resilience
+    return async_groq_client
 
 # Use ChatGroq for integration with LangChain/LangGraph
-def get_groq_chat_llm() -> ChatGroq:
-    """Initializes and returns the ChatGroq LLM instance."""
+def get_groq_chat_llm() -> "ChatGroq":
+    """Initializes and returns a new ChatGroq LLM instance."""
     try:
+        from langchain_groq import ChatGroq
         chat = ChatGroq(
             temperature=0.7, # Adjust creativity
-            groq_api_key=API_KEY,
+            groq_api_key=_require_api_key(),
+            groq_api_base=BASE_URL,
             model_name=MODEL_NAME,
+            max_retries=0, # Retries are handled by resilience.call_with_resilience
             # max_tokens=2048, # Optional: Set max tokens
         )
         logger.info(f"ChatGroq LLM initialized with model: {MODEL_NAME}")
@@ -37,21 +68,36 @@ def get_groq_chat_llm() -> ChatGroq:
         raise
 
 # Example of a direct async call (if needed separately)
-async def get_groq_completion(prompt: str, system_prompt: str = "You are a helpful legal assistant.") -> str:
-    """Gets a completion directly from the Groq API (async)."""
+async def get_groq_completion(prompt: str, system_prompt: str = "You are a helpful legal assistant.", priority: Priority = Priority.INTERACTIVE) -> str:
+    """Gets a completion directly from the Groq API (async), admitted by the shared rate-limit scheduler."""
     try:
-        chat_completion = await async_groq_client.chat.completions.create(
-            messages=[
-                {
-                    "role": "system",
-                    "content": system_prompt,
-                },
-                {
-                    "role": "user",
-                    "content": prompt,
-                }
-            ],
-            model=MODEL_NAME,
+        estimated_tokens = estimate_tokens(system_prompt) + estimate_tokens(prompt) + LLM_COMPLETION_TOKENS_ESTIMATE
+        client = get_async_groq_client()
+        def complete():
+            return client.chat.completions.create(
+                messages=[
+                    {
+                        "role": "system",
+                        "content": system_prompt,
+                    },
+                    {
+                        "role": "user",
+                        "content": prompt,
+                    }
+                ],
+                model=MODEL_NAME,
+            )
+
+        def usage(completion) -> Optional[int]:
+            if completion.usage is None:
+                return None
+            token_usage.record(completion.usage.prompt_tokens, completion.usage.completion_tokens)
+            return completion.usage.total_tokens
+
+        # Each try, retries and hedges included, is admitted by the scheduler separately
+        chat_completion = await call_with_resilience(
+            lambda grant: llm_scheduler.run(grant, complete, usage),
+            admit=lambda: llm_scheduler.acquire(priority, estimated_tokens),
         )
         response_content = chat_completion.choices[0].message.content
         logger.info("Received completion from Groq API.")
@@ -60,9 +106,22 @@ async def get_groq_completion(prompt: str, system_prompt: str = "You are a helpf
         logger.error(f"Error calling Groq API: {e}", exc_info=True)
         return "Sorry, I encountered an error trying to contact the AI service."
 
-# Initialize once
-try:
-    chat_llm = get_groq_chat_llm()
-except Exception as e:
-    chat_llm = None # Handle gracefully if initialization fails
-    logger.error("Could not initialize Groq Chat LLM on startup.")
+def get_chat_llm() -> Optional["ChatGroq"]:
+    """
+    Returns the shared ChatGroq instance, creating it on first use; None if it cannot be initialized.
+
+    A failed initialization is remembered for the life of the process, since
+    neither a missing key nor a broken install fixes itself between calls.
+    """
+    global chat_llm, _chat_llm_unavailable
+    with _init_lock:
+        if chat_llm is None and not _chat_llm_unavailable:
+            if not API_KEY:
+                logger.warning("GROQ_API_KEY is not set; LLM features are unavailable until the app is restarted with it.")
+                _chat_llm_unavailable = True
+            else:
+                try:
+                    chat_llm = get_groq_chat_llm()
+                except Exception:
+                    _chat_llm_unavailable = True # get_groq_chat_llm logged the cause; callers fall back to an error reply
+    return chat_llm
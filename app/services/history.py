@@ -0,0 +1,88 @@
+# app/services/history.py
+import os
+import logging
+from typing import List, Optional, Sequence
+
+from langchain_core.messages import BaseMessage, HumanMessage, SystemMessage
+
+from app.utils.tokens import estimate_tokens, truncate_to_tokens
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Tokens of recent conversation sent verbatim on each turn (override via environment)
+HISTORY_TOKEN_BUDGET = int(os.getenv("HISTORY_TOKEN_BUDGET", "2000"))
+# When the budget is exceeded, fold turns until only this fraction of it remains,
+# so summarization runs every few turns rather than on every turn.
+HISTORY_KEEP_RATIO = float(os.getenv("HISTORY_KEEP_RATIO", "0.5"))
+
+# Fixed per-message overhead for role markers
+_MESSAGE_OVERHEAD_TOKENS = 4
+
+def message_tokens(message: BaseMessage) -> int:
+    """Approximate token cost of one chat message."""
+    content = message.content if isinstance(message.content, str) else str(message.content)
+    return estimate_tokens(content) + _MESSAGE_OVERHEAD_TOKENS
+
+def recent_window_start(messages: Sequence[BaseMessage], budget: int = HISTORY_TOKEN_BUDGET) -> int:
+    """Returns the index of the oldest message in the newest run that fits the budget."""
+    used = 0
+    for i in range(len(messages) - 1, -1, -1):
+        used += message_tokens(messages[i])
+        if used > budget:
+            return i + 1
+    return 0
+
+def fit_to_budget(messages: Sequence[BaseMessage], budget: int) -> List[BaseMessage]:
+    """
+    Last-resort guard that makes a prompt fit the model's budget.
+
+    Drops the oldest non-system messages first, then truncates the final message.
+    Callers should select context to fit beforehand; this only prevents requests
+    that would fail on context overflow.
+    """
+    messages = list(messages)
+    total = sum(message_tokens(m) for m in messages)
+    if total <= budget:
+        return messages
+    first = next((i for i, m in enumerate(messages) if not isinstance(m, SystemMessage)), len(messages))
+    while total > budget and first < len(messages) - 1:
+        total -= message_tokens(messages.pop(first))
+    if total > budget:
+        last = messages[-1]
+        allowed = budget - (total - message_tokens(last)) - _MESSAGE_OVERHEAD_TOKENS
+        messages[-1] = last.model_copy(update={"content": truncate_to_tokens(str(last.content), allowed)})
+    logger.warning(f"Prompt exceeded the {budget}-token budget; trimmed it to fit.")
+    return messages
+
+def messages_to_fold(messages: Sequence[BaseMessage], budget: int = HISTORY_TOKEN_BUDGET) -> int:
+    """
+    Returns how many leading messages should be folded into the running summary.
+
+    Zero while the history fits the budget; once it overflows, enough to bring
+    the verbatim part back down to HISTORY_KEEP_RATIO of the budget.
+    """
+    if recent_window_start(messages, budget) == 0:
+        return 0
+    return recent_window_start(messages, int(budget * HISTORY_KEEP_RATIO))
+
+async def summarize_messages(llm, previous_summary: Optional[str], messages: Sequence[BaseMessage]) -> str:
+    """Asks the LLM to merge older turns into the running conversation summary."""
+    transcript = "\n".join(
+        f"{'User' if isinstance(m, HumanMessage) else 'Assistant'}: {m.content}" for m in messages
+    )
+    prompt = (
+        f"Existing summary:\n{previous_summary or '(none)'}\n\n"
+        f"New conversation turns:\n{transcript}\n\n"
+        "Update the summary to cover the new turns. Keep facts, names, dates, figures and open questions. "
+        "Reply with the updated summary only, in under 200 words."
+    )
+    from app.services.llm_cache import cached_ainvoke # llm_cache imports this module for fit_to_budget
+    from app.services.llm_scheduler import Priority
+    # The summary is on the path of the user's current turn, so it runs at interactive priority
+    response = await cached_ainvoke(llm, [
+        SystemMessage(content="You maintain a concise running summary of a conversation between a user and a legal assistant."),
+        HumanMessage(content=prompt),
+    ], priority=Priority.INTERACTIVE)
+    logger.info(f"Folded {len(messages)} messages into the conversation summary.")
+    return response.content
@@ -0,0 +1,259 @@
+# app/services/ingestion.py
+import os
+import time
+import asyncio
+import logging
+from dataclasses import dataclass, field, asdict
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+from app.services.document_store import document_store
+from app.services.extraction_cache import extraction_cache, cache_key, document_hash
+from app.services.retrieval import document_indexes
+from app.services.structure_index import document_structures
+from app.services.metrics import EXTRACTION_DURATION, EXTRACTION_PAGES, EXTRACTION_PAGES_PER_SECOND
+from app.services.search_index import corpus_index
+from app.utils.pdf_parser import extract_text_from_file
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Ingestion settings (override via environment)
+INGESTION_WORKERS = int(os.getenv("INGESTION_WORKERS", "2"))
+INGESTION_QUEUE_SIZE = int(os.getenv("INGESTION_QUEUE_SIZE", "100"))
+# Finished jobs stay visible to status polling for this long
+INGESTION_JOB_RETENTION_SECONDS = float(os.getenv("INGESTION_JOB_RETENTION_SECONDS", "3600"))
+# How often a running job's progress is copied to the shared store for other workers to report
+INGESTION_STATUS_INTERVAL_SECONDS = float(os.getenv("INGESTION_STATUS_INTERVAL_SECONDS", "0.5"))
+
+class IngestionQueueFull(Exception):
+    """Raised when more uploads are waiting than INGESTION_QUEUE_SIZE allows."""
+
+@dataclass
+class IngestionJob:
+    """Progress of extracting and indexing one uploaded document."""
+    session_id: str
+    filename: str
+    file_path: Path
+    sha256: str
+    status: str = "queued" # queued -> extracting -> indexing -> done | failed
+    pages_done: int = 0
+    pages_total: Optional[int] = None
+    characters: Optional[int] = None
+    cached: bool = False
+    error: Optional[str] = None
+    created_at: float = field(default_factory=time.time)
+    finished_at: Optional[float] = None
+
+    @property
+    def finished(self) -> bool:
+        return self.status in ("done", "failed")
+
+    def to_dict(self) -> Dict[str, Any]:
+        data = asdict(self)
+        data.pop("file_path")
+        data.pop("sha256")
+        return data
+
+    def _progress(self, pages_done: int, pages_total: int) -> None:
+        # Called from extraction threads; plain attribute writes are safe here
+        self.pages_done = pages_done
+        self.pages_total = pages_total
+
+def _record_extraction(job: IngestionJob, seconds: float) -> None:
+    """Exports extraction time and throughput for /metrics."""
+    file_type = Path(job.filename).suffix.lower().lstrip(".") or "unknown"
+    pages = job.pages_total or 0
+    EXTRACTION_DURATION.labels(file_type=file_type).observe(seconds)
+    EXTRACTION_PAGES.labels(file_type=file_type).inc(pages)
+    if pages and seconds > 0:
+        EXTRACTION_PAGES_PER_SECOND.labels(file_type=file_type).observe(pages / seconds)
+
+def _start_digest(session_id: str, text: str, key: str) -> None:
+    """
+    Starts extracting the key facts of a chat upload (see digest.py) while it costs a single LLM call.
+
+    Longer documents would need a map-reduce summary first, so they are
+    digested on their first overview question instead (see langgraph_flow.call_llm).
+    """
+    from app.services import digest, langgraph_flow # The LLM stack is loaded on first use
+    if not digest.DOCUMENT_DIGEST_ENABLED:
+        return
+    llm = langgraph_flow.get_chat_llm()
+    if llm is not None and digest.digest_fits_one_prompt(llm, text):
+        digest.start_digest(llm, text, key, session_id)
+
+async def ingest_document(job: IngestionJob, with_digest: bool = True) -> Optional[str]:
+    """
+    Extracts, stores and indexes an uploaded document, updating the job as it goes. Returns the extracted text.
+
+    Set with_digest=False for documents that are not chatted about, e.g. in batch analysis.
+    """
+    job.status = "extracting"
+    # Identical uploads (same bytes and type) are parsed once and served from the cache
+    content_key = cache_key(job.sha256, job.filename)
+    try:
+        extracted_content = await asyncio.to_thread(extraction_cache.get_text, content_key)
+        if extracted_content is not None:
+            job.cached = True
+        else:
+            # Extract text based on file type
+            started = time.perf_counter()
+            extracted_content = await extract_text_from_file(job.file_path, job.filename, progress=job._progress)
+            _record_extraction(job, time.perf_counter() - started)
+            if extracted_content:
+                await asyncio.to_thread(extraction_cache.put_text, content_key, extracted_content)
+    finally:
+        # Only the extracted text is kept; the upload itself is not needed past this point
+        job.file_path.unlink(missing_ok=True)
+
+    if not extracted_content:
+        logger.warning(f"Could not extract text from {job.filename} or unsupported type.")
+        # Proceed without context; the chat still works for general questions
+        await asyncio.to_thread(document_store.__setitem__, job.session_id, "")
+    else:
+        logger.info(f"Extracted {len(extracted_content)} characters from {job.filename}.")
+        job.status = "indexing"
+        # Indexes, summaries and the digest are cached under the text's hash, which the
+        # document store keeps with the session so any worker can load them later
+        document_key = await asyncio.to_thread(document_hash, extracted_content)
+        # Chunk and index the text now so chat turns only pull relevant excerpts
+        document_indexes[document_key] = await asyncio.to_thread(extraction_cache.get_or_build_index, document_key, extracted_content)
+        # Numbered sections, defined terms and exhibits, for questions that name them
+        document_structures[document_key] = await asyncio.to_thread(extraction_cache.get_or_build_structure, document_key, extracted_content)
+        # Add it to the persistent corpus-wide search index as well
+        await asyncio.to_thread(corpus_index.add_document, job.session_id, job.filename, extracted_content, document_key)
+        # Stored last, so a session only shows as having a document once it is fully searchable
+        await asyncio.to_thread(document_store.put, job.session_id, extracted_content, document_key)
+        if with_digest:
+            # Not awaited: the document is usable now, the digest only makes overview questions cheaper
+            _start_digest(job.session_id, extracted_content, document_key)
+
+    job.characters = len(extracted_content or "")
+    job.status = "done"
+    return extracted_content
+
+class IngestionQueue:
+    """
+    Bounded queue of ingestion jobs processed by a fixed number of asyncio workers.
+
+    Workers are started with the application (see main.py). If they are not
+    running, e.g. when the app is driven without its lifespan, submitted jobs
+    are processed inline instead.
+
+    Jobs run on the worker process that received the upload, but their
+    progress is mirrored to the shared document store, so `status` works
+    from any worker process.
+    """
+
+    def __init__(self, workers: int = INGESTION_WORKERS, max_queued: int = INGESTION_QUEUE_SIZE):
+        self.workers = workers
+        self.max_queued = max_queued
+        self.jobs: Dict[str, IngestionJob] = {}
+        self._queue: Optional[asyncio.Queue] = None
+        self._tasks: List[asyncio.Task] = []
+
+    @property
+    def running(self) -> bool:
+        return bool(self._tasks)
+
+    def start(self) -> None:
+        """Starts the worker tasks on the running event loop."""
+        if self.running:
+            return
+        self._queue = asyncio.Queue(maxsize=self.max_queued)
+        self._tasks = [asyncio.create_task(self._worker(i)) for i in range(self.workers)]
+        logger.info(f"Started {self.workers} ingestion workers (queue size {self.max_queued}).")
+
+    async def stop(self) -> None:
+        """Cancels the workers; jobs still queued are marked failed."""
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        while self._queue is not None and not self._queue.empty():
+            job = self._queue.get_nowait()
+            job.status, job.error = "failed", "Server shut down before processing"
+            job.finished_at = time.time()
+            await self._publish(job)
+        self._queue = None
+
+    async def submit(self, job: IngestionJob) -> IngestionJob:
+        """Queues a job, raising IngestionQueueFull when the backlog is at capacity."""
+        await self._prune_finished()
+        self.jobs[job.session_id] = job
+        if not self.running:
+            await self._run(job)
+            return job
+        try:
+            self._queue.put_nowait(job)
+        except asyncio.QueueFull:
+            del self.jobs[job.session_id]
+            raise IngestionQueueFull()
+        await self._publish(job) # Visible to other workers before the client is redirected
+        logger.info(f"Queued ingestion of {job.filename} for session {job.session_id} ({self._queue.qsize()} waiting)")
+        return job
+
+    async def status(self, session_id: str) -> Optional[Dict[str, Any]]:
+        """Progress of the session's upload, whichever worker process is ingesting it."""
+        job = self.jobs.get(session_id)
+        if job is not None:
+            return job.to_dict()
+        return await asyncio.to_thread(document_store.get_job, session_id)
+
+    def queued(self) -> int:
+        return self._queue.qsize() if self._queue is not None else 0
+
+    async def _worker(self, worker_id: int) -> None:
+        while True:
+            job = await self._queue.get()
+            try:
+                await self._run(job)
+            finally:
+                self._queue.task_done()
+
+    async def _publish(self, job: IngestionJob) -> None:
+        try:
+            await asyncio.to_thread(document_store.put_job, job.session_id, job.to_dict())
+        except Exception as e:
+            # Only other workers' status polls depend on it; ingestion goes on
+            logger.error(f"Could not publish ingestion status for session {job.session_id}: {e}")
+
+    async def _publish_progress(self, job: IngestionJob, finished: asyncio.Event) -> None:
+        """Copies the job's progress to the shared store whenever it changes, until the job finishes."""
+        published = None
+        while True:
+            current = job.to_dict()
+            if current != published:
+                await self._publish(job)
+                published = current
+            if finished.is_set():
+                return
+            try:
+                await asyncio.wait_for(finished.wait(), INGESTION_STATUS_INTERVAL_SECONDS)
+            except asyncio.TimeoutError:
+                pass
+
+    async def _run(self, job: IngestionJob) -> None:
+        started = time.perf_counter()
+        finished = asyncio.Event()
+        publisher = asyncio.create_task(self._publish_progress(job, finished))
+        try:
+            await ingest_document(job)
+            logger.info(f"Ingested {job.filename} for session {job.session_id} in {time.perf_counter() - started:.2f}s")
+        except Exception as e:
+            logger.error(f"Error ingesting {job.filename} for session {job.session_id}: {e}", exc_info=True)
+            job.status, job.error = "failed", "Failed to process file"
+        finally:
+            job.finished_at = time.time()
+            finished.set()
+            await publisher # Publishes the final state
+
+    async def _prune_finished(self) -> None:
+        cutoff = time.time() - INGESTION_JOB_RETENTION_SECONDS
+        for session_id in [s for s, j in self.jobs.items() if j.finished and (j.finished_at or 0) < cutoff]:
+            del self.jobs[session_id]
+        await asyncio.to_thread(document_store.prune_jobs, INGESTION_JOB_RETENTION_SECONDS)
+
+# Shared queue used by the upload route
+ingestion_queue = IngestionQueue()
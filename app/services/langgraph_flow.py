@@ -1,18 +1,58 @@
 # app/services/langgraph_flow.py
+import time
+import asyncio
 import logging
-from typing import TypedDict, Annotated, Sequence, Dict, Any, Optional
+import threading
+from typing import TypedDict, Annotated, Sequence, Dict, Any, Optional, AsyncIterator, List, Tuple
 import operator
 
 from langchain_core.messages import BaseMessage, HumanMessage, AIMessage, SystemMessage
+from langchain_core.runnables import RunnableConfig
 from langgraph.graph import StateGraph, END
-from langgraph.checkpoint.memory import MemorySaver # In-memory checkpointing for demo
 
-from app.services.groq_client import chat_llm # Use the initialized ChatGroq instance
-from app.utils.contract_templates import get_contract_prompt
+from app.services import groq_client
+from app.services.checkpoint_store import SqliteCheckpointSaver
+from app.services.llm_cache import cached_ainvoke
+from app.services.llm_scheduler import Priority
+from app.services.metrics import GRAPH_NODE_DURATION, timed_node
+from app.services.resilience import CircuitOpenError
+from app.services.single_flight import TOKEN_EVENT
+from app.services.history import HISTORY_TOKEN_BUDGET, message_tokens, messages_to_fold, recent_window_start, summarize_messages
+from app.services.token_usage import usage_scope
+from app.utils.tokens import estimate_tokens, prompt_budget, truncate_to_tokens
+from app.services.document_store import document_store
+from app.services.extraction_cache import document_hash, extraction_cache
+from app.services.retrieval import BM25Index, document_indexes, format_chunks, RETRIEVAL_TOP_K
+from app.services.summarization import needs_whole_document, summarize_document, summary_token_budget
+from app.services.digest import DIGEST_EXCERPT_TOKENS, answers_from_digest, load_digest, start_digest
+from app.services.structure_index import Span, StructureIndex, document_structures, format_spans
+from app.utils.contract_templates import ClauseSection, DraftingOption, extract_jurisdiction, get_contract_prompt, get_contract_sections, get_drafting_options
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+UPSTREAM_UNAVAILABLE_MESSAGE = "The AI service is temporarily unavailable. Please try again in a moment."
+SYSTEM_PROMPT = "You are LegalMind, an AI legal assistant. Be helpful, concise, and informative. Avoid giving legal advice."
+EXCERPT_FRAME = "Based on the following excerpts from the document (cite page numbers where given):\n---\n{excerpts}\n---\n\n{query}"
+DIGEST_FRAME = "Based on the following key facts of the document and excerpts from it (cite page numbers where given):\n---\n{digest}\n---\n{excerpts}\n---\n\n{query}"
+SECTION_FRAME = "Based on the following parts of the document the question refers to (cite section and page numbers):\n---\n{excerpts}\n---\n\n{query}"
+SUMMARY_FRAME = "Based on the following summary of the whole document (page references in brackets):\n---\n{excerpts}\n---\n\n{query}"
+
+# The chat model, checkpointer and compiled graph are created on first use (or by
+# the startup warm-up) rather than at import. Tests and benchmarks may assign
+# chat_llm or app_graph directly to substitute their own.
+chat_llm = None
+memory: Optional[SqliteCheckpointSaver] = None
+app_graph = None
+_init_lock = threading.Lock()
+
+def get_chat_llm():
+    """Returns the chat model used by the flows, or None if it cannot be initialized."""
+    global chat_llm
+    if chat_llm is None:
+        chat_llm = groq_client.get_chat_llm()
+    return chat_llm
+
 # Define the state structure for the graph
 # Define the state structure for the graph
 class AgentState(TypedDict):
@@ -21,30 +61,128 @@ class AgentState(TypedDict):
 
     # For fields where the new value should replace the old one,
     # simply specify the type. LangGraph's default reducer is overwrite.
-    document_context: Optional[str]
+    # Content hash of the session's document. Nodes load the text from
+    # document_store, so checkpoints do not carry a copy of it.
+    document_key: Optional[str]
     task_description: Optional[str]
     contract_details: Optional[Dict[str, Any]]
 
+    # Rolling summary of turns that no longer fit the history token budget,
+    # and how many leading messages it already covers.
+    history_summary: Optional[str]
+    summarized_message_count: Optional[int]
+
+    # Map-reduce summary of a document too long for one prompt, set for
+    # questions about the whole document and cleared on every other turn.
+    document_summary: Optional[str]
+
     # Alternatively, you could explicitly use a lambda for overwrite if preferred:
-    # document_context: Annotated[Optional[str], lambda _, new_value: new_value]
+    # document_key: Annotated[Optional[str], lambda _, new_value: new_value]
     # task_description: Annotated[Optional[str], lambda _, new_value: new_value]
     # contract_details: Annotated[Optional[Dict[str, Any]], lambda _, new_value: new_value]
     # But just using the type is cleaner and more common.
 
+async def _document_key(session_id: Optional[str], text: str) -> str:
+    """Content hash of the session's document as saved at ingestion; only documents that were never ingested are hashed here."""
+    key = await asyncio.to_thread(document_store.document_key, session_id) if session_id else None
+    return key or await asyncio.to_thread(document_hash, text)
+
+async def _document_text(state: AgentState) -> Optional[str]:
+    """The text of the document the state refers to, None if there is none."""
+    key = state.get('document_key')
+    return await asyncio.to_thread(document_store.get_text, key) if key else None
+
+async def _document_indexes(text: str, key: str) -> Tuple[BM25Index, StructureIndex]:
+    """
+    The chunk and structure indexes of the document with content key `key`.
+
+    Indexes not in memory, because this worker did not ingest the document,
+    has restarted or evicted them, are loaded from the extraction cache and
+    only built if they are not cached, in a thread so a large document does
+    not stall the event loop.
+    """
+    index = document_indexes.get(key)
+    structure = document_structures.get(key)
+    if index is None:
+        index = await asyncio.to_thread(extraction_cache.get_or_build_index, key, text)
+        document_indexes[key] = index
+    if structure is None:
+        structure = await asyncio.to_thread(extraction_cache.get_or_build_structure, key, text)
+        document_structures[key] = structure
+    return index, structure
+
+def _select_context(index: BM25Index, query: str, session_id: Optional[str], max_tokens: Optional[int] = None) -> str:
+    """Narrows the document down to the chunks most relevant to the query that fit max_tokens."""
+    selected = index.select(query, RETRIEVAL_TOP_K, max_tokens=max_tokens)
+    logger.info(f"Retrieved {len(selected)} of {len(index)} chunks for session {session_id}.")
+    return format_chunks(selected)
+
+def _select_context_with_definitions(index: BM25Index, text: str, definitions: List[Span], query: str, session_id: Optional[str], max_tokens: int) -> str:
+    """Retrieved excerpts, preceded by the definitions of any terms the query asks the meaning of (in up to half the budget)."""
+    if not definitions:
+        return _select_context(index, query, session_id, max_tokens)
+    defined = format_spans(text, definitions, max_tokens // 2)
+    return f"{defined}\n\n{_select_context(index, query, session_id, max(0, max_tokens - estimate_tokens(defined)))}"
+
+def _usage_scope_of(config: RunnableConfig):
+    """(session ID, endpoint) that token usage of a graph run is charged to."""
+    configurable = config.get("configurable", {})
+    return configurable.get("thread_id"), configurable.get("endpoint", "chat")
+
 # Define the nodes in the graph
-async def call_llm(state: AgentState):
+async def summarize_history(state: AgentState, config: RunnableConfig):
+    """Folds turns that no longer fit the history token budget into the running summary."""
+    messages = list(state['messages'])
+    start = state.get('summarized_message_count') or 0
+    fold = messages_to_fold(messages[start:-1], HISTORY_TOKEN_BUDGET)
+    llm = get_chat_llm() if fold else None
+    if not llm:
+        return {}
+    try:
+        with usage_scope(*_usage_scope_of(config)):
+            summary = await summarize_messages(llm, state.get('history_summary'), messages[start:start + fold])
+    except Exception as e:
+        # call_llm still trims history to the budget, so a failed fold only loses older context
+        logger.error(f"Error summarizing conversation history: {e}", exc_info=True)
+        return {}
+    return {"history_summary": summary, "summarized_message_count": start + fold}
+
+async def summarize_document_node(state: AgentState, config: RunnableConfig):
+    """Summarizes an oversized document chunk by chunk when the question needs all of it."""
+    context = await _document_text(state)
+    query = state['messages'][-1].content if state['messages'] else ""
+    llm = get_chat_llm() if context and needs_whole_document(query) else None
+    if not llm:
+        return {"document_summary": None}
+    budget = summary_token_budget(getattr(llm, "model_name", None))
+    if estimate_tokens(context) <= budget:
+        return {"document_summary": None} # Fits as is; retrieval handles it
+    try:
+        with usage_scope(*_usage_scope_of(config)):
+            summary = await summarize_document(llm, context, budget)
+    except CircuitOpenError:
+        logger.warning("Skipping document summarization while the upstream circuit breaker is open.")
+        return {"document_summary": None}
+    except Exception as e:
+        # call_llm falls back to the retrieved excerpts
+        logger.error(f"Error summarizing document: {e}", exc_info=True)
+        return {"document_summary": None}
+    return {"document_summary": summary}
+
+async def call_llm(state: AgentState, config: RunnableConfig):
     """Invokes the LLM with the current state messages."""
-    if not chat_llm:
+    llm = get_chat_llm()
+    if not llm:
          return {"messages": [AIMessage(content="LLM is not available.")]}
     try:
         # Add document context to the prompt if available
         messages_to_send = list(state['messages'])
-        context = state.get('document_context')
+        context = await _document_text(state)
         task = state.get('task_description')
 
         # Construct a better prompt including context and task
         current_prompt = messages_to_send[-1].content
-        system_prompt = "You are LegalMind, an AI legal assistant. Be helpful, concise, and informative. Avoid giving legal advice."
+        system_prompt = SYSTEM_PROMPT
         prompt_with_context = f"{system_prompt}\n\n"
 
         if context:
@@ -58,26 +196,71 @@ async def call_llm(state: AgentState):
         # Or prepend a system message with context? Let's try modifying the last user msg for now.
         # messages_to_send[-1] = HumanMessage(content=prompt_with_context)
         # Alternatively, send context in a system message? Let's just rely on the LLM understanding the structured input.
-        # We might need a RAG setup for better context handling on large docs.
 
-        # For now, let's just add context to the latest query if present
+        # Fit the prompt into the model's context window: the system prompt, summary and
+        # question are fixed; recent history and document excerpts share what is left
+        budget = prompt_budget(getattr(llm, "model_name", None))
+        preamble = [SystemMessage(content=system_prompt)]
+        if state.get('history_summary'):
+            preamble.append(SystemMessage(content=f"Summary of the earlier conversation:\n{state['history_summary']}"))
+        excerpt_frame = EXCERPT_FRAME
+        fixed_tokens = sum(message_tokens(m) for m in preamble) + message_tokens(HumanMessage(content=excerpt_frame.format(excerpts="", query=current_prompt)))
+        available = max(0, budget - fixed_tokens)
+
+        # Send the running summary plus only the recent turns that fit the token budget
+        history = messages_to_send[state.get('summarized_message_count') or 0:-1]
+        history_budget = min(HISTORY_TOKEN_BUDGET, available // 2 if context else available)
+        history = history[recent_window_start(history, history_budget):]
+
+        # Only the top-k chunks relevant to this query are sent, and only as many as fit
         final_user_query = current_prompt
         if context:
-            final_user_query = f"Based on the following document context:\n---\n{context}\n---\n\n{current_prompt}"
-
-        messages_to_send = [SystemMessage(content=system_prompt)] + messages_to_send[:-1] + [HumanMessage(content=final_user_query)]
+            session_id = config.get("configurable", {}).get("thread_id")
+            excerpt_budget = available - sum(message_tokens(m) for m in history)
+            document_key = state['document_key']
+            index, structure = await _document_indexes(context, document_key)
+            # Sections or exhibits the question names are sent as they are; definitions
+            # of terms it asks about are added to whatever context it gets
+            spans = structure.lookup(current_prompt)
+            definitions = structure.lookup_definitions(current_prompt)
+            digest = None
+            if not spans and answers_from_digest(current_prompt):
+                digest = await load_digest(document_key)
+                if digest is None:
+                    # Long documents are only digested once asked about; this answer does without it
+                    start_digest(llm, context, document_key, session_id)
+            if state.get('document_summary'):
+                final_user_query = SUMMARY_FRAME.format(excerpts=truncate_to_tokens(state['document_summary'], excerpt_budget), query=current_prompt)
+            elif spans:
+                final_user_query = SECTION_FRAME.format(excerpts=format_spans(context, spans + definitions, excerpt_budget), query=current_prompt)
+            elif digest is not None:
+                # The digest already covers the document as a whole, so only a few excerpts are needed
+                digest_text = truncate_to_tokens(digest.format(), excerpt_budget // 2)
+                excerpts = _select_context_with_definitions(index, context, definitions, current_prompt, session_id, max(0, min(DIGEST_EXCERPT_TOKENS, excerpt_budget - estimate_tokens(digest_text))))
+                final_user_query = DIGEST_FRAME.format(digest=digest_text, excerpts=excerpts, query=current_prompt)
+            else:
+                excerpts = _select_context_with_definitions(index, context, definitions, current_prompt, session_id, excerpt_budget)
+                final_user_query = excerpt_frame.format(excerpts=excerpts, query=current_prompt)
+
+        messages_to_send = preamble + history + [HumanMessage(content=final_user_query)]
 
         logger.info(f"Calling LLM. State includes context: {bool(context)}, task: {bool(task)}")
-        response = await chat_llm.ainvoke(messages_to_send)
+        bypass_cache = config.get("configurable", {}).get("bypass_cache", False)
+        with usage_scope(*_usage_scope_of(config)):
+            response = await cached_ainvoke(llm, messages_to_send, bypass=bypass_cache)
         logger.info("LLM call successful.")
         return {"messages": [response]} # Append AI response to messages
+    except CircuitOpenError:
+        logger.warning("Skipping LLM call while the upstream circuit breaker is open.")
+        return {"messages": [AIMessage(content=UPSTREAM_UNAVAILABLE_MESSAGE)]}
     except Exception as e:
         logger.error(f"Error calling LLM in LangGraph: {e}", exc_info=True)
         return {"messages": [AIMessage(content="Sorry, I encountered an error processing your request.")]}
 
 async def generate_contract_node(state: AgentState):
     """Generates a contract based on type and details."""
-    if not chat_llm:
+    llm = get_chat_llm()
+    if not llm:
          return {"messages": [AIMessage(content="LLM is not available for contract generation.")]}
 
     contract_type = state.get("contract_details", {}).get("type", "unknown")
@@ -93,10 +276,10 @@ async def generate_contract_node(state: AgentState):
     full_prompt = f"{base_prompt}\n\nPlease incorporate the following details provided by the user:\n{user_details}\n\nGenerate the contract text:"
 
     try:
-        response = await chat_llm.ainvoke([
+        response = await cached_ainvoke(llm, [
             SystemMessage(content="You are an AI assistant tasked with generating contract text based on templates and user-provided details. Fill in placeholders where details are missing."),
             HumanMessage(content=full_prompt)
-        ])
+        ], priority=Priority.BATCH)
         logger.info("Contract generation successful.")
         # Add the generated contract as an AI message
         return {"messages": [AIMessage(content=f"Here is the draft {contract_type.replace('_', ' ').title()}:\n\n```\n{response.content}\n```\nPlease review this draft carefully. It is AI-generated and may require review by a legal professional.")]}
@@ -109,12 +292,16 @@ async def generate_contract_node(state: AgentState):
 workflow = StateGraph(AgentState)
 
 # Add nodes
-workflow.add_node("llm_call", call_llm)
-workflow.add_node("generate_contract", generate_contract_node)
+workflow.add_node("summarize_history", timed_node("summarize_history", summarize_history)) # Timings exported via /metrics
+workflow.add_node("summarize_document", timed_node("summarize_document", summarize_document_node))
+workflow.add_node("llm_call", timed_node("llm_call", call_llm))
+workflow.add_node("generate_contract", timed_node("generate_contract", generate_contract_node))
 
 # Define edges and conditional logic (simplified: always call LLM for now)
 # A real app would have a router node analyzing intent first.
-workflow.set_entry_point("llm_call") # Simplified: start with LLM call
+workflow.set_entry_point("summarize_history") # Keep history within budget, then call the LLM
+workflow.add_edge("summarize_history", "summarize_document") # Map-reduce oversized documents when the question needs all of them
+workflow.add_edge("summarize_document", "llm_call")
 
 # Conditional routing could be added here:
 # workflow.add_conditional_edges(...)
@@ -127,84 +314,175 @@ workflow.set_entry_point("llm_call") # Simplified: start with LLM call
 workflow.add_edge("llm_call", END)
 workflow.add_edge("generate_contract", END) # Contract generation also ends the flow for now
 
-# Compile the graph
-# Add memory for simple state persistence across calls within a "session"
-memory = MemorySaver()
-app_graph = workflow.compile(checkpointer=memory)
-logger.info("LangGraph workflow compiled.")
-
-# Function to run the graph (simplified interface)
-async def run_chat_flow(user_input: str, session_id: str, doc_context: Optional[str] = None):
-    """Runs the chat part of the flow."""
-    config = {"configurable": {"thread_id": session_id}}
+def get_app_graph():
+    """Compiles the graph on first use, persisting session state in SQLite with bounded retention (see checkpoint_store.py)."""
+    global memory, app_graph
+    with _init_lock: # The startup warm-up may race the first request
+        if app_graph is None:
+            memory = SqliteCheckpointSaver()
+            app_graph = workflow.compile(checkpointer=memory)
+            logger.info("LangGraph workflow compiled.")
+    return app_graph
+
+def _build_chat_state(user_input: str, document_key: Optional[str] = None) -> Dict[str, Any]:
+    """Builds the input state for a single chat turn."""
     initial_state = {"messages": [HumanMessage(content=user_input)]}
-    if doc_context:
+    if document_key:
          # Add context to the initial state for this run
-         initial_state["document_context"] = doc_context
+         initial_state["document_key"] = document_key
          initial_state["task_description"] = "Analyze document or answer question based on it."
+    return initial_state
 
-    logger.info(f"Running chat flow for session {session_id}. Context present: {bool(doc_context)}")
-    final_state = await app_graph.ainvoke(initial_state, config=config)
-    # Return only the latest AI message
-    ai_message = next((m for m in reversed(final_state['messages']) if isinstance(m, AIMessage)), None)
+def _latest_ai_content(messages: Sequence[BaseMessage]) -> str:
+    """Returns the content of the most recent AI message."""
+    ai_message = next((m for m in reversed(messages) if isinstance(m, AIMessage)), None)
     return ai_message.content if ai_message else "No response generated."
 
-async def run_contract_flow(contract_type: str, details: str, session_id: str):
-    """Runs the contract generation part of the flow."""
-    config = {"configurable": {"thread_id": f"{session_id}_contract"}} # Separate thread for contract gen?
-    initial_state = {
-         "messages": [], # No chat history needed here directly
-         "contract_details": {"type": contract_type, "details": details}
-     }
-    # We need to route to the 'generate_contract' node.
-    # Since our graph is simple, we can call the node function directly or modify the graph invocation.
-    # Let's refine the graph to handle this.
-
-    # Rebuild graph with routing (Conceptual)
-    # Add router node -> decides if chat or contract
-    # For now, we'll just invoke the contract node logic via the LLM node for simplicity
-    # by crafting a specific input state.
-
-    # Simplified approach: Trigger contract generation via LLM call node
-    # This isn't ideal LangGraph usage but works for this structure.
-    # A better way is conditional edges based on state analysis.
-
-    prompt_for_llm = f"Generate a {contract_type} contract with these details: {details}"
-    generation_state = {
-        "messages": [HumanMessage(content=prompt_for_llm)], # Use LLM to kick off generation
-        "task_description": f"Generate {contract_type}"
-    }
-
-    # Override the graph's entry point? No, let's adjust state/prompt.
-    # Option 1: Call generate_contract_node directly (not using graph state/memory well)
-    # Option 2: Use the LLM node but prime it for generation (using this)
-    # Option 3: Proper routing node (Best practice, more complex setup)
-
-    # Using Option 2 - let the LLM handle the generation request
-    # We need to ensure the call_llm function can understand this.
-    # Let's add specific prompt instructions.
-    system_prompt_gen = f"You are tasked with generating a {contract_type} contract."
-    instruction_prompt = get_contract_prompt(contract_type)
-    if not instruction_prompt:
+# Function to run the graph (simplified interface)
+async def run_chat_flow(user_input: str, session_id: str, document_key: Optional[str] = None, bypass_cache: bool = False):
+    """
+    Runs the chat part of the flow. document_key is the session's document_store.document_key;
+    set bypass_cache to skip the LLM response cache.
+    """
+    config = {"configurable": {"thread_id": session_id, "bypass_cache": bypass_cache, "endpoint": "chat"}}
+    initial_state = _build_chat_state(user_input, document_key)
+
+    logger.info(f"Running chat flow for session {session_id}. Context present: {bool(document_key)}")
+    final_state = await get_app_graph().ainvoke(initial_state, config=config)
+    # Return only the latest AI message
+    return _latest_ai_content(final_state['messages'])
+
+async def stream_chat_flow(user_input: str, session_id: str, document_key: Optional[str] = None, bypass_cache: bool = False) -> AsyncIterator[Dict[str, Any]]:
+    """
+    Runs the chat part of the flow, yielding LLM tokens as they are generated.
+
+    Yields {"type": "token", "content": ...} events while the model streams and a
+    final {"type": "done", "response": ...} event. The graph still runs to completion,
+    so the AI message is committed to the session checkpoint just like run_chat_flow.
+    Cached answers arrive as a single "done" event without tokens.
+    """
+    config = {"configurable": {"thread_id": session_id, "bypass_cache": bypass_cache, "endpoint": "chat_stream"}}
+    initial_state = _build_chat_state(user_input, document_key)
+
+    logger.info(f"Streaming chat flow for session {session_id}. Context present: {bool(document_key)}")
+    graph = get_app_graph()
+    async for event in graph.astream_events(initial_state, config=config, version="v2"):
+        if event.get("metadata", {}).get("langgraph_node") != "llm_call":
+            continue
+        if event["event"] == "on_chat_model_stream":
+            content = event["data"]["chunk"].content
+        elif event["event"] == "on_custom_event" and event["name"] == TOKEN_EVENT:
+            content = event["data"]["content"] # Replayed from an identical request already in flight
+        else:
+            continue
+        if content:
+            yield {"type": "token", "content": content}
+
+    # Read the committed turn back so error fallbacks from call_llm are reported too
+    snapshot = await graph.aget_state(config)
+    yield {"type": "done", "response": _latest_ai_content(snapshot.values.get("messages", []))}
+
+async def answer_document_question(
+    question: str,
+    document_text: str,
+    session_id: str,
+    document_hash: Optional[str] = None,
+    bypass_cache: bool = False,
+) -> str:
+    """
+    Answers one standalone question about a document, outside the chat graph.
+
+    Used for bulk analysis: there is no history and no checkpoint, only the
+    excerpts relevant to the question (the sections it names or, for questions
+    about the whole of a long document, its map-reduce summary) are sent, and the call is
+    scheduled at batch priority so interactive chat turns go first.
+    """
+    llm = get_chat_llm()
+    if not llm:
+        return "LLM is not available."
+    preamble = SystemMessage(content=SYSTEM_PROMPT)
+    fixed_tokens = message_tokens(preamble) + message_tokens(HumanMessage(content=EXCERPT_FRAME.format(excerpts="", query=question)))
+    available = max(0, prompt_budget(getattr(llm, "model_name", None)) - fixed_tokens)
+    with usage_scope(session_id, "batch"):
+        index, structure = await _document_indexes(document_text, await _document_key(session_id, document_text))
+        if needs_whole_document(question) and estimate_tokens(document_text) > available:
+            summary = await summarize_document(llm, document_text, available, priority=Priority.BATCH)
+            prompt = SUMMARY_FRAME.format(excerpts=summary, query=question)
+        elif spans := structure.lookup(question):
+            prompt = SECTION_FRAME.format(excerpts=format_spans(document_text, spans + structure.lookup_definitions(question), available), query=question)
+        else:
+            excerpts = _select_context_with_definitions(index, document_text, structure.lookup_definitions(question), question, session_id, available)
+            prompt = EXCERPT_FRAME.format(excerpts=excerpts, query=question)
+        messages = [preamble, HumanMessage(content=prompt)]
+        response = await cached_ainvoke(llm, messages, bypass=bypass_cache, document_hash=document_hash, priority=Priority.BATCH)
+    return response.content.strip()
+
+async def _draft_clause(
+    contract_name: str,
+    section: ClauseSection,
+    details: str,
+    jurisdiction: Optional[str],
+    options: List[DraftingOption],
+    bypass_cache: bool,
+) -> str:
+    """
+    Drafts the text of one contract clause.
+
+    Boilerplate clauses see only the jurisdiction and the drafting options
+    the user asked for (e.g. a mutual NDA), never the details themselves.
+    """
+    if section.boilerplate:
+        context = "\n".join([f"Jurisdiction: {jurisdiction or '[Jurisdiction]'}", *(option.instructions for option in options)])
+        bypass_cache = False # Shared across requests, so always served from the cache once generated
+    else:
+        context = f"Details provided by the user:\n{details}"
+    messages = [
+        SystemMessage(content=f"You are drafting one clause of a {contract_name} contract. Write clear, concise contract language. Use bracketed placeholders such as [Party 1 Name] for anything not provided."),
+        HumanMessage(content=f"Clause: {section.title}\n{section.instructions}\n\n{context}\n\nWrite only the text of this clause, without a heading or number."),
+    ]
+    response = await cached_ainvoke(get_chat_llm(), messages, bypass=bypass_cache, priority=Priority.BATCH)
+    return response.content.strip()
+
+async def run_contract_flow(contract_type: str, details: str, session_id: str, bypass_cache: bool = False):
+    """
+    Runs the contract generation part of the flow.
+
+    Clauses are drafted concurrently and assembled in template order. Set
+    bypass_cache to redraft the party-specific clauses instead of reusing cached ones.
+    """
+    # Contracts are drafted clause by clause (see contract_templates.py). Boilerplate
+    # clauses get a prompt without party details, so the response cache serves them
+    # after the first request for a contract type, jurisdiction and set of drafting
+    # options; only the party-specific clauses reach the LLM on every request.
+    sections = get_contract_sections(contract_type)
+    if not sections:
         return f"Sorry, contract type '{contract_type}' is not supported."
 
-    user_details_prompt = f"Please incorporate these user details:\n{details}\n\nGenerate the full contract text."
-
-    # Combine prompts for the LLM call
-    messages_for_gen = [
-        SystemMessage(content=system_prompt_gen),
-        HumanMessage(content=instruction_prompt + "\n\n" + user_details_prompt)
-    ]
+    contract_name = contract_type.replace('_', ' ').title()
+    jurisdiction = extract_jurisdiction(details)
+    options = get_drafting_options(contract_type, details)
 
-    logger.info(f"Running contract generation via LLM for session {session_id}")
+    logger.info(f"Running clause-level contract generation ({len(sections)} clauses) for session {session_id}")
+    started = time.perf_counter()
     try:
-        if not chat_llm:
+        if not get_chat_llm():
             return "LLM is not available for contract generation."
-        response = await chat_llm.ainvoke(messages_for_gen)
-        logger.info("Contract generation LLM call successful.")
+        with usage_scope(session_id, "contract"):
+            clauses = await asyncio.gather(*(
+                _draft_clause(contract_name, section, details, jurisdiction, options, bypass_cache) for section in sections
+            ))
+        logger.info("Contract generation LLM calls successful.")
+        # Contracts are drafted outside the graph; report them under the contract node's name
+        GRAPH_NODE_DURATION.labels(node="generate_contract").observe(time.perf_counter() - started)
+        contract_text = f"{contract_name.upper()}\n\n" + "\n\n".join(
+            f"{number}. {section.title}\n{clause}" for number, (section, clause) in enumerate(zip(sections, clauses), start=1)
+        )
         # Format the response similar to the dedicated node
-        return f"Here is the draft {contract_type.replace('_', ' ').title()}:\n\n```\n{response.content}\n```\nPlease review this draft carefully. It is AI-generated and may require review by a legal professional."
+        return f"Here is the draft {contract_name}:\n\n```\n{contract_text}\n```\nPlease review this draft carefully. It is AI-generated and may require review by a legal professional."
 
+    except CircuitOpenError:
+        logger.warning("Skipping contract generation while the upstream circuit breaker is open.")
+        return UPSTREAM_UNAVAILABLE_MESSAGE
     except Exception as e:
         logger.error(f"Error generating contract via LLM: {e}", exc_info=True)
         return "Sorry, I encountered an error generating the contract."
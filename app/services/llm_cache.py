@@ -0,0 +1,236 @@
+# app/services/llm_cache.py
+import os
+import re
+import json
+import asyncio
+import time
+import sqlite3
+import hashlib
+import logging
+import threading
+from collections import OrderedDict
+from pathlib import Path
+from typing import AsyncIterator, Dict, Optional, Sequence, Tuple
+
+from langchain_core.messages import AIMessage, AIMessageChunk, BaseMessage, message_chunk_to_message
+
+from app.services.history import fit_to_budget
+from app.services.token_usage import record_response
+from app.utils.tokens import prompt_budget
+from app.services.resilience import LLM_DEADLINE_SECONDS, DeadlineExceeded, call_with_resilience, check_upstream
+from app.services.llm_scheduler import Grant, Priority, estimate_request_tokens, llm_scheduler
+from app.services.single_flight import Publish, llm_flights
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Response cache settings (override via environment)
+LLM_CACHE_ENABLED = os.getenv("LLM_CACHE_ENABLED", "true").lower() in ("1", "true", "yes")
+LLM_CACHE_MAX_ENTRIES = int(os.getenv("LLM_CACHE_MAX_ENTRIES", "1000"))
+# Optional SQLite file for persisting responses across restarts; empty keeps the cache in memory only
+LLM_CACHE_PATH = os.getenv("LLM_CACHE_PATH", "")
+
+_WHITESPACE_RE = re.compile(r"\s+")
+
+def normalize_prompt(text: str) -> str:
+    """Collapses whitespace and case so trivially different prompts share a cache entry."""
+    return _WHITESPACE_RE.sub(" ", text).strip().casefold()
+
+def cache_key(model: str, temperature: float, messages: Sequence[BaseMessage], document_hash: Optional[str] = None) -> str:
+    """
+    Builds the cache key for one LLM call.
+
+    Covers the model, sampling temperature, every message sent (normalized, with
+    its role) and, where known, the hash of the document the question is about.
+    """
+    payload = json.dumps({
+        "model": model,
+        "temperature": temperature,
+        "document": document_hash,
+        "messages": [[m.type, normalize_prompt(str(m.content))] for m in messages],
+    }, sort_keys=True)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+class LLMResponseCache:
+    """
+    LRU cache of LLM responses with optional SQLite persistence.
+
+    The in-memory layer holds up to `max_entries` responses. When `path` is
+    set, responses are also written to disk and memory misses fall back to it,
+    so the cache survives restarts.
+    """
+
+    def __init__(self, max_entries: int = LLM_CACHE_MAX_ENTRIES, path: Optional[str] = LLM_CACHE_PATH or None):
+        self.max_entries = max_entries
+        self.path = Path(path) if path else None
+        self._entries: "OrderedDict[str, str]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._conn: Optional[sqlite3.Connection] = None
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def _connection(self) -> sqlite3.Connection:
+        """Opens the persistence database on first use. Callers must hold self._lock."""
+        if self._conn is None:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            self._conn = sqlite3.connect(self.path, check_same_thread=False)
+            self._conn.execute("CREATE TABLE IF NOT EXISTS responses (key TEXT PRIMARY KEY, response TEXT NOT NULL, created_at REAL NOT NULL)")
+        return self._conn
+
+    def _remember(self, key: str, response: str) -> None:
+        self._entries[key] = response
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    def get(self, key: str) -> Optional[str]:
+        with self._lock:
+            response = self._entries.get(key)
+            if response is None and self.path is not None:
+                row = self._connection().execute("SELECT response FROM responses WHERE key = ?", (key,)).fetchone()
+                response = row[0] if row else None
+            if response is None:
+                self.misses += 1
+                return None
+            self._remember(key, response)
+            self.hits += 1
+            return response
+
+    def put(self, key: str, response: str) -> None:
+        with self._lock:
+            self._remember(key, response)
+            if self.path is not None:
+                with self._connection() as conn:
+                    conn.execute("INSERT OR REPLACE INTO responses VALUES (?, ?, ?)", (key, response, time.time()))
+
+    async def aget(self, key: str) -> Optional[str]:
+        """Like get, for async callers: a memory hit is answered inline, the SQLite lookup runs in a thread."""
+        with self._lock:
+            response = self._entries.get(key)
+            if response is not None:
+                self._remember(key, response)
+                self.hits += 1
+                return response
+            if self.path is None:
+                self.misses += 1
+                return None
+        return await asyncio.to_thread(self.get, key)
+
+    async def aput(self, key: str, response: str) -> None:
+        """Like put, for async callers; the SQLite write runs in a thread."""
+        if self.path is None:
+            self.put(key, response)
+        else:
+            await asyncio.to_thread(self.put, key, response)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            if self.path is not None:
+                with self._connection() as conn:
+                    conn.execute("DELETE FROM responses")
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {"hits": self.hits, "misses": self.misses, "evictions": self.evictions, "entries": len(self._entries)}
+
+# Shared cache for chat and contract generation
+response_cache = LLMResponseCache()
+
+async def _open_stream(llm, messages: Sequence[BaseMessage]) -> Tuple[Optional[AIMessageChunk], AsyncIterator[AIMessageChunk]]:
+    """Starts a streaming call and waits for its first chunk."""
+    stream = llm.astream(messages)
+    try:
+        first = await anext(stream, None)
+    except BaseException:
+        await stream.aclose()
+        raise
+    return first, stream
+
+async def _open_admitted_stream(llm, messages: Sequence[BaseMessage], grant: Grant) -> Tuple[Grant, Optional[AIMessageChunk], AsyncIterator[AIMessageChunk]]:
+    """Starts a streaming call under a scheduler grant, which stays held until the stream is closed."""
+    try:
+        first, stream = await _open_stream(llm, messages)
+    except BaseException:
+        llm_scheduler.release(grant)
+        raise
+    return grant, first, stream
+
+async def _close_stream(opened: Tuple[Grant, Optional[AIMessageChunk], AsyncIterator[AIMessageChunk]]) -> None:
+    grant, _, stream = opened
+    try:
+        await stream.aclose()
+    finally:
+        llm_scheduler.release(grant)
+
+async def _ainvoke_publishing(llm, messages: Sequence[BaseMessage], publish: Publish, priority: Priority) -> AIMessage:
+    """
+    Calls the LLM, streaming when supported so tokens can be shared with coalesced callers.
+
+    Every try, retries and hedges included, waits for its own scheduler slot,
+    so backoff does not hold one and each upstream request is rate limited.
+    """
+    admit = lambda: llm_scheduler.acquire(priority, estimate_request_tokens(messages))
+    if not hasattr(llm, "astream"):
+        return await call_with_resilience(
+            lambda grant: llm_scheduler.run(grant, lambda: llm.ainvoke(messages), lambda r: record_response(messages, r)),
+            admit=admit,
+        )
+
+    # Only the wait for the first chunk is retried or hedged: tokens already
+    # published cannot be taken back, so a failure mid-stream is raised as is
+    deadline_at = asyncio.get_running_loop().time() + LLM_DEADLINE_SECONDS
+    opened = await call_with_resilience(lambda grant: _open_admitted_stream(llm, messages, grant), admit=admit, discard=_close_stream)
+    grant, first, stream = opened
+    merged: Optional[AIMessageChunk] = None
+    try:
+        async with asyncio.timeout_at(deadline_at):
+            chunk = first
+            while chunk is not None:
+                if chunk.content:
+                    publish(chunk.content)
+                merged = chunk if merged is None else merged + chunk
+                chunk = await anext(stream, None)
+        response = message_chunk_to_message(merged) if merged is not None else AIMessage(content="")
+        grant.actual_tokens = record_response(messages, response)
+    except TimeoutError as e:
+        raise DeadlineExceeded(f"Upstream call did not finish within {LLM_DEADLINE_SECONDS:.0f}s") from e
+    finally:
+        await _close_stream(opened)
+    return response
+
+async def cached_ainvoke(
+    llm,
+    messages: Sequence[BaseMessage],
+    *,
+    bypass: bool = False,
+    document_hash: Optional[str] = None,
+    priority: Priority = Priority.INTERACTIVE,
+) -> AIMessage:
+    """
+    Invokes the LLM, serving byte-identical (after normalization) requests from the cache.
+
+    Concurrent identical requests share one upstream call (see single_flight.py),
+    which is admitted by the rate-limit scheduler at the given priority.
+    Set bypass=True to skip the cache lookup; the fresh result still refreshes the cache.
+    Only successful responses are cached.
+    """
+    # Never send a prompt the model cannot accept; callers select context to fit first
+    messages = fit_to_budget(messages, prompt_budget(getattr(llm, "model_name", None)))
+    key = cache_key(getattr(llm, "model_name", type(llm).__name__), getattr(llm, "temperature", None), messages, document_hash)
+    if LLM_CACHE_ENABLED and not bypass:
+        cached = await response_cache.aget(key)
+        if cached is not None:
+            logger.info(f"LLM response cache hit ({key[:12]})")
+            return AIMessage(content=cached)
+
+    async def fetch(publish: Publish) -> AIMessage:
+        check_upstream()
+        response = await _ainvoke_publishing(llm, messages, publish, priority)
+        if LLM_CACHE_ENABLED:
+            await response_cache.aput(key, response.content)
+        return response
+
+    return await llm_flights.run(key, fetch)
@@ -0,0 +1,215 @@
+# app/services/llm_scheduler.py
+import os
+import time
+import heapq
+import asyncio
+import logging
+import itertools
+from contextlib import asynccontextmanager
+from dataclasses import dataclass, field
+from enum import IntEnum
+from typing import AsyncIterator, Awaitable, Callable, Dict, List, Optional, Sequence, TypeVar
+
+from langchain_core.messages import BaseMessage
+
+from app.services.metrics import LLM_QUEUE_WAIT
+from app.utils.tokens import estimate_tokens
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+# Groq account limits and local concurrency (override via environment; 0 disables a limit)
+GROQ_RPM_LIMIT = int(os.getenv("GROQ_RPM_LIMIT", "30"))
+GROQ_TPM_LIMIT = int(os.getenv("GROQ_TPM_LIMIT", "30000"))
+LLM_MAX_CONCURRENCY = int(os.getenv("LLM_MAX_CONCURRENCY", "4"))
+# Completion length assumed when reserving tokens before a call; corrected with actual usage afterwards
+LLM_COMPLETION_TOKENS_ESTIMATE = int(os.getenv("LLM_COMPLETION_TOKENS_ESTIMATE", "256"))
+
+class Priority(IntEnum):
+    """Scheduling classes; lower values are served first."""
+    INTERACTIVE = 0 # Chat turns a user is waiting on
+    BATCH = 1 # Contract drafting and other bulk work
+
+def estimate_request_tokens(messages: Sequence[BaseMessage]) -> int:
+    """Tokens to reserve for a call: the prompt plus the expected completion."""
+    return sum(estimate_tokens(str(m.content)) for m in messages) + LLM_COMPLETION_TOKENS_ESTIMATE
+
+class TokenBucket:
+    """
+    Per-minute budget that refills continuously.
+
+    A capacity of 0 means unlimited. Requests larger than the capacity are
+    clamped to it, so they run once the bucket is full instead of never.
+    """
+
+    def __init__(self, per_minute: int, clock=time.monotonic):
+        self.capacity = per_minute
+        self.rate = per_minute / 60.0
+        self.level = float(per_minute)
+        self._clock = clock
+        self._updated = clock()
+
+    def _refill(self) -> None:
+        now = self._clock()
+        self.level = min(self.capacity, self.level + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def wait_time(self, amount: int) -> float:
+        """Seconds until `amount` can be consumed."""
+        if self.capacity <= 0:
+            return 0.0
+        self._refill()
+        return max(0.0, (min(amount, self.capacity) - self.level) / self.rate)
+
+    def consume(self, amount: int) -> None:
+        if self.capacity <= 0:
+            return
+        self._refill()
+        self.level -= min(amount, self.capacity)
+
+    def adjust(self, delta: int) -> None:
+        """Charges (or refunds, if negative) the difference between estimated and actual use."""
+        if self.capacity <= 0:
+            return
+        self._refill()
+        self.level = min(self.capacity, self.level - delta)
+
+@dataclass(order=True)
+class _Waiter:
+    priority: int
+    seq: int
+    tokens: int = field(compare=False)
+    future: asyncio.Future = field(compare=False)
+    enqueued_at: float = field(compare=False)
+
+@dataclass
+class Grant:
+    """A granted scheduler slot. Set actual_tokens once usage is known to correct the TPM budget."""
+    priority: Priority
+    estimated_tokens: int
+    queue_wait: float
+    actual_tokens: Optional[int] = None
+
+class LLMScheduler:
+    """
+    Central admission control for upstream LLM calls.
+
+    Calls wait in a priority queue until a concurrency slot is free and the
+    requests-per-minute and tokens-per-minute buckets can cover them. The
+    queue is served strictly by priority, then arrival order, so batch work
+    never takes budget an interactive request is waiting for. Under
+    saturation requests queue up and are released at the sustainable rate
+    instead of all hitting Groq's limits at once.
+    """
+
+    def __init__(self, rpm: int = GROQ_RPM_LIMIT, tpm: int = GROQ_TPM_LIMIT, max_concurrency: int = LLM_MAX_CONCURRENCY):
+        self.requests = TokenBucket(rpm)
+        self.tokens = TokenBucket(tpm)
+        self.max_concurrency = max_concurrency
+        self.active = 0
+        self._waiters: List[_Waiter] = []
+        self._seq = itertools.count()
+        self._timer: Optional[asyncio.TimerHandle] = None
+        self._wait_stats: Dict[Priority, Dict[str, float]] = {
+            p: {"requests": 0, "total_wait_seconds": 0.0, "max_wait_seconds": 0.0} for p in Priority
+        }
+
+    @asynccontextmanager
+    async def slot(self, priority: Priority = Priority.INTERACTIVE, estimated_tokens: int = 0) -> AsyncIterator[Grant]:
+        """Holds a scheduler slot for the duration of one upstream call."""
+        grant = await self.acquire(priority, estimated_tokens)
+        try:
+            yield grant
+        finally:
+            self.release(grant)
+
+    async def acquire(self, priority: Priority = Priority.INTERACTIVE, estimated_tokens: int = 0) -> Grant:
+        loop = asyncio.get_running_loop()
+        waiter = _Waiter(int(priority), next(self._seq), estimated_tokens, loop.create_future(), time.monotonic())
+        heapq.heappush(self._waiters, waiter)
+        self._dispatch()
+        try:
+            await waiter.future
+        except asyncio.CancelledError:
+            if waiter.future.done() and not waiter.future.cancelled():
+                # Granted just as the caller gave up; hand the slot back
+                self.active -= 1
+                self._dispatch()
+            raise
+
+        queue_wait = time.monotonic() - waiter.enqueued_at
+        stats = self._wait_stats[Priority(priority)]
+        stats["requests"] += 1
+        stats["total_wait_seconds"] += queue_wait
+        stats["max_wait_seconds"] = max(stats["max_wait_seconds"], queue_wait)
+        LLM_QUEUE_WAIT.labels(priority=Priority(priority).name.lower()).observe(queue_wait)
+        if queue_wait > 1:
+            logger.info(f"LLM request ({Priority(priority).name.lower()}) waited {queue_wait:.2f}s for rate limits")
+        return Grant(Priority(priority), estimated_tokens, queue_wait)
+
+    def release(self, grant: Grant) -> None:
+        self.active -= 1
+        if grant.actual_tokens is not None:
+            self.tokens.adjust(grant.actual_tokens - grant.estimated_tokens)
+        self._dispatch()
+
+    async def run(self, grant: Grant, call: Callable[[], Awaitable[T]], usage: Optional[Callable[[T], Optional[int]]] = None) -> T:
+        """
+        Makes one upstream call under a grant from `acquire`, releasing it when the call returns or fails.
+
+        Pairs with resilience.call_with_resilience(admit=...), which acquires a
+        grant per try, so retries and hedges are each admitted and no slot is
+        held during backoff. `usage` gives the tokens a result actually used.
+        """
+        try:
+            result = await call()
+            if usage is not None:
+                grant.actual_tokens = usage(result)
+            return result
+        finally:
+            self.release(grant)
+
+    def queued(self) -> int:
+        return sum(1 for w in self._waiters if not w.future.done())
+
+    def stats(self) -> Dict[str, object]:
+        """Queue depth, concurrency and queue-wait metrics per priority class."""
+        waits = {}
+        for priority, s in self._wait_stats.items():
+            waits[priority.name.lower()] = {
+                "requests": int(s["requests"]),
+                "avg_wait_seconds": s["total_wait_seconds"] / s["requests"] if s["requests"] else 0.0,
+                "max_wait_seconds": s["max_wait_seconds"],
+            }
+        return {"active": self.active, "queued": self.queued(), "max_concurrency": self.max_concurrency, "queue_wait": waits}
+
+    def _dispatch(self) -> None:
+        while self._waiters and self.active < self.max_concurrency:
+            waiter = self._waiters[0]
+            if waiter.future.done(): # Cancelled while queued
+                heapq.heappop(self._waiters)
+                continue
+            delay = max(self.requests.wait_time(1), self.tokens.wait_time(waiter.tokens))
+            if delay > 0:
+                self._schedule(delay)
+                return
+            heapq.heappop(self._waiters)
+            self.requests.consume(1)
+            self.tokens.consume(waiter.tokens)
+            self.active += 1
+            waiter.future.set_result(None)
+
+    def _schedule(self, delay: float) -> None:
+        """Re-runs dispatch once the rate-limit buckets have refilled enough."""
+        if self._timer is not None:
+            self._timer.cancel()
+        self._timer = asyncio.get_running_loop().call_later(delay, self._on_timer)
+
+    def _on_timer(self) -> None:
+        self._timer = None
+        self._dispatch()
+
+# Shared scheduler for every Groq call (chat, summaries, contracts, direct completions)
+llm_scheduler = LLMScheduler()
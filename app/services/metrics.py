@@ -0,0 +1,92 @@
+# app/services/metrics.py
+import os
+import time
+import functools
+from typing import Callable, Sequence
+
+from prometheus_client import CONTENT_TYPE_LATEST, REGISTRY, CollectorRegistry, Counter, Histogram, generate_latest
+from prometheus_client.multiprocess import MultiProcessCollector
+from prometheus_client.registry import Collector
+
+# Prometheus instrumentation. With several workers, set PROMETHEUS_MULTIPROC_DIR to an empty
+# directory shared by them: every worker then writes its samples there and a scrape of any
+# worker returns the totals across all of them.
+
+CONTENT_TYPE = CONTENT_TYPE_LATEST
+MULTIPROC_DIR = os.getenv("PROMETHEUS_MULTIPROC_DIR") or os.getenv("prometheus_multiproc_dir")
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+def render(*collectors: Collector) -> bytes:
+    """Renders the process's metrics (or all workers' in multiprocess mode) plus one-off collectors for a scrape."""
+    if MULTIPROC_DIR:
+        registry = CollectorRegistry()
+        MultiProcessCollector(registry)
+    else:
+        registry = REGISTRY
+    body = generate_latest(registry)
+    if collectors:
+        extra = CollectorRegistry(auto_describe=False)
+        for collector in collectors:
+            extra.register(collector)
+        body += generate_latest(extra)
+    return body
+
+# --- Metrics observed directly by the code paths they describe ---
+
+HTTP_REQUEST_DURATION = Histogram(
+    "legalmind_http_request_duration_seconds", "Time to fully serve an HTTP request, by route template.", ("method", "route", "status"),
+    buckets=DEFAULT_BUCKETS,
+)
+GRAPH_NODE_DURATION = Histogram(
+    "legalmind_graph_node_duration_seconds", "Time spent in each LangGraph node.", ("node",), buckets=DEFAULT_BUCKETS,
+)
+EXTRACTION_DURATION = Histogram(
+    "legalmind_extraction_duration_seconds", "Time to extract text from an uploaded document.", ("file_type",), buckets=DEFAULT_BUCKETS,
+)
+EXTRACTION_PAGES = Counter(
+    "legalmind_extraction_pages_total", "Pages extracted from uploaded documents.", ("file_type",),
+)
+EXTRACTION_PAGES_PER_SECOND = Histogram(
+    "legalmind_extraction_pages_per_second", "Extraction throughput per document.", ("file_type",),
+    buckets=(1, 5, 10, 25, 50, 100, 250, 500, 1000, 2500),
+)
+LLM_QUEUE_WAIT = Histogram(
+    "legalmind_llm_queue_wait_seconds", "Time LLM calls waited for the rate-limit scheduler.", ("priority",), buckets=DEFAULT_BUCKETS,
+)
+
+def timed_node(name: str, node: Callable) -> Callable:
+    """Wraps an async LangGraph node so its duration is recorded under GRAPH_NODE_DURATION."""
+    @functools.wraps(node) # Keeps the signature LangGraph inspects to decide whether to pass config
+    async def wrapper(*args, **kwargs):
+        started = time.perf_counter()
+        try:
+            return await node(*args, **kwargs)
+        finally:
+            GRAPH_NODE_DURATION.labels(node=name).observe(time.perf_counter() - started)
+    return wrapper
+
+class MetricsMiddleware:
+    """ASGI middleware timing each HTTP request until its last body chunk is sent (so streams count in full)."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+        started = time.perf_counter()
+        status = {"code": 500}
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                status["code"] = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            # Label by route template, not the raw path, so session IDs do not explode cardinality
+            route = scope.get("route")
+            HTTP_REQUEST_DURATION.labels(
+                method=scope["method"], route=getattr(route, "path", "unmatched"), status=status["code"],
+            ).observe(time.perf_counter() - started)
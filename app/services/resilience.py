@@ -0,0 +1,265 @@
+# app/services/resilience.py
+import os
+import time
+import random
+import asyncio
+import logging
+from collections import deque
+from typing import Any, Awaitable, Callable, Deque, Dict, Optional, TypeVar
+
+import httpx
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+# Upstream resilience settings (override via environment)
+LLM_DEADLINE_SECONDS = float(os.getenv("LLM_DEADLINE_SECONDS", "60"))
+LLM_ATTEMPT_TIMEOUT_SECONDS = float(os.getenv("LLM_ATTEMPT_TIMEOUT_SECONDS", "20"))
+LLM_MAX_RETRIES = int(os.getenv("LLM_MAX_RETRIES", "2"))
+LLM_RETRY_BASE_DELAY_SECONDS = float(os.getenv("LLM_RETRY_BASE_DELAY_SECONDS", "0.5"))
+LLM_RETRY_MAX_DELAY_SECONDS = float(os.getenv("LLM_RETRY_MAX_DELAY_SECONDS", "8"))
+# Hedging sends a second identical request when the first is slower than the
+# observed p95; it costs extra upstream requests, so it is off by default
+LLM_HEDGE_ENABLED = os.getenv("LLM_HEDGE_ENABLED", "false").lower() in ("1", "true", "yes")
+LLM_HEDGE_QUANTILE = float(os.getenv("LLM_HEDGE_QUANTILE", "0.95"))
+LLM_HEDGE_MIN_DELAY_SECONDS = float(os.getenv("LLM_HEDGE_MIN_DELAY_SECONDS", "1.0"))
+LLM_HEDGE_MIN_SAMPLES = 20
+CIRCUIT_FAILURE_THRESHOLD = int(os.getenv("CIRCUIT_FAILURE_THRESHOLD", "5"))
+CIRCUIT_RESET_SECONDS = float(os.getenv("CIRCUIT_RESET_SECONDS", "30"))
+
+RETRYABLE_STATUS_CODES = {408, 409, 429, 500, 502, 503, 504}
+
+class DeadlineExceeded(TimeoutError):
+    """Raised when a call and its retries do not finish within the deadline."""
+
+class CircuitOpenError(Exception):
+    """Raised without calling upstream while the circuit breaker is open."""
+
+def _is_unreachable(error: BaseException) -> bool:
+    """Timeouts and connection failures, where no response came back."""
+    if isinstance(error, (TimeoutError, ConnectionError, httpx.TransportError)):
+        return True
+    # groq.APIConnectionError (including APITimeoutError) has no status code but a request
+    return type(error).__name__ in ("APIConnectionError", "APITimeoutError")
+
+def is_retryable(error: BaseException) -> bool:
+    """Timeouts, connection failures, rate limiting and 5xx responses are worth retrying."""
+    return _is_unreachable(error) or getattr(error, "status_code", None) in RETRYABLE_STATUS_CODES
+
+def is_upstream_failure(error: BaseException) -> bool:
+    """
+    Whether an error says the upstream is unhealthy, and so counts towards opening the circuit breaker.
+
+    Only timeouts, connection failures and 5xx responses do. Client errors
+    such as 400 (a bad prompt) or 401 (a bad key) come from a working
+    upstream and would fail the same way however healthy it is.
+    """
+    if _is_unreachable(error):
+        return True
+    status_code = getattr(error, "status_code", None)
+    return isinstance(status_code, int) and status_code >= 500
+
+def retry_delay(attempt: int, error: Optional[BaseException] = None) -> float:
+    """Full-jitter exponential backoff, honouring a Retry-After header when the upstream sends one."""
+    response = getattr(error, "response", None)
+    retry_after = response.headers.get("retry-after") if response is not None else None
+    if retry_after:
+        try:
+            return min(float(retry_after), LLM_RETRY_MAX_DELAY_SECONDS)
+        except ValueError:
+            pass
+    return random.uniform(0, min(LLM_RETRY_MAX_DELAY_SECONDS, LLM_RETRY_BASE_DELAY_SECONDS * 2 ** attempt))
+
+class LatencyTracker:
+    """Sliding window of successful attempt latencies, used to pick the hedging delay."""
+
+    def __init__(self, window: int = 200):
+        self._samples: Deque[float] = deque(maxlen=window)
+
+    def record(self, seconds: float) -> None:
+        self._samples.append(seconds)
+
+    def quantile(self, q: float) -> Optional[float]:
+        if not self._samples:
+            return None
+        ordered = sorted(self._samples)
+        return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+    def hedge_delay(self) -> Optional[float]:
+        """Seconds to wait before hedging, or None until enough samples are collected."""
+        if len(self._samples) < LLM_HEDGE_MIN_SAMPLES:
+            return None
+        return max(LLM_HEDGE_MIN_DELAY_SECONDS, self.quantile(LLM_HEDGE_QUANTILE))
+
+class CircuitBreaker:
+    """
+    Fails fast while the upstream is degraded.
+
+    After `failure_threshold` consecutive failures the circuit opens and calls
+    raise CircuitOpenError immediately. Once `reset_seconds` have passed, a
+    single trial call is let through (half-open): success closes the circuit,
+    failure opens it again.
+    """
+
+    def __init__(self, failure_threshold: int = CIRCUIT_FAILURE_THRESHOLD, reset_seconds: float = CIRCUIT_RESET_SECONDS, clock=time.monotonic):
+        self.failure_threshold = failure_threshold
+        self.reset_seconds = reset_seconds
+        self._clock = clock
+        self.failures = 0
+        self.opened_at: Optional[float] = None
+        self._trial_in_flight = False
+
+    @property
+    def state(self) -> str:
+        if self.opened_at is None:
+            return "closed"
+        if self._clock() - self.opened_at >= self.reset_seconds:
+            return "half_open"
+        return "open"
+
+    def check(self) -> None:
+        """Raises CircuitOpenError unless a call may proceed now."""
+        state = self.state
+        if state == "open" or (state == "half_open" and self._trial_in_flight):
+            raise CircuitOpenError("Upstream LLM service is unavailable; failing fast.")
+
+    def before_call(self) -> None:
+        self.check()
+        if self.state == "half_open":
+            self._trial_in_flight = True
+
+    def record_success(self) -> None:
+        if self.opened_at is not None:
+            logger.info("Upstream recovered; closing circuit breaker.")
+        self.failures = 0
+        self.opened_at = None
+        self._trial_in_flight = False
+
+    def release_trial(self) -> None:
+        """Ends a call without counting it either way, letting the next half-open trial through."""
+        self._trial_in_flight = False
+
+    def record_failure(self) -> None:
+        self.failures += 1
+        self._trial_in_flight = False
+        if self.opened_at is not None or self.failures >= self.failure_threshold:
+            if self.state != "open":
+                logger.warning(f"Opening circuit breaker after {self.failures} consecutive upstream failures.")
+            self.opened_at = self._clock()
+
+    def stats(self) -> Dict[str, object]:
+        return {"state": self.state, "consecutive_failures": self.failures}
+
+def check_upstream() -> None:
+    """Fails fast with CircuitOpenError while the shared breaker is open, before queueing for a scheduler slot."""
+    llm_breaker.check()
+
+async def _hedged(attempt: Callable[[], Awaitable[T]], delay: Optional[float], discard: Optional[Callable[[T], Awaitable[None]]]) -> T:
+    """Runs attempt(); if it has not finished after `delay`, races a second one and keeps the first success."""
+    tasks = {asyncio.ensure_future(attempt())}
+    try:
+        if delay is not None:
+            done, _ = await asyncio.wait(tasks, timeout=delay)
+            if not done:
+                logger.info(f"Upstream slower than {delay:.2f}s; sending a hedged request.")
+                tasks.add(asyncio.ensure_future(attempt()))
+        error: Optional[BaseException] = None
+        while tasks:
+            done, tasks = await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
+            winners = [t for t in done if t.exception() is None]
+            for extra in winners[1:]:
+                if discard:
+                    await discard(extra.result())
+            if winners:
+                return winners[0].result()
+            error = next(iter(done)).exception()
+        raise error
+    finally:
+        for task in tasks:
+            task.cancel()
+
+async def _attempt_once(
+    attempt: Callable[..., Awaitable[T]],
+    admit: Optional[Callable[[], Awaitable[Any]]],
+    attempt_timeout: float,
+    deadline_at: float,
+    latency: LatencyTracker,
+) -> T:
+    """One upstream request: waits for admission, then runs the attempt within its timeout."""
+    loop = asyncio.get_running_loop()
+    if admit is None:
+        call = attempt
+    else:
+        admission = await admit()
+        call = lambda: attempt(admission)
+    # The timeout starts once admitted, so time spent queueing is not mistaken for a slow upstream
+    started = loop.time()
+    async with asyncio.timeout_at(min(started + attempt_timeout, deadline_at)):
+        result = await call()
+    latency.record(loop.time() - started)
+    return result
+
+async def call_with_resilience(
+    attempt: Callable[..., Awaitable[T]],
+    *,
+    admit: Optional[Callable[[], Awaitable[Any]]] = None,
+    deadline: float = LLM_DEADLINE_SECONDS,
+    attempt_timeout: float = LLM_ATTEMPT_TIMEOUT_SECONDS,
+    max_retries: int = LLM_MAX_RETRIES,
+    hedge: bool = LLM_HEDGE_ENABLED,
+    breaker: Optional[CircuitBreaker] = None,
+    latency: Optional[LatencyTracker] = None,
+    discard: Optional[Callable[[T], Awaitable[None]]] = None,
+) -> T:
+    """
+    Calls an upstream operation with a deadline, retries, optional hedging and circuit breaking.
+
+    `attempt` is called once per try and must start a fresh request each time.
+    Each try is limited to `attempt_timeout` and the whole call, including
+    backoff, to `deadline` seconds. Retryable failures (see is_retryable) are
+    retried with jittered backoff; others are raised immediately. `discard`
+    cleans up the result of a hedged try that finished but lost the race.
+
+    With `admit`, every try (hedges included) first awaits `admit()`, e.g. a
+    rate-limit scheduler slot, and `attempt` is called with its result. The
+    attempt owns that admission and must release it, so nothing is held
+    during backoff.
+    """
+    breaker = breaker or llm_breaker
+    latency = latency or llm_latency
+    loop = asyncio.get_running_loop()
+    deadline_at = loop.time() + deadline
+    retries = 0
+    while True:
+        breaker.before_call()
+        try:
+            result = await asyncio.wait_for(
+                _hedged(lambda: _attempt_once(attempt, admit, attempt_timeout, deadline_at, latency), latency.hedge_delay() if hedge else None, discard),
+                timeout=deadline_at - loop.time(), # Also bounds the wait for admission
+            )
+        except Exception as e:
+            if is_upstream_failure(e):
+                breaker.record_failure()
+            elif getattr(e, "status_code", None) is not None:
+                breaker.record_success() # An error response, but the upstream is up
+            else:
+                breaker.release_trial() # Says nothing about the upstream either way
+            if isinstance(e, asyncio.TimeoutError) and deadline_at - loop.time() <= 0:
+                raise DeadlineExceeded(f"Upstream call did not finish within {deadline:.0f}s") from e
+            if not is_retryable(e) or retries >= max_retries:
+                raise
+            delay = retry_delay(retries, e)
+            if loop.time() + delay >= deadline_at:
+                raise DeadlineExceeded(f"Upstream call did not finish within {deadline:.0f}s") from e
+            retries += 1
+            logger.warning(f"Upstream call failed ({type(e).__name__}: {e}); retry {retries}/{max_retries} in {delay:.2f}s")
+            await asyncio.sleep(delay)
+            continue
+        breaker.record_success()
+        return result
+
+# Shared state for Groq calls
+llm_breaker = CircuitBreaker()
+llm_latency = LatencyTracker()
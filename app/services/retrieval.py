@@ -0,0 +1,133 @@
+# app/services/retrieval.py
+import os
+import re
+import math
+import logging
+from collections import Counter
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Tuple
+
+from app.utils.lru import LRUCache
+from app.utils.pdf_parser import PAGE_BREAK
+from app.utils.tokens import estimate_tokens
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Chunking / retrieval settings (override via environment)
+CHUNK_SIZE_WORDS = int(os.getenv("RETRIEVAL_CHUNK_SIZE_WORDS", "200"))
+CHUNK_OVERLAP_WORDS = int(os.getenv("RETRIEVAL_CHUNK_OVERLAP_WORDS", "40"))
+RETRIEVAL_TOP_K = int(os.getenv("RETRIEVAL_TOP_K", "4"))
+# Document indexes kept in memory; less recently used ones are reloaded from the extraction cache
+INDEX_CACHE_MAX_DOCUMENTS = int(os.getenv("INDEX_CACHE_MAX_DOCUMENTS", "64"))
+
+_TOKEN_RE = re.compile(r"[a-z0-9]+")
+# Very common words that carry no retrieval signal
+_STOPWORDS = frozenset(
+    "a an and are as at be by for from has have in is it its of on or that the this to was were will with".split()
+)
+
+@dataclass(frozen=True)
+class Chunk:
+    """A contiguous piece of a document's extracted text."""
+    index: int
+    text: str
+    page: Optional[int] = None # 1-based page number, None if the source has no pages
+
+def tokenize(text: str) -> List[str]:
+    """Lowercases and splits text into index terms, dropping stopwords."""
+    return [t for t in _TOKEN_RE.findall(text.lower()) if t not in _STOPWORDS]
+
+def chunk_text(text: str, chunk_size: int = CHUNK_SIZE_WORDS, overlap: int = CHUNK_OVERLAP_WORDS) -> List[Chunk]:
+    """
+    Splits extracted text into overlapping word windows.
+
+    Chunks never span a page break, so each chunk can be cited by page.
+    Text without page breaks (e.g. TXT uploads) gets chunks with page=None.
+    """
+    pages = text.split(PAGE_BREAK)
+    has_pages = len(pages) > 1
+    step = max(1, chunk_size - overlap)
+
+    chunks: List[Chunk] = []
+    for page_num, page_text in enumerate(pages, start=1):
+        words = page_text.split()
+        for start in range(0, len(words), step):
+            window = words[start:start + chunk_size]
+            chunks.append(Chunk(index=len(chunks), text=" ".join(window), page=page_num if has_pages else None))
+            if start + chunk_size >= len(words):
+                break
+    return chunks
+
+class BM25Index:
+    """In-memory Okapi BM25 index over the chunks of one document."""
+
+    def __init__(self, chunks: List[Chunk], k1: float = 1.5, b: float = 0.75):
+        self.chunks = chunks
+        self.k1 = k1
+        self.b = b
+        # term -> list of (chunk index, term frequency)
+        self._postings: Dict[str, List[Tuple[int, int]]] = {}
+        self._lengths: List[int] = []
+
+        for chunk in chunks:
+            terms = Counter(tokenize(chunk.text))
+            self._lengths.append(sum(terms.values()))
+            for term, tf in terms.items():
+                self._postings.setdefault(term, []).append((chunk.index, tf))
+
+        self._avg_length = (sum(self._lengths) / len(self._lengths)) if self._lengths else 0.0
+        n = len(chunks)
+        self._idf = {
+            term: math.log(1 + (n - len(postings) + 0.5) / (len(postings) + 0.5))
+            for term, postings in self._postings.items()
+        }
+
+    def __len__(self) -> int:
+        return len(self.chunks)
+
+    def search(self, query: str, k: int = RETRIEVAL_TOP_K) -> List[Tuple[Chunk, float]]:
+        """Returns up to k (chunk, score) pairs for the query, best first."""
+        scores: Dict[int, float] = {}
+        for term in set(tokenize(query)):
+            idf = self._idf.get(term)
+            if idf is None:
+                continue
+            for idx, tf in self._postings[term]:
+                norm = self.k1 * (1 - self.b + self.b * self._lengths[idx] / self._avg_length)
+                scores[idx] = scores.get(idx, 0.0) + idf * tf * (self.k1 + 1) / (tf + norm)
+
+        ranked = sorted(scores.items(), key=lambda item: item[1], reverse=True)[:k]
+        return [(self.chunks[idx], score) for idx, score in ranked]
+
+    def select(self, query: str, k: int = RETRIEVAL_TOP_K, max_tokens: Optional[int] = None) -> List[Chunk]:
+        """
+        Picks the chunks to show the LLM for a query, in document order.
+
+        Falls back to the opening chunks when nothing matches (e.g. "summarize this").
+        With max_tokens, the best-scoring chunks are taken only while they fit.
+        """
+        hits = [chunk for chunk, _ in self.search(query, k)]
+        if not hits:
+            hits = self.chunks[:k]
+        if max_tokens is not None:
+            fitting, used = [], 0
+            for chunk in hits:
+                cost = estimate_tokens(chunk.text)
+                if used + cost <= max_tokens:
+                    fitting.append(chunk)
+                    used += cost
+            hits = fitting
+        return sorted(hits, key=lambda chunk: chunk.index)
+
+def format_chunks(chunks: List[Chunk]) -> str:
+    """Renders selected chunks with page references for inclusion in a prompt."""
+    parts = []
+    for chunk in chunks:
+        label = f"[Excerpt {chunk.index + 1}, page {chunk.page}]" if chunk.page else f"[Excerpt {chunk.index + 1}]"
+        parts.append(f"{label}\n{chunk.text}")
+    return "\n\n".join(parts)
+
+# Indexes in memory, keyed by the document's content hash (see extraction_cache.document_hash),
+# so sessions with identical uploads share one and memory stays bounded however many sessions there are
+document_indexes: LRUCache[BM25Index] = LRUCache(INDEX_CACHE_MAX_DOCUMENTS)
@@ -0,0 +1,213 @@
+# app/services/search_index.py
+import os
+import re
+import time
+import sqlite3
+import logging
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+from app.services.document_store import document_store
+from app.services.extraction_cache import document_hash
+from app.services.retrieval import chunk_text, tokenize
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+SEARCH_INDEX_PATH = Path(os.getenv("SEARCH_INDEX_PATH", "data/search_index.sqlite3"))
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS corpus_contents (
+    content_key TEXT PRIMARY KEY,
+    chunk_count INTEGER NOT NULL,
+    added_at REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS corpus_sessions (
+    session_id TEXT PRIMARY KEY,
+    content_key TEXT NOT NULL,
+    filename TEXT NOT NULL,
+    added_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS corpus_sessions_by_content ON corpus_sessions (content_key);
+CREATE VIRTUAL TABLE IF NOT EXISTS corpus_passages USING fts5(
+    text,
+    content_key UNINDEXED,
+    chunk_index UNINDEXED,
+    page UNINDEXED,
+    tokenize = 'porter unicode61'
+);
+"""
+
+def _to_match_query(query: str) -> str:
+    """
+    Converts free text into a safe FTS5 MATCH expression.
+
+    A query wrapped in double quotes is searched as an exact phrase
+    (e.g. "confidential information"); otherwise any term may match
+    and BM25 ranking puts passages matching more terms first.
+    """
+    stripped = query.strip()
+    if len(stripped) > 1 and stripped.startswith('"') and stripped.endswith('"'):
+        # Keep every word, stopwords included: FTS5 indexed them, so dropping one breaks the phrase
+        phrase = " ".join(stripped[1:-1].split())
+        if not re.search(r"\w", phrase):
+            return ""
+        return '"' + phrase.replace('"', '""') + '"'
+    terms = tokenize(query)
+    return " OR ".join(f'"{term}"' for term in terms)
+
+class CorpusIndex:
+    """
+    Persistent full-text index over every ingested document.
+
+    Backed by an SQLite FTS5 table so it survives restarts and supports
+    incremental add/delete. Each document is stored as the same page-aligned
+    chunks used for per-session retrieval, so hits can be cited by page.
+    Passages are stored once per content hash and sessions only link to them,
+    so identical uploads do not repeat each other's hits. Methods are
+    blocking; call them via asyncio.to_thread from async code.
+    """
+
+    def __init__(self, path: Path):
+        self.path = Path(path)
+        self._initialized = False
+
+    def _connect(self) -> sqlite3.Connection:
+        if not self._initialized:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+        conn = sqlite3.connect(self.path)
+        if not self._initialized:
+            conn.executescript(_SCHEMA)
+            self._initialized = True
+        return conn
+
+    def add_document(self, doc_id: str, filename: str, text: str, content_key: Optional[str] = None) -> int:
+        """
+        Indexes (or re-indexes) a session's document; pass content_key if the text's hash is already known.
+
+        Returns the number of passages the document has; text already indexed
+        for another session is linked rather than indexed again.
+        """
+        content_key = content_key or document_hash(text)
+        conn = self._connect()
+        try:
+            with conn: # The session row is written first, so a concurrent delete cannot drop the passages in between
+                previous = conn.execute("SELECT content_key FROM corpus_sessions WHERE session_id = ?", (doc_id,)).fetchone()
+                conn.execute(
+                    "INSERT OR REPLACE INTO corpus_sessions (session_id, content_key, filename, added_at) VALUES (?, ?, ?, ?)",
+                    (doc_id, content_key, filename, time.time()),
+                )
+                if previous is not None and previous[0] != content_key:
+                    self._delete_unreferenced(conn, previous[0])
+                existing = conn.execute("SELECT chunk_count FROM corpus_contents WHERE content_key = ?", (content_key,)).fetchone()
+                if existing is not None:
+                    chunk_count, indexed = existing[0], False
+                else:
+                    chunks = chunk_text(text)
+                    conn.executemany(
+                        "INSERT INTO corpus_passages (text, content_key, chunk_index, page) VALUES (?, ?, ?, ?)",
+                        [(chunk.text, content_key, chunk.index, chunk.page) for chunk in chunks],
+                    )
+                    conn.execute(
+                        "INSERT INTO corpus_contents (content_key, chunk_count, added_at) VALUES (?, ?, ?)",
+                        (content_key, len(chunks), time.time()),
+                    )
+                    chunk_count, indexed = len(chunks), True
+        finally:
+            conn.close()
+        if indexed:
+            logger.info(f"Added document {doc_id} ({filename}) to corpus index with {chunk_count} passages.")
+        else:
+            logger.info(f"Linked document {doc_id} ({filename}) to its already indexed text.")
+        return chunk_count
+
+    def _delete_unreferenced(self, conn: sqlite3.Connection, content_key: str) -> None:
+        if conn.execute("SELECT 1 FROM corpus_sessions WHERE content_key = ?", (content_key,)).fetchone() is None:
+            conn.execute("DELETE FROM corpus_passages WHERE content_key = ?", (content_key,))
+            conn.execute("DELETE FROM corpus_contents WHERE content_key = ?", (content_key,))
+
+    def delete_document(self, doc_id: str) -> bool:
+        """Removes a session's document, and its passages once no other session shares them. Returns False if it was not indexed."""
+        return self.delete_documents([doc_id]) > 0
+
+    def delete_documents(self, doc_ids: List[str]) -> int:
+        """Removes several sessions' documents (see delete_document). Returns how many were indexed."""
+        deleted = []
+        conn = self._connect()
+        try:
+            with conn:
+                for doc_id in doc_ids:
+                    row = conn.execute("SELECT content_key FROM corpus_sessions WHERE session_id = ?", (doc_id,)).fetchone()
+                    if row is not None:
+                        conn.execute("DELETE FROM corpus_sessions WHERE session_id = ?", (doc_id,))
+                        self._delete_unreferenced(conn, row[0])
+                        deleted.append(doc_id)
+        finally:
+            conn.close()
+        if deleted:
+            logger.info(f"Removed {len(deleted)} documents from corpus index.")
+        return len(deleted)
+
+    def search(self, query: str, limit: int = 10) -> List[Dict[str, Any]]:
+        """
+        Returns the best matching passages across all documents, best first.
+
+        Each passage appears once, however many sessions uploaded its document:
+        doc_id and filename are those of the latest upload and session_ids lists all of them.
+        """
+        match = _to_match_query(query)
+        if not match:
+            return []
+        conn = self._connect()
+        try:
+            rows = conn.execute(
+                """
+                SELECT content_key, page, chunk_index, snippet(corpus_passages, 0, '[', ']', '...', 24), bm25(corpus_passages)
+                FROM corpus_passages
+                WHERE corpus_passages MATCH ?
+                ORDER BY bm25(corpus_passages)
+                LIMIT ?
+                """,
+                (match, limit),
+            ).fetchall()
+            content_keys = list({row[0] for row in rows})
+            uploads: Dict[str, List[Tuple[str, str]]] = {}
+            if content_keys:
+                for content_key, session_id, filename in conn.execute(
+                    f"""
+                    SELECT content_key, session_id, filename FROM corpus_sessions
+                    WHERE content_key IN ({",".join("?" * len(content_keys))})
+                    ORDER BY added_at DESC
+                    """,
+                    content_keys,
+                ):
+                    uploads.setdefault(content_key, []).append((session_id, filename))
+        finally:
+            conn.close()
+        # FTS5's bm25() is lower-is-better; flip the sign so higher scores rank first
+        return [
+            {
+                "doc_id": uploads[content_key][0][0],
+                "filename": uploads[content_key][0][1],
+                "session_ids": [session_id for session_id, _ in uploads[content_key]],
+                "page": page,
+                "chunk_index": chunk_index,
+                "snippet": snippet,
+                "score": -score,
+            }
+            for content_key, page, chunk_index, snippet, score in rows
+            if content_key in uploads
+        ]
+
+    def document_count(self) -> int:
+        """Distinct documents indexed; identical uploads count once."""
+        conn = self._connect()
+        try:
+            return conn.execute("SELECT COUNT(*) FROM corpus_contents").fetchone()[0]
+        finally:
+            conn.close()
+
+# Shared instance used by the upload and search routes
+corpus_index = CorpusIndex(SEARCH_INDEX_PATH)
+# Sessions the document store expires no longer exist, so their hits are dropped too
+document_store.add_expiry_listener(corpus_index.delete_documents)
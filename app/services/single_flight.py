@@ -0,0 +1,104 @@
+# app/services/single_flight.py
+import asyncio
+import logging
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+from langchain_core.callbacks.manager import adispatch_custom_event
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Custom callback event carrying tokens replayed to coalesced callers, so
+# streaming consumers (stream_chat_flow) see them like regular model tokens
+TOKEN_EVENT = "llm_token"
+
+Publish = Callable[[str], None]
+
+class _Flight:
+    """One in-flight upstream call and the tokens it has produced so far."""
+
+    def __init__(self):
+        self.task: Optional[asyncio.Task] = None
+        self.tokens: List[str] = []
+        self.listeners: List[asyncio.Queue] = []
+
+    def publish(self, token: str) -> None:
+        self.tokens.append(token)
+        for queue in self.listeners:
+            queue.put_nowait(token)
+
+    def finish(self) -> None:
+        for queue in self.listeners:
+            queue.put_nowait(None)
+
+    def listen(self) -> asyncio.Queue:
+        """Returns a queue that replays the tokens so far, then new ones, then None at the end."""
+        queue: asyncio.Queue = asyncio.Queue()
+        for token in self.tokens:
+            queue.put_nowait(token)
+        if self.task.done():
+            queue.put_nowait(None)
+        self.listeners.append(queue)
+        return queue
+
+class SingleFlight:
+    """
+    Coalesces concurrent identical requests into one upstream call.
+
+    The first caller for a key starts the call; callers arriving while it is
+    in flight wait for the same result (or exception) instead of making their
+    own. Tokens the call publishes are re-emitted to waiting callers as
+    TOKEN_EVENT callback events, so their streams fill in as well. The call
+    runs in its own task, so it completes even if the caller that started it
+    disconnects.
+    """
+
+    def __init__(self):
+        self._flights: Dict[str, _Flight] = {}
+        self.calls = 0
+        self.coalesced = 0
+
+    async def run(self, key: str, call: Callable[[Publish], Awaitable[Any]]) -> Any:
+        """Runs call(publish) once per key at a time and returns its result to every caller."""
+        flight = self._flights.get(key)
+        if flight is None:
+            flight = _Flight()
+            self._flights[key] = flight
+            flight.task = asyncio.create_task(self._run_flight(key, flight, call))
+            self.calls += 1
+            return await asyncio.shield(flight.task)
+
+        self.coalesced += 1
+        logger.info(f"Coalescing request {key[:12]} with an in-flight call")
+        await self._replay_tokens(flight)
+        result = await asyncio.shield(flight.task)
+        # Each caller gets its own copy, since messages end up in separate session states
+        return result.model_copy() if hasattr(result, "model_copy") else result
+
+    def in_flight(self) -> int:
+        return len(self._flights)
+
+    def stats(self) -> Dict[str, int]:
+        return {"calls": self.calls, "coalesced": self.coalesced, "in_flight": len(self._flights)}
+
+    async def _run_flight(self, key: str, flight: _Flight, call: Callable[[Publish], Awaitable[Any]]) -> Any:
+        try:
+            return await call(flight.publish)
+        finally:
+            del self._flights[key]
+            flight.finish()
+
+    async def _replay_tokens(self, flight: _Flight) -> None:
+        queue = flight.listen()
+        streaming = True
+        while (token := await queue.get()) is not None:
+            if not streaming:
+                continue
+            try:
+                await adispatch_custom_event(TOKEN_EVENT, {"content": token})
+            except RuntimeError:
+                # Not running inside a LangChain run, so nobody is listening for tokens
+                streaming = False
+
+# Shared coalescing layer for LLM calls (see llm_cache.cached_ainvoke)
+llm_flights = SingleFlight()
@@ -0,0 +1,201 @@
+# app/services/structure_index.py
+import re
+import bisect
+import logging
+from dataclasses import dataclass
+from typing import Dict, List, Optional
+
+from app.services.retrieval import INDEX_CACHE_MAX_DOCUMENTS
+from app.utils.lru import LRUCache
+from app.utils.pdf_parser import PAGE_BREAK, page_offsets
+from app.utils.tokens import truncate_to_tokens
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Longest definition recorded, in characters; longer ones are cut at a sentence end
+MAX_DEFINITION_CHARS = 1500
+
+_ROMAN = r"(?-i:[IVXLC]+)"
+# "Section 7.2 Confidentiality", "ARTICLE IV - TERM", "§ 3", or a bare "7.2 Confidentiality" / "7. TERM" starting a line
+_HEADING_RE = re.compile(
+    rf"^[ \t\f]*(?:(?:section|article|clause|§)[ \t]*(?P<named>\d+(?:\.\d+)*|{_ROMAN})\b"
+    r"|(?P<bare>\d{1,3}(?:\.\d{1,3}){1,3}|\d{1,3}(?=[.)])))"
+    r"[.)]?[ \t:\-–—]*(?P<title>[^\n]{0,120})",
+    re.IGNORECASE | re.MULTILINE,
+)
+# A line holding only "EXHIBIT A" or "Schedule 2: Fees"; references in running text do not match
+_EXHIBIT_RE = re.compile(
+    r"^[ \t\f]*(?P<kind>EXHIBIT|SCHEDULE|ANNEX|APPENDIX|ATTACHMENT|Exhibit|Schedule|Annex|Appendix|Attachment)"
+    r"[ \t]+(?P<id>[A-Z0-9]{1,4}(?:-\d+)?)[ \t]*(?:[:.\-–—][ \t]*(?P<title>[^\n]{0,100}))?[ \t]*$",
+    re.MULTILINE,
+)
+# Where a heading's title ends and its body text begins: "7.2 Exceptions. Information that..."
+_TITLE_END_RE = re.compile(r"[.:;]\s")
+# Lowercase words allowed in a title-case heading
+_SMALL_WORDS = frozenset("a an and as at by for in of on or the to with".split())
+_QUOTE_OPEN = "\"“'‘"
+_QUOTE_CLOSE = "\"”'’"
+# "Confidential Information" means ...  /  "Term" shall have the meaning ...
+_MEANS_RE = re.compile(rf"[{_QUOTE_OPEN}](?P<term>[A-Z][^\"“”'‘’\n]{{0,80}}?)[{_QUOTE_CLOSE}][ \t]*(?:shall[ \t]+)?(?:means?|refers?[ \t]+to|has[ \t]+the[ \t]+meaning|shall[ \t]+have[ \t]+the[ \t]+meaning)\b")
+# ... by and between ACME Corp (the "Company") ...
+_PAREN_RE = re.compile(rf"\((?:the[ \t]+|hereinafter[ \t]+(?:the[ \t]+)?|each[ \t]+a[ \t]+|collectively[ \t,]+(?:the[ \t]+)?)?[{_QUOTE_OPEN}](?P<term>[A-Z][^\"“”'‘’\n]{{0,80}}?)[{_QUOTE_CLOSE}]\)")
+_SENTENCE_END_RE = re.compile(r"[.;](?=\s|$)")
+
+_QUERY_SECTION_RE = re.compile(rf"\b(?:sections?|sec\.|articles?|clauses?|paragraphs?|§)[ \t]*(\d+(?:\.\d+)*|{_ROMAN}\b)", re.IGNORECASE)
+_QUERY_EXHIBIT_RE = re.compile(r"\b(exhibit|schedule|annex|appendix|attachment)[ \t]+([A-Z0-9]{1,4}(?:-\d+)?)\b", re.IGNORECASE)
+# Questions that explicitly ask what a term means, capturing the term: "what is the definition of X",
+# "the meaning of X", "what is meant by X", "what does 'X' mean", "how is X defined"
+_TERM = r"(?:the[ \t]+)?(?:term[ \t]+)?(?P<{}>[^?!;,\n]{{2,80}}?)"
+_QUERY_DEFINITION_RE = re.compile(
+    r"\b(?:definition|meaning)[ \t]+of[ \t]+" + _TERM.format("of") + r"[ \t]*(?:[?!;,.]|$)"
+    + r"|\bmean[t]?[ \t]+by[ \t]+" + _TERM.format("by") + r"[ \t]*(?:[?!;,.]|$)"
+    + r"|\bwhat[ \t]+does[ \t]+" + _TERM.format("does") + r"[ \t]+mean\b(?![ \t]+(?:by|to)\b)"
+    + r"|\b(?:how|where)[ \t]+(?:is|are)[ \t]+" + _TERM.format("defined") + r"[ \t]+defined\b",
+    re.IGNORECASE,
+)
+
+def _normalize(key: str) -> str:
+    return " ".join(key.split()).casefold().rstrip(".")
+
+def _looks_like_heading(title: str) -> bool:
+    """True for "Confidentiality." or "GOVERNING LAW", false for sentences such as "The Tenant shall pay..."."""
+    head = _TITLE_END_RE.split(title + " ", maxsplit=1)[0].strip().rstrip(".:;")
+    words = head.split()
+    if not words or len(words) > 8:
+        return False
+    return head.isupper() or all(w[0].isupper() or w.lower() in _SMALL_WORDS for w in words if w[0].isalpha())
+
+@dataclass(frozen=True)
+class Span:
+    """A located part of a document: a numbered section, a definition or an exhibit."""
+    kind: str # "section", "definition" or "exhibit"
+    key: str # Section number, defined term or exhibit name as written
+    title: str
+    start: int # Character offsets into the extracted text
+    end: int
+    page: Optional[int] = None # 1-based page the span starts on, None if the source has no pages
+
+    def label(self) -> str:
+        name = {"section": f"Section {self.key}", "definition": f'Definition of "{self.key}"'}.get(self.kind, self.key)
+        return f"[{name}, page {self.page}]" if self.page else f"[{name}]"
+
+class StructureIndex:
+    """
+    Lookup index of the numbered sections, defined terms and exhibits of a legal document.
+
+    Only offsets are stored, not text, so the index stays small and is
+    resolved against the extracted text at query time. When a heading
+    appears more than once (e.g. in a table of contents), the longest span
+    is kept, which is the body rather than the contents entry.
+    """
+
+    def __init__(self, text: str):
+        offsets = page_offsets(text)
+        self._page_starts = offsets if len(offsets) > 1 else None
+        self.sections: Dict[str, Span] = {}
+        self.definitions: Dict[str, Span] = {}
+        self.exhibits: Dict[str, Span] = {}
+        self._index_exhibits(text)
+        self._index_sections(text)
+        self._index_definitions(text)
+
+    def __len__(self) -> int:
+        return len(self.sections) + len(self.definitions) + len(self.exhibits)
+
+    def _page(self, offset: int) -> Optional[int]:
+        return bisect.bisect_right(self._page_starts, offset) if self._page_starts else None
+
+    @staticmethod
+    def _keep_longest(table: Dict[str, Span], span: Span) -> None:
+        key = _normalize(span.key)
+        current = table.get(key)
+        if current is None or span.end - span.start > current.end - current.start:
+            table[key] = span
+
+    def _index_exhibits(self, text: str) -> None:
+        matches = list(_EXHIBIT_RE.finditer(text))
+        self._body_end = matches[0].start("kind") if matches else len(text) # Sections do not run into the exhibits
+        for i, match in enumerate(matches):
+            start = match.start("kind")
+            end = matches[i + 1].start("kind") if i + 1 < len(matches) else len(text)
+            key = f"{match.group('kind').title()} {match.group('id')}"
+            self._keep_longest(self.exhibits, Span("exhibit", key, (match.group("title") or "").strip(), start, end, self._page(start)))
+
+    def _index_sections(self, text: str) -> None:
+        headings = []
+        for match in _HEADING_RE.finditer(text):
+            if match.start() >= self._body_end:
+                continue
+            title = match.group("title").strip()
+            # A bare number needs a heading-like title; "Section 4" alone on a line is a heading too
+            if not _looks_like_heading(title) and not (match.group("named") and not title):
+                continue
+            number = (match.group("named") or match.group("bare")).upper()
+            start = match.start() + len(match.group()) - len(match.group().lstrip(" \t" + PAGE_BREAK))
+            headings.append((start, number, number.count(".") + 1, _TITLE_END_RE.split(title + " ", maxsplit=1)[0].strip()))
+        # A section runs until the next heading at the same or a higher level, so "7" includes 7.1 and 7.2
+        ends = [self._body_end] * len(headings)
+        still_open: List[int] = []
+        for i, (start, _, level, _) in enumerate(headings):
+            while still_open and headings[still_open[-1]][2] >= level:
+                ends[still_open.pop()] = start
+            still_open.append(i)
+        for (start, number, _, title), end in zip(headings, ends):
+            self._keep_longest(self.sections, Span("section", number, title, start, end, self._page(start)))
+
+    def _index_definitions(self, text: str) -> None:
+        for match in _MEANS_RE.finditer(text):
+            start = max(text.rfind("\n", 0, match.start()) + 1, text.rfind(PAGE_BREAK, 0, match.start()) + 1)
+            paragraph_end = text.find("\n\n", match.end())
+            end = min(paragraph_end if paragraph_end != -1 else len(text), start + MAX_DEFINITION_CHARS)
+            self._keep_longest(self.definitions, Span("definition", match.group("term"), "", start, end, self._page(start)))
+        for match in _PAREN_RE.finditer(text):
+            key = _normalize(match.group("term"))
+            if key in self.definitions:
+                continue # An explicit "means" definition is more useful than where the name was introduced
+            sentence_start = text.rfind(". ", 0, match.start())
+            start = max(sentence_start + 2 if sentence_start != -1 else 0, text.rfind("\n", 0, match.start()) + 1)
+            sentence_end = _SENTENCE_END_RE.search(text, match.end())
+            end = min(sentence_end.end() if sentence_end else len(text), start + MAX_DEFINITION_CHARS)
+            self.definitions[key] = Span("definition", match.group("term"), "", start, end, self._page(start))
+
+    def lookup(self, query: str) -> List[Span]:
+        """Sections and exhibits the query names: "section 7.2", "Exhibit B"."""
+        spans = []
+        for number in _QUERY_SECTION_RE.findall(query):
+            span = self.sections.get(_normalize(number.upper()))
+            if span is not None:
+                spans.append(span)
+        for kind, exhibit_id in _QUERY_EXHIBIT_RE.findall(query):
+            span = self.exhibits.get(_normalize(f"{kind} {exhibit_id}"))
+            if span is not None:
+                spans.append(span)
+        return list(dict.fromkeys(spans))
+
+    def lookup_definitions(self, query: str) -> List[Span]:
+        """Definitions of the terms the query explicitly asks the meaning of ("what does 'Services' mean?")."""
+        spans = []
+        for match in _QUERY_DEFINITION_RE.finditer(query):
+            phrase = _normalize(re.sub(rf"[{_QUOTE_OPEN}{_QUOTE_CLOSE}]", "", match.group(match.lastgroup)))
+            span = self.definitions.get(phrase)
+            if span is None:
+                # "the meaning of confidential information here": the longest defined term in the phrase
+                term = next((t for t in sorted(self.definitions, key=len, reverse=True) if re.search(rf"\b{re.escape(t)}\b", phrase)), None)
+                span = self.definitions.get(term) if term else None
+            if span is not None:
+                spans.append(span)
+        return list(dict.fromkeys(spans))
+
+def format_spans(text: str, spans: List[Span], max_tokens: int) -> str:
+    """Renders the looked-up spans for a prompt, splitting the token budget evenly between them."""
+    share = max_tokens // max(1, len(spans))
+    parts = []
+    for span in spans:
+        body = text[span.start:span.end].replace(PAGE_BREAK, "\n").strip()
+        parts.append(f"{span.label()}\n{truncate_to_tokens(body, share)}")
+    return "\n\n".join(parts)
+
+# Structure indexes in memory, keyed by content hash and bounded like document_indexes in retrieval.py;
+# evicted ones are loaded back from the extraction cache
+document_structures: LRUCache[StructureIndex] = LRUCache(INDEX_CACHE_MAX_DOCUMENTS)
@@ -0,0 +1,163 @@
+# app/services/summarization.py
+import os
+import re
+import asyncio
+import logging
+from typing import List, Optional, Sequence, Tuple
+
+from langchain_core.messages import HumanMessage, SystemMessage
+
+from app.services.extraction_cache import document_hash, extraction_cache
+from app.services.llm_cache import cached_ainvoke
+from app.services.llm_scheduler import Priority
+from app.utils.pdf_parser import PAGE_BREAK
+from app.utils.tokens import estimate_tokens, prompt_budget, truncate_to_tokens
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Map-reduce summarization settings (override via environment)
+SUMMARY_CHUNK_TOKENS = int(os.getenv("SUMMARY_CHUNK_TOKENS", "3000"))
+MAP_REDUCE_CONCURRENCY = int(os.getenv("MAP_REDUCE_CONCURRENCY", "4"))
+# Room for the instructions around each chunk or group of summaries
+_PROMPT_OVERHEAD_TOKENS = 200
+
+# Questions about the document as a whole, which the few passages retrieval picks cannot answer
+_WHOLE_DOCUMENT_RE = re.compile(
+    r"\b(summar\w*|overview|outline|gist|tl;?dr|(key|main) (points|terms|provisions|obligations)|"
+    r"what is (this|the) (document|agreement|contract|filing) about)\b",
+    re.IGNORECASE,
+)
+
+_MAP_INSTRUCTIONS = (
+    "You are summarizing one part of a longer legal document. Keep parties, dates, amounts, "
+    "obligations, defined terms and section numbers. Reply with the summary only, in under 150 words."
+)
+_REDUCE_INSTRUCTIONS = (
+    "You are merging summaries of consecutive parts of a legal document into one summary. Keep parties, "
+    "dates, amounts, obligations and the page references in brackets. Reply with the summary only."
+)
+
+def needs_whole_document(query: str) -> bool:
+    """True for questions like "summarize this contract" that need every part of the document."""
+    return bool(_WHOLE_DOCUMENT_RE.search(query))
+
+def summary_token_budget(model_name: Optional[str]) -> int:
+    """Tokens a document summary may take in a chat prompt; longer documents are map-reduced."""
+    return prompt_budget(model_name) // 2
+
+def _split_long(text: str, max_tokens: int) -> List[str]:
+    pieces = []
+    while text:
+        piece = truncate_to_tokens(text, max_tokens) or text
+        pieces.append(piece)
+        text = text[len(piece):].lstrip()
+    return pieces
+
+def split_pages(text: str, max_tokens: int) -> List[Tuple[str, str]]:
+    """
+    Packs consecutive pages into chunks of at most max_tokens.
+
+    Returns (label, text) pairs such as ("Pages 3-5", ...). Chunks break only
+    at page boundaries, except that a page longer than max_tokens is cut into
+    several chunks. Text without page breaks is labelled by part instead.
+    """
+    pages = text.split(PAGE_BREAK)
+    has_pages = len(pages) > 1
+    units = [(page_num, piece) for page_num, page in enumerate(pages, start=1) for piece in _split_long(page.strip(), max_tokens)]
+
+    groups: List[List[Tuple[int, str]]] = []
+    used = 0
+    for page_num, piece in units:
+        tokens = estimate_tokens(piece)
+        if not groups or used + tokens > max_tokens:
+            groups.append([])
+            used = 0
+        groups[-1].append((page_num, piece))
+        used += tokens
+
+    chunks = []
+    for i, group in enumerate(groups, start=1):
+        first, last = group[0][0], group[-1][0]
+        if not has_pages:
+            label = f"Part {i}"
+        else:
+            label = f"Page {first}" if first == last else f"Pages {first}-{last}"
+        chunks.append((label, "\n\n".join(piece for _, piece in group)))
+    return chunks
+
+async def _summarize_chunk(llm, label: str, text: str, doc_hash: str, slots: asyncio.Semaphore, priority: Priority) -> str:
+    messages = [
+        SystemMessage(content=_MAP_INSTRUCTIONS),
+        HumanMessage(content=f"{label} of the document:\n---\n{text}\n---"),
+    ]
+    async with slots:
+        response = await cached_ainvoke(llm, messages, document_hash=doc_hash, priority=priority)
+    return f"[{label}] {response.content.strip()}"
+
+async def _merge(llm, summaries: Sequence[str], doc_hash: str, slots: asyncio.Semaphore, priority: Priority) -> str:
+    messages = [
+        SystemMessage(content=_REDUCE_INSTRUCTIONS),
+        HumanMessage(content="\n\n".join(summaries)),
+    ]
+    async with slots:
+        response = await cached_ainvoke(llm, messages, document_hash=doc_hash, priority=priority)
+    return response.content.strip()
+
+async def reduce_summaries(
+    llm,
+    summaries: List[str],
+    max_tokens: int,
+    doc_hash: str,
+    slots: asyncio.Semaphore,
+    group_tokens: int,
+    priority: Priority = Priority.INTERACTIVE,
+) -> List[str]:
+    """Merges neighbouring summaries, level by level, until together they fit max_tokens."""
+    while len(summaries) > 1 and sum(estimate_tokens(s) for s in summaries) > max_tokens:
+        groups: List[List[str]] = []
+        used = 0
+        for summary in summaries:
+            tokens = estimate_tokens(summary)
+            # At least two per group, so every level shrinks the list
+            if not groups or (used + tokens > group_tokens and len(groups[-1]) > 1):
+                groups.append([])
+                used = 0
+            groups[-1].append(summary)
+            used += tokens
+        merged = iter(await asyncio.gather(*(_merge(llm, group, doc_hash, slots, priority) for group in groups if len(group) > 1)))
+        summaries = [next(merged) if len(group) > 1 else group[0] for group in groups]
+    return summaries
+
+async def summarize_document(
+    llm,
+    text: str,
+    max_tokens: int,
+    *,
+    concurrency: int = MAP_REDUCE_CONCURRENCY,
+    priority: Priority = Priority.INTERACTIVE,
+) -> str:
+    """
+    Map-reduce summary of a document that is too long for one prompt.
+
+    Page-aligned chunks are summarized concurrently (at most `concurrency`
+    calls at a time), then the partial summaries are merged until they fit
+    max_tokens. The partial summaries are cached per document hash and model,
+    so follow-up questions about the same document only pay for the merge,
+    which the response cache usually serves as well.
+    """
+    model_name = getattr(llm, "model_name", None)
+    chunk_tokens = max(1, min(SUMMARY_CHUNK_TOKENS, prompt_budget(model_name) - _PROMPT_OVERHEAD_TOKENS))
+    doc_hash = document_hash(text)
+    key = f"{doc_hash}.{re.sub(r'[^A-Za-z0-9_.-]', '_', model_name or 'default')}"
+    slots = asyncio.Semaphore(max(1, concurrency))
+
+    partial = await asyncio.to_thread(extraction_cache.get_summaries, key)
+    if partial is None:
+        chunks = split_pages(text, chunk_tokens)
+        partial = list(await asyncio.gather(*(_summarize_chunk(llm, label, chunk, doc_hash, slots, priority) for label, chunk in chunks)))
+        await asyncio.to_thread(extraction_cache.put_summaries, key, partial)
+        logger.info(f"Summarized {len(chunks)} chunks of document {doc_hash[:12]}.")
+
+    summaries = await reduce_summaries(llm, partial, max_tokens, doc_hash, slots, chunk_tokens, priority)
+    return truncate_to_tokens("\n\n".join(summaries), max_tokens)
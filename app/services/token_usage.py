@@ -0,0 +1,93 @@
+# app/services/token_usage.py
+import os
+import logging
+import threading
+from collections import OrderedDict
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Dict, Iterator, Optional, Sequence, Tuple
+
+from langchain_core.messages import BaseMessage
+
+from app.utils.tokens import estimate_tokens
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Sessions whose usage is kept in memory; the least recently active are dropped first
+TOKEN_USAGE_MAX_SESSIONS = int(os.getenv("TOKEN_USAGE_MAX_SESSIONS", "10000"))
+
+# (session ID, endpoint) that LLM calls made in the current context are charged to
+_scope: ContextVar[Tuple[Optional[str], str]] = ContextVar("llm_usage_scope", default=(None, "other"))
+
+@contextmanager
+def usage_scope(session_id: Optional[str], endpoint: str) -> Iterator[None]:
+    """Charges LLM calls made inside the block (and tasks started from it) to a session and endpoint."""
+    token = _scope.set((session_id, endpoint))
+    try:
+        yield
+    finally:
+        _scope.reset(token)
+
+def _empty() -> Dict[str, int]:
+    return {"calls": 0, "prompt_tokens": 0, "completion_tokens": 0}
+
+class TokenUsageLedger:
+    """Prompt and completion tokens spent upstream, totalled per session and per endpoint."""
+
+    def __init__(self, max_sessions: int = TOKEN_USAGE_MAX_SESSIONS):
+        self.max_sessions = max_sessions
+        self.totals = _empty()
+        self._sessions: "OrderedDict[str, Dict[str, int]]" = OrderedDict()
+        self._endpoints: Dict[str, Dict[str, int]] = {}
+        self._lock = threading.Lock()
+
+    def record(self, prompt_tokens: int, completion_tokens: int, session_id: Optional[str] = None, endpoint: Optional[str] = None) -> None:
+        """Records one upstream call, charged to the current usage_scope unless given explicitly."""
+        scope_session, scope_endpoint = _scope.get()
+        session_id = session_id or scope_session
+        endpoint = endpoint or scope_endpoint
+        with self._lock:
+            buckets = [self.totals, self._endpoints.setdefault(endpoint, _empty())]
+            if session_id:
+                buckets.append(self._sessions.setdefault(session_id, _empty()))
+                self._sessions.move_to_end(session_id)
+                while len(self._sessions) > self.max_sessions:
+                    self._sessions.popitem(last=False)
+            for bucket in buckets:
+                bucket["calls"] += 1
+                bucket["prompt_tokens"] += prompt_tokens
+                bucket["completion_tokens"] += completion_tokens
+        logger.info(f"LLM usage ({endpoint}, session {session_id}): {prompt_tokens} prompt + {completion_tokens} completion tokens")
+
+    def session(self, session_id: str) -> Dict[str, int]:
+        with self._lock:
+            return dict(self._sessions.get(session_id, _empty()))
+
+    def endpoint(self, endpoint: str) -> Dict[str, int]:
+        with self._lock:
+            return dict(self._endpoints.get(endpoint, _empty()))
+
+    def stats(self) -> Dict[str, object]:
+        with self._lock:
+            return {
+                "totals": dict(self.totals),
+                "endpoints": {name: dict(usage) for name, usage in self._endpoints.items()},
+                "sessions": len(self._sessions),
+            }
+
+# Shared ledger for every LLM call
+token_usage = TokenUsageLedger()
+
+def record_response(prompt_messages: Sequence[BaseMessage], response) -> int:
+    """
+    Records the usage of one chat model response and returns its total tokens.
+
+    Uses the counts reported by the provider, estimating them locally when
+    none are reported (e.g. some streaming responses).
+    """
+    usage = getattr(response, "usage_metadata", None) or {}
+    prompt_tokens = usage.get("input_tokens") or sum(estimate_tokens(str(m.content)) for m in prompt_messages)
+    completion_tokens = usage.get("output_tokens") or estimate_tokens(str(response.content))
+    token_usage.record(prompt_tokens, completion_tokens)
+    return prompt_tokens + completion_tokens
@@ -9,6 +9,21 @@ function setupChat(sessionId) {
     function addMessage(sender, text) {
         const messageDiv = document.createElement('div');
         messageDiv.classList.add('message');
+
+        if (sender === 'user') {
+            messageDiv.classList.add('user-message');
+        } else {
+            messageDiv.classList.add('ai-message');
+        }
+        renderMessage(messageDiv, text);
+        chatbox.appendChild(messageDiv);
+        // Scroll to bottom
+        chatbox.scrollTop = chatbox.scrollHeight;
+        return messageDiv;
+    }
+
+    // (Re)render the text of an existing message, used for streamed tokens
+    function renderMessage(messageDiv, text) {
         // Basic Markdown-like formatting for code blocks
         text = text.replace(/```([\s\S]*?)```/g, (match, p1) => {
             const codeContent = p1.trim();
@@ -24,15 +39,25 @@ function setupChat(sessionId) {
         // Use innerHTML carefully as it can be a security risk if text is not sanitized
         // We are doing basic HTML escaping for code blocks, might need more robust solution
         messageDiv.innerHTML = `<p>${text.replace(/\n/g, '<br>')}</p>`; // Replace newlines with <br>
+        chatbox.scrollTop = chatbox.scrollHeight;
+    }
 
-        if (sender === 'user') {
-            messageDiv.classList.add('user-message');
-        } else {
-            messageDiv.classList.add('ai-message');
+    // Read an NDJSON response body, calling onEvent for every parsed line
+    async function readEventStream(response, onEvent) {
+        const reader = response.body.getReader();
+        const decoder = new TextDecoder();
+        let buffer = '';
+        while (true) {
+            const { value, done } = await reader.read();
+            if (done) break;
+            buffer += decoder.decode(value, { stream: true });
+            const lines = buffer.split('\n');
+            buffer = lines.pop(); // Keep any partial line for the next chunk
+            for (const line of lines) {
+                if (line.trim()) onEvent(JSON.parse(line));
+            }
         }
-        chatbox.appendChild(messageDiv);
-        // Scroll to bottom
-        chatbox.scrollTop = chatbox.scrollHeight;
+        if (buffer.trim()) onEvent(JSON.parse(buffer));
     }
 
      // Basic HTML escaping
@@ -57,11 +82,11 @@ function setupChat(sessionId) {
         addMessage('user', messageText);
         userInput.value = ''; // Clear input
         sendButton.disabled = true; // Disable button while waiting
-        addMessage('ai', 'Thinking...'); // Show thinking indicator
+        const aiMessage = addMessage('ai', 'Thinking...'); // Show thinking indicator
 
         try {
-            // Send message to backend
-            const response = await fetch(`/assistant/chat/${sessionId}`, { // Corrected endpoint
+            // Send message to backend, streaming the reply token by token
+            const response = await fetch(`/assistant/chat/${sessionId}/stream`, {
                 method: 'POST',
                 headers: {
                     'Content-Type': 'application/x-www-form-urlencoded', // FastAPI Form expects this
@@ -69,30 +94,29 @@ function setupChat(sessionId) {
                 body: new URLSearchParams({ 'user_input': messageText }) // Send as form data
             });
 
-             // Remove "Thinking..." message
-            const thinkingMsg = chatbox.querySelector('.ai-message:last-child');
-            if (thinkingMsg && thinkingMsg.textContent.includes('Thinking...')) {
-                chatbox.removeChild(thinkingMsg);
-            }
-
-
             if (!response.ok) {
                 const errorData = await response.json().catch(() => ({ detail: 'Unknown server error' }));
                 console.error('Chat API error:', response.status, errorData);
-                addMessage('ai', `Sorry, an error occurred: ${errorData.detail || response.statusText}`);
+                renderMessage(aiMessage, `Sorry, an error occurred: ${errorData.detail || response.statusText}`);
             } else {
-                const data = await response.json();
-                addMessage('ai', data.response || 'Received an empty response.');
+                let streamedText = '';
+                await readEventStream(response, (event) => {
+                    if (event.type === 'token') {
+                        // Replaces "Thinking..." with the first token
+                        streamedText += event.content;
+                        renderMessage(aiMessage, streamedText);
+                    } else if (event.type === 'done') {
+                        // The committed message is authoritative (covers non-streamed replies)
+                        renderMessage(aiMessage, event.response || 'Received an empty response.');
+                    } else if (event.type === 'error') {
+                        renderMessage(aiMessage, `Sorry, an error occurred: ${event.detail}`);
+                    }
+                });
             }
 
         } catch (error) {
-             // Remove "Thinking..." message even on network error
-            const thinkingMsg = chatbox.querySelector('.ai-message:last-child');
-            if (thinkingMsg && thinkingMsg.textContent.includes('Thinking...')) {
-                chatbox.removeChild(thinkingMsg);
-            }
             console.error('Failed to send message:', error);
-            addMessage('ai', 'Sorry, could not connect to the server.');
+            renderMessage(aiMessage, 'Sorry, could not connect to the server.');
         } finally {
              sendButton.disabled = false; // Re-enable button
              userInput.focus(); // Focus input for next message
@@ -102,5 +126,36 @@ function setupChat(sessionId) {
     console.log(`Chat initialized for session: ${sessionId}`);
 }
 
+// Poll background document processing and update the status line until it finishes
+function pollIngestionStatus(sessionId) {
+    const statusLine = document.getElementById('ingestion-status');
+    if (!statusLine) return;
+
+    async function poll() {
+        try {
+            const response = await fetch(`/upload/status/${sessionId}`);
+            if (!response.ok) throw new Error(response.statusText);
+            const job = await response.json();
+
+            if (job.status === 'done') {
+                statusLine.textContent = job.characters === 0
+                    ? '⚠️ No text could be extracted from this document.'
+                    : '✅ Document context is loaded for this session.';
+                return;
+            }
+            if (job.status === 'failed') {
+                statusLine.textContent = `❌ Document processing failed: ${job.error || 'unknown error'}`;
+                return;
+            }
+            const pages = job.pages_total ? ` (page ${job.pages_done} of ${job.pages_total})` : '';
+            statusLine.textContent = `⏳ Processing your document: ${job.status}${pages}...`;
+        } catch (error) {
+            console.error('Failed to fetch ingestion status:', error);
+        }
+        setTimeout(poll, 1000);
+    }
+    poll();
+}
+
 // Make sure the function is globally available or called correctly after DOM loads
 // The setupChat call is placed in the chat.html template script block.
@@ -1,4 +1,7 @@
 # app/utils/contract_templates.py
+import re
+from dataclasses import dataclass
+from typing import List
 
 # Basic templates - these would likely be expanded or loaded from files
 # In a real app, these might be more structured prompts or actual templates.
@@ -48,3 +51,100 @@ def get_contract_prompt(contract_type: str) -> str | None:
     if generator_func:
         return generator_func()
     return None
+
+# --- Clause-level templates ---
+# Contracts are drafted clause by clause. Boilerplate clauses do not depend on the
+# parties, so their text is generated once per contract type, jurisdiction and set
+# of drafting options and reused; only party-specific clauses are drafted with the
+# user's details.
+
+@dataclass(frozen=True)
+class ClauseSection:
+    """One section of a contract template."""
+    title: str
+    instructions: str
+    boilerplate: bool = False # True if the clause text is the same for every request
+
+NDA_SECTIONS = [
+    ClauseSection("Parties and Effective Date", "Identify the Disclosing Party and the Receiving Party and state the effective date. Use [Party 1 Name], [Party 2 Name] and [Effective Date] where details are missing."),
+    ClauseSection("Definition of Confidential Information", "Define Confidential Information broadly, covering written, oral and electronic information disclosed by either party.", boilerplate=True),
+    ClauseSection("Obligations of the Receiving Party", "Require the Receiving Party to keep Confidential Information secret, use it only for the stated purpose and limit access to those who need to know.", boilerplate=True),
+    ClauseSection("Exclusions from Confidential Information", "List the standard exclusions: information that is public, already known, independently developed, or lawfully received from a third party.", boilerplate=True),
+    ClauseSection("Term and Termination", "State how long the agreement and the confidentiality obligations last and how it can be terminated. Use [Term Length] where details are missing."),
+    ClauseSection("Governing Law", "State that the agreement is governed by the laws of the jurisdiction given below and name its courts as the venue for disputes.", boilerplate=True),
+]
+
+RENTAL_AGREEMENT_SECTIONS = [
+    ClauseSection("Identification of Landlord and Tenant", "Name the landlord and the tenant. Use [Landlord Name] and [Tenant Name] where details are missing."),
+    ClauseSection("Property Description", "Describe the rented property. Use [Property Address] where details are missing."),
+    ClauseSection("Lease Term", "State the start and end dates of the lease. Use [Start Date] and [End Date] where details are missing."),
+    ClauseSection("Rent Amount and Due Date", "State the monthly rent, when it is due and how it is paid. Use [Rent Amount] where details are missing."),
+    ClauseSection("Security Deposit", "State the deposit amount and the conditions for its return. Use [Security Deposit Amount] where details are missing."),
+    ClauseSection("Use of Premises", "Limit use of the premises to residential purposes and prohibit unlawful use and unapproved subletting.", boilerplate=True),
+    ClauseSection("Maintenance and Repairs", "Split responsibility for maintenance and repairs between landlord and tenant, and require prompt reporting of damage.", boilerplate=True),
+    ClauseSection("Governing Law", "State that the agreement is governed by the laws of the jurisdiction given below.", boilerplate=True),
+]
+
+CONTRACT_SECTIONS = {
+    "nda": NDA_SECTIONS,
+    "rental_agreement": RENTAL_AGREEMENT_SECTIONS,
+}
+
+@dataclass(frozen=True)
+class DraftingOption:
+    """A choice in the user's details that changes the boilerplate clauses too, e.g. a mutual NDA."""
+    name: str
+    pattern: re.Pattern
+    instructions: str # Sent to boilerplate clauses in place of the details themselves
+
+CONTRACT_OPTIONS = {
+    "nda": [
+        DraftingOption(
+            "mutual",
+            re.compile(r"\b(?:mutual|bilateral|two[- ]way)\b|\bboth parties (?:will |may )?(?:disclose|share)", re.IGNORECASE),
+            "The agreement is mutual: each party both discloses and receives Confidential Information, and every obligation binds both parties.",
+        ),
+        DraftingOption(
+            "one-way",
+            re.compile(r"\b(?:one[- ]way|unilateral)\b", re.IGNORECASE),
+            "The agreement is one-way: only the Disclosing Party shares Confidential Information, and only the Receiving Party is bound.",
+        ),
+    ],
+}
+
+# A place name as written: "Delaware", "New York", "State of New York", "England and Wales"
+_PLACE = r"(?-i:[A-Z][\w.'’-]*(?:[ \t]+(?:(?:of|and|the)[ \t]+)*[A-Z][\w.'’-]*)*)"
+_LAWS_OF = r"(?:the[ \t]+)?laws?[ \t]+of[ \t]+(?:the[ \t]+)?"
+_JURISDICTION_PATTERNS = [
+    # "jurisdiction: California", "governing law is the laws of Texas"
+    re.compile(rf"\b(?:jurisdiction|governing law)\b\s*(?:is|:|=|of|shall be|will be)?\s*(?:{_LAWS_OF}|the[ \t]+)?({_PLACE})", re.IGNORECASE),
+    # "governed by the laws of Delaware", "governed by New York law"
+    re.compile(rf"\bgoverned[ \t]+by[ \t]+(?:{_LAWS_OF}({_PLACE})|({_PLACE})[ \t]+laws?\b)", re.IGNORECASE),
+    # "under the laws of the State of New York", "under Delaware law"
+    re.compile(rf"\bunder[ \t]+(?:{_LAWS_OF}({_PLACE})|({_PLACE})[ \t]+laws?\b)", re.IGNORECASE),
+    # "New York law applies", "Delaware law governs"
+    re.compile(rf"({_PLACE})[ \t]+laws?[ \t]+(?:applies|apply|governs|govern|shall govern|will govern)\b", re.IGNORECASE),
+]
+
+def get_contract_sections(contract_type: str) -> List[ClauseSection] | None:
+    """Retrieves the clause sections for a given contract type ("Rental Agreement" and "rental_agreement" both match)."""
+    return CONTRACT_SECTIONS.get(_normalize_type(contract_type))
+
+def get_drafting_options(contract_type: str, details: str) -> List[DraftingOption]:
+    """Drafting options of the contract type that the user's details ask for, in template order."""
+    return [option for option in CONTRACT_OPTIONS.get(_normalize_type(contract_type), []) if option.pattern.search(details)]
+
+def _normalize_type(contract_type: str) -> str:
+    return contract_type.strip().lower().replace(" ", "_")
+
+def extract_jurisdiction(details: str) -> str | None:
+    """Finds a jurisdiction the user named in their details, e.g. "jurisdiction: California" or "governed by New York law"."""
+    for pattern in _JURISDICTION_PATTERNS:
+        match = pattern.search(details)
+        if not match:
+            continue
+        jurisdiction = next(group for group in match.groups() if group is not None)
+        jurisdiction = re.sub(r"[ \t]+laws?$", "", jurisdiction.strip().rstrip(".").strip(), flags=re.IGNORECASE)
+        if jurisdiction:
+            return jurisdiction
+    return None
@@ -0,0 +1,63 @@
+# app/utils/form_stream.py
+from typing import AsyncIterator, List, Optional, Tuple, Union
+
+from python_multipart.exceptions import FormParserError
+from python_multipart.multipart import MultipartParser, parse_options_header
+
+# Events yielded while a multipart body is read:
+#   ("part", (field name, filename or None)) when a part's headers are complete,
+#   ("data", bytes) for each piece of its content, ("end", None) when it is complete.
+FormEvent = Tuple[str, Union[Tuple[str, Optional[str]], bytes, None]]
+
+class FormStreamError(ValueError):
+    """Raised for a request body that is not valid multipart/form-data."""
+
+async def iter_form_parts(content_type: str, stream: AsyncIterator[bytes]) -> AsyncIterator[FormEvent]:
+    """
+    Parses a multipart/form-data body as it arrives, unlike Request.form(), which
+    reads (and spools) the whole body before returning. Only the current network
+    chunk is held in memory.
+    """
+    _, params = parse_options_header(content_type)
+    if b"boundary" not in params:
+        raise FormStreamError("Missing boundary in multipart body")
+    events: List[FormEvent] = []
+    headers = {"name": b"", "value": b"", "disposition": b""}
+
+    def on_header_field(data: bytes, start: int, end: int) -> None:
+        headers["name"] += data[start:end]
+
+    def on_header_value(data: bytes, start: int, end: int) -> None:
+        headers["value"] += data[start:end]
+
+    def on_header_end() -> None:
+        if headers["name"].lower() == b"content-disposition":
+            headers["disposition"] = headers["value"]
+        headers["name"] = headers["value"] = b""
+
+    def on_headers_finished() -> None:
+        _, options = parse_options_header(headers["disposition"])
+        headers["disposition"] = b""
+        if b"name" not in options:
+            raise FormStreamError('Form part is missing the Content-Disposition "name"')
+        filename = options.get(b"filename")
+        name = options[b"name"].decode("utf-8", "replace")
+        events.append(("part", (name, filename.decode("utf-8", "replace") if filename is not None else None)))
+
+    parser = MultipartParser(params[b"boundary"], {
+        "on_header_field": on_header_field,
+        "on_header_value": on_header_value,
+        "on_header_end": on_header_end,
+        "on_headers_finished": on_headers_finished,
+        "on_part_data": lambda data, start, end: events.append(("data", data[start:end])),
+        "on_part_end": lambda: events.append(("end", None)),
+    })
+    try:
+        async for chunk in stream:
+            parser.write(chunk)
+            for event in events:
+                yield event
+            events.clear()
+        parser.finalize()
+    except FormParserError as e:
+        raise FormStreamError("Invalid multipart body") from e
@@ -1,22 +1,68 @@
 
 # /workspaces/legalmind/app/utils/pdf_parser.py
 
-import fitz  # PyMuPDF
-import io
+import os
+import mmap
 import logging
 import asyncio
+import itertools
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
 from pathlib import Path
-from typing import Optional # Use -> str | None for Python 3.10+ if preferred
+from typing import Callable, List, Optional, Tuple # Use -> str | None for Python 3.10+ if preferred
+
+# Called as progress(pages_done, pages_total) while a document is extracted
+ProgressCallback = Callable[[int, int], None]
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# Separator placed between pages of extracted PDF text so that later stages
+# (chunking, citations) can recover page numbers from the flat string.
+PAGE_BREAK = "\f"
+
+# PDFs with at least this many pages are split into page ranges and
+# extracted in parallel worker processes (override via environment)
+PARALLEL_EXTRACTION_MIN_PAGES = int(os.getenv("PARALLEL_EXTRACTION_MIN_PAGES", "64"))
+EXTRACTION_WORKERS = int(os.getenv("EXTRACTION_WORKERS", str(min(4, os.cpu_count() or 1))))
+
+_process_pool: Optional[ProcessPoolExecutor] = None
+
+def _get_process_pool() -> ProcessPoolExecutor:
+    """Creates the extraction process pool on first use."""
+    global _process_pool
+    if _process_pool is None:
+        # "spawn" avoids forking a process that already runs the event loop and its threads
+        _process_pool = ProcessPoolExecutor(max_workers=EXTRACTION_WORKERS, mp_context=multiprocessing.get_context("spawn"))
+        logger.info(f"Started PDF extraction process pool with {EXTRACTION_WORKERS} workers.")
+    return _process_pool
+
+def shutdown_extraction_pool() -> None:
+    """Stops the extraction worker processes (called on application shutdown)."""
+    global _process_pool
+    if _process_pool is not None:
+        _process_pool.shutdown(wait=False, cancel_futures=True)
+        _process_pool = None
+
+def load_pdf_backend() -> None:
+    """Imports PyMuPDF ahead of the first extraction (used by the startup warm-up)."""
+    import fitz # noqa: F401
+
+def page_offsets(text: str) -> List[int]:
+    """Returns the character offset at which each page starts in extracted text."""
+    offsets = [0]
+    position = text.find(PAGE_BREAK)
+    while position != -1:
+        offsets.append(position + len(PAGE_BREAK))
+        position = text.find(PAGE_BREAK, position + 1)
+    return offsets
+
 # --- Helper Functions to run synchronous blocking code in threads ---
 
-def _extract_pdf_text_sync(content: bytes) -> str:
-    """Synchronously extracts text from PDF byte content."""
-    text = ""
+def _extract_pdf_text_sync(content: bytes | memoryview, progress: Optional[ProgressCallback] = None) -> str:
+    """Synchronously extracts text from PDF byte content (bytes or a zero-copy memoryview)."""
+    import fitz # PyMuPDF; imported on first use so that importing this module stays cheap
     try:
         # Open PDF document from byte stream
         with fitz.open(stream=content, filetype="pdf") as doc:
@@ -24,9 +70,13 @@ def _extract_pdf_text_sync(content: bytes) -> str:
                  logger.warning("PDF is password protected. Cannot extract text.")
                  return "" # Cannot process password-protected PDFs this way
 
+            pages = []
             for page_num in range(len(doc)):
                 page = doc.load_page(page_num)
-                text += page.get_text("text") # Extract text content
+                pages.append(page.get_text("text")) # Extract text content
+                if progress:
+                    progress(page_num + 1, len(doc))
+            text = PAGE_BREAK.join(pages)
             logger.info(f"Successfully extracted {len(text)} characters from PDF.")
             return text
     except Exception as e:
@@ -45,7 +95,79 @@ def _extract_txt_text_sync(content: bytes) -> str:
         logger.error(f"Error decoding/reading text file content: {e}", exc_info=True)
         return "" # Return empty string on error
 
-# --- Main Async Function ---
+def _extract_pdf_file_sync(file_path: Path, progress: Optional[ProgressCallback] = None) -> str:
+    """Synchronously extracts text from a PDF on disk via a read-only memory map (no bytes copy)."""
+    with open(file_path, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+        view = memoryview(mapped)
+        try:
+            return _extract_pdf_text_sync(view, progress)
+        finally:
+            view.release() # The map cannot close while a view is exported
+
+def _pdf_info_sync(file_path: Path) -> Tuple[int, bool]:
+    """Returns (page count, needs password) for a PDF on disk without extracting text."""
+    import fitz
+    try:
+        with fitz.open(file_path, filetype="pdf") as doc:
+            return len(doc), bool(doc.needs_pass)
+    except Exception as e:
+        logger.warning(f"Could not inspect PDF {file_path}: {e}")
+        return 0, False
+
+def _extract_pdf_pages_sync(file_path: str, start: int, end: int) -> List[str]:
+    """Extracts the text of pages [start, end) of a PDF on disk. Runs in a worker process."""
+    import fitz
+    with fitz.open(file_path, filetype="pdf") as doc:
+        return [doc.load_page(page_num).get_text("text") for page_num in range(start, end)]
+
+def _page_ranges(page_count: int, parts: int) -> List[Tuple[int, int]]:
+    """Splits [0, page_count) into at most `parts` contiguous, near-equal ranges."""
+    size = -(-page_count // max(1, parts)) # Ceiling division
+    return [(start, min(start + size, page_count)) for start in range(0, page_count, size)]
+
+async def _extract_pdf_file_parallel(file_path: Path, page_count: int, progress: Optional[ProgressCallback] = None) -> str:
+    """Fans page ranges of a large PDF out to the process pool and joins them in page order."""
+    loop = asyncio.get_running_loop()
+    pool = _get_process_pool()
+    # A couple of ranges per worker evens out pages that differ in cost
+    ranges = _page_ranges(page_count, EXTRACTION_WORKERS * 2)
+    futures = [loop.run_in_executor(pool, _extract_pdf_pages_sync, str(file_path), start, end) for start, end in ranges]
+
+    pages_done = 0
+    for completed in asyncio.as_completed(futures):
+        pages_done += len(await completed)
+        if progress:
+            progress(pages_done, page_count)
+
+    text = PAGE_BREAK.join(itertools.chain.from_iterable(future.result() for future in futures))
+    logger.info(f"Extracted {len(text)} characters from {page_count} PDF pages using {len(ranges)} parallel ranges.")
+    return text
+
+async def _extract_pdf_file(file_path: Path, progress: Optional[ProgressCallback] = None) -> str:
+    """Extracts a PDF on disk, in parallel for large documents and via mmap otherwise."""
+    page_count, needs_pass = await asyncio.to_thread(_pdf_info_sync, file_path)
+    if needs_pass:
+        logger.warning("PDF is password protected. Cannot extract text.")
+        return ""
+    if page_count >= PARALLEL_EXTRACTION_MIN_PAGES and EXTRACTION_WORKERS > 1:
+        try:
+            return await _extract_pdf_file_parallel(file_path, page_count, progress)
+        except Exception as e:
+            logger.error(f"Parallel PDF extraction failed, falling back to a single thread: {e}", exc_info=True)
+    return await asyncio.to_thread(_extract_pdf_file_sync, file_path, progress)
+
+def _extract_txt_file_sync(file_path: Path) -> str:
+    """Synchronously reads a text file on disk, decoding incrementally rather than via a bytes copy."""
+    try:
+        with open(file_path, "r", encoding="utf-8", errors="replace") as f:
+            text = f.read()
+        logger.info(f"Successfully decoded {len(text)} characters from TXT.")
+        return text
+    except Exception as e:
+        logger.error(f"Error reading text file {file_path}: {e}", exc_info=True)
+        return ""
+
+# --- Main Async Functions ---
 
 async def extract_text(filename: str, content: bytes) -> Optional[str]:
     """
@@ -92,4 +214,40 @@ async def extract_text(filename: str, content: bytes) -> Optional[str]:
 
     # Return the result (could be text, or "" if extraction failed/empty/password)
     # Note: The calling code checks `if not extracted_content`, which catches both None and ""
-    return extracted_text
\ No newline at end of file
+    return extracted_text
+
+async def extract_text_from_file(file_path: Path, filename: str, progress: Optional[ProgressCallback] = None) -> Optional[str]:
+    """
+    Asynchronously extracts text from an uploaded file that is already on disk.
+
+    Same contract as extract_text, but reads from the saved file instead of an
+    in-memory copy: PDFs are memory-mapped for PyMuPDF and TXT files are decoded
+    while reading, so no full bytes copy of the upload is held in memory.
+
+    Args:
+        file_path: Path of the saved upload.
+        filename: The original name of the file (used to determine type).
+        progress: Optional callback invoked as pages are extracted (may run in a worker thread).
+    """
+    file_path = Path(file_path)
+    if file_path.stat().st_size == 0:
+        logger.warning(f"File '{filename}' is empty. No text to extract.")
+        return ""
+
+    file_ext = Path(filename).suffix.lower()
+    logger.info(f"Attempting to extract text from file on disk: {filename} (type: {file_ext})")
+
+    try:
+        if file_ext == ".pdf":
+            return await _extract_pdf_file(file_path, progress)
+        elif file_ext == ".txt":
+            text = await asyncio.to_thread(_extract_txt_file_sync, file_path)
+            if progress:
+                progress(1, 1)
+            return text
+        else:
+            logger.warning(f"Unsupported file type: '{file_ext}' for file '{filename}'")
+            return None
+    except Exception as e:
+        logger.error(f"Unexpected error during text extraction process for {filename}: {e}", exc_info=True)
+        return ""
@@ -0,0 +1,74 @@
+# app/utils/tokens.py
+import os
+import re
+from typing import Optional
+
+# Token counting used for prompt budgeting and usage accounting.
+# Uses tiktoken's cl100k_base encoding when it is installed (close to the
+# Llama 3 tokenizer on English text). Otherwise a local word-piece estimate
+# is used, which errs slightly high so budgets are not overrun by under-counting.
+try:
+    import tiktoken
+    _ENCODING = tiktoken.get_encoding("cl100k_base")
+except Exception: # Not installed, or the encoding cannot be loaded offline
+    _ENCODING = None
+
+# Letter runs, digit runs and single symbols, roughly how BPE tokenizers pre-split text
+_PIECE_RE = re.compile(r"[^\W\d_]+|\d+|[^\w\s]|_")
+_LETTERS_PER_TOKEN = 6
+_DIGITS_PER_TOKEN = 3 # Llama 3 splits numbers into groups of up to three digits
+
+# Context window per Groq model; unknown models fall back to the smallest common size
+MODEL_CONTEXT_WINDOWS = {
+    "llama3-8b-8192": 8192,
+    "llama3-70b-8192": 8192,
+    "llama-3.1-8b-instant": 131072,
+    "llama-3.3-70b-versatile": 131072,
+    "mixtral-8x7b-32768": 32768,
+    "gemma-7b-it": 8192,
+    "gemma2-9b-it": 8192,
+}
+DEFAULT_CONTEXT_WINDOW = 8192
+# Overrides the table above for every model when set
+LLM_CONTEXT_WINDOW = int(os.getenv("LLM_CONTEXT_WINDOW", "0"))
+# Tokens kept free for the model's answer when budgeting a prompt
+LLM_COMPLETION_TOKEN_RESERVE = int(os.getenv("LLM_COMPLETION_TOKEN_RESERVE", "1024"))
+
+def _piece_tokens(piece: str) -> int:
+    if piece.isdigit():
+        return -(-len(piece) // _DIGITS_PER_TOKEN)
+    if piece.isascii():
+        return 1 + (len(piece) - 1) // _LETTERS_PER_TOKEN
+    return len(piece) # Non-Latin scripts are often a token per character or more
+
+def estimate_tokens(text: str) -> int:
+    """Returns the token count of a piece of text (exact with tiktoken, estimated otherwise)."""
+    if not text:
+        return 0
+    if _ENCODING is not None:
+        return len(_ENCODING.encode(text, disallowed_special=()))
+    return sum(_piece_tokens(match.group()) for match in _PIECE_RE.finditer(text))
+
+def truncate_to_tokens(text: str, max_tokens: int) -> str:
+    """Cuts text down to at most max_tokens tokens, keeping the beginning."""
+    if max_tokens <= 0:
+        return ""
+    if _ENCODING is not None:
+        tokens = _ENCODING.encode(text, disallowed_special=())
+        return text if len(tokens) <= max_tokens else _ENCODING.decode(tokens[:max_tokens])
+    used = 0
+    for match in _PIECE_RE.finditer(text):
+        used += _piece_tokens(match.group())
+        if used > max_tokens:
+            return text[:match.start()].rstrip()
+    return text
+
+def context_window(model_name: Optional[str]) -> int:
+    """Context window size in tokens for a model."""
+    if LLM_CONTEXT_WINDOW:
+        return LLM_CONTEXT_WINDOW
+    return MODEL_CONTEXT_WINDOWS.get(model_name or "", DEFAULT_CONTEXT_WINDOW)
+
+def prompt_budget(model_name: Optional[str], completion_reserve: int = LLM_COMPLETION_TOKEN_RESERVE) -> int:
+    """Maximum prompt size in tokens for a model, leaving room for the completion."""
+    return context_window(model_name) - completion_reserve
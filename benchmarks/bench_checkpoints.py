@@ -0,0 +1,104 @@
+# benchmarks/bench_checkpoints.py
+"""
+Measures checkpoint read/write cost per chat turn.
+
+Runs the real chat graph (with a canned in-process LLM, no Groq calls) for a
+number of sessions and turns, once with LangGraph's MemorySaver and once with
+SqliteCheckpointSaver, and reports time spent inside the checkpointer.
+
+Usage:
+    python -m benchmarks.bench_checkpoints --sessions 20 --turns 30 [--json results.json]
+"""
+import os
+import sys
+import json
+import time
+import logging
+import asyncio
+import argparse
+import tempfile
+from pathlib import Path
+
+os.environ.setdefault("GROQ_API_KEY", "benchmark-placeholder")
+
+from langchain_core.messages import AIMessage
+from langgraph.checkpoint.memory import MemorySaver
+
+from app.services import langgraph_flow
+from app.services.checkpoint_store import SqliteCheckpointSaver
+
+class _CannedLLM:
+    """Returns a fixed-size reply instantly so only checkpoint cost is measured."""
+    async def ainvoke(self, messages, *args, **kwargs):
+        return AIMessage(content="This is a canned benchmark answer. " * 20)
+
+def _timed(saver):
+    """Wraps a saver's async read/write methods to accumulate time spent in them."""
+    timings = {"read_s": 0.0, "reads": 0, "write_s": 0.0, "writes": 0}
+
+    def wrap(name, bucket):
+        original = getattr(saver, name)
+        async def timed(*args, **kwargs):
+            started = time.perf_counter()
+            try:
+                return await original(*args, **kwargs)
+            finally:
+                timings[f"{bucket}_s"] += time.perf_counter() - started
+                timings[f"{bucket}s"] += 1
+        setattr(saver, name, timed)
+
+    wrap("aget_tuple", "read")
+    wrap("aput", "write")
+    wrap("aput_writes", "write")
+    return timings
+
+async def _run(saver, sessions: int, turns: int) -> dict:
+    timings = _timed(saver)
+    graph = langgraph_flow.workflow.compile(checkpointer=saver)
+    started = time.perf_counter()
+    for turn in range(turns):
+        for session in range(sessions):
+            config = {"configurable": {"thread_id": f"bench-{session}"}}
+            await graph.ainvoke(langgraph_flow._build_chat_state(f"Question {turn} about clause {session}?"), config=config)
+    elapsed = time.perf_counter() - started
+    total_turns = sessions * turns
+    return {
+        "turns": total_turns,
+        "wall_ms_per_turn": elapsed * 1000 / total_turns,
+        "read_ms_per_turn": timings["read_s"] * 1000 / total_turns,
+        "write_ms_per_turn": timings["write_s"] * 1000 / total_turns,
+        "reads_per_turn": timings["reads"] / total_turns,
+        "writes_per_turn": timings["writes"] / total_turns,
+    }
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sessions", type=int, default=20)
+    parser.add_argument("--turns", type=int, default=30)
+    parser.add_argument("--json", type=Path, help="Write results to this JSON file")
+    args = parser.parse_args(argv)
+
+    logging.getLogger().setLevel(logging.WARNING) # Per-turn INFO logs would dominate the timings
+    langgraph_flow.chat_llm = _CannedLLM()
+    results = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        savers = {
+            "memory": MemorySaver(),
+            "sqlite": SqliteCheckpointSaver(Path(tmp) / "checkpoints.sqlite3"),
+            "sqlite_nocache": SqliteCheckpointSaver(Path(tmp) / "checkpoints_nocache.sqlite3", cache_max_bytes=0),
+        }
+        for name, saver in savers.items():
+            results[name] = asyncio.run(_run(saver, args.sessions, args.turns))
+            if isinstance(saver, SqliteCheckpointSaver):
+                results[name]["stats"] = saver.stats()
+                saver.close()
+
+    print(f"{'saver':<16}{'wall ms/turn':>14}{'read ms/turn':>14}{'write ms/turn':>15}")
+    for name, r in results.items():
+        print(f"{name:<16}{r['wall_ms_per_turn']:>14.3f}{r['read_ms_per_turn']:>14.3f}{r['write_ms_per_turn']:>15.3f}")
+    if args.json:
+        args.json.write_text(json.dumps(results, indent=2))
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,321 @@
+# benchmarks/bench_extraction.py
+"""
+Measures document text extraction across page counts, text density and concurrency.
+
+Generates a synthetic corpus of PDFs (PyMuPDF) and TXT files with the same
+text, from 1 to 1000+ pages at several text densities. Each document is then
+extracted N times concurrently, both from memory (extract_text) and from
+disk (extract_text_from_file, the upload path). The benchmark reports:
+- wall time, pages/s and MB/s;
+- per-extraction latency;
+- peak RSS of this process;
+- thread-pool saturation, i.e. the peak number of busy extraction threads
+  and how long extractions waited for a thread.
+
+Large PDFs read from disk are extracted in worker processes; their memory is
+not included in the RSS figures.
+
+Results are written as JSON so runs on different commits can be compared.
+
+Usage:
+    python -m benchmarks.bench_extraction --pages 1,10,100,1000 --concurrency 1,4 --json extraction.json
+    python -m benchmarks.bench_extraction --corpus-dir data/bench_corpus --compare extraction.json
+"""
+import os
+import sys
+import json
+import time
+import random
+import logging
+import asyncio
+import argparse
+import platform
+import tempfile
+import functools
+import threading
+import statistics
+import subprocess
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional
+
+import fitz
+
+from app.utils import pdf_parser
+from app.utils.pdf_parser import PAGE_BREAK, extract_text, extract_text_from_file
+
+# Lines per page and font size for each text density
+DENSITIES = {"sparse": (10, 11), "normal": (35, 10), "dense": (70, 8)}
+_WORDS = (
+    "agreement party tenant landlord shall notice terminate clause deposit payment premises "
+    "obligation liability indemnify governing law jurisdiction confidential information term"
+).split()
+# Blocking helpers the parser runs on the default thread pool
+_THREAD_HELPERS = ("_extract_pdf_text_sync", "_extract_txt_text_sync", "_extract_pdf_file_sync", "_extract_txt_file_sync", "_pdf_info_sync")
+
+@dataclass
+class Document:
+    kind: str
+    pages: int
+    density: str
+    path: Path
+
+    @property
+    def filename(self) -> str:
+        return self.path.name
+
+def _page_text(rng: random.Random, page: int, lines: int) -> str:
+    return "\n".join(
+        f"{page}.{line} " + " ".join(rng.choice(_WORDS) for _ in range(12))
+        for line in range(1, lines + 1)
+    )
+
+def build_corpus(directory: Path, kinds: List[str], page_counts: List[int], densities: List[str], seed: int) -> List[Document]:
+    """Generates (or reuses, if already in `directory`) one document per kind, page count and density."""
+    directory.mkdir(parents=True, exist_ok=True)
+    corpus = []
+    for density in densities:
+        lines, font_size = DENSITIES[density]
+        for pages in page_counts:
+            texts = None
+            for kind in kinds:
+                path = directory / f"{density}_{pages}p.{kind}"
+                if not path.exists():
+                    rng = random.Random(f"{seed}-{density}-{pages}")
+                    texts = texts or [_page_text(rng, page, lines) for page in range(1, pages + 1)]
+                    if kind == "pdf":
+                        doc = fitz.open()
+                        for text in texts:
+                            doc.new_page().insert_text((48, 48), text, fontsize=font_size)
+                        doc.save(path, garbage=3, deflate=True)
+                        doc.close()
+                    else:
+                        path.write_text(PAGE_BREAK.join(texts), encoding="utf-8")
+                corpus.append(Document(kind, pages, density, path))
+    return corpus
+
+def _current_rss() -> Optional[int]:
+    """Resident set size of this process in bytes, or None where /proc is unavailable."""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError):
+        return None
+
+class RssSampler:
+    """Samples RSS in a background thread to find the peak while a block runs."""
+
+    def __init__(self, interval: float = 0.005):
+        self.interval = interval
+        self.baseline = self.peak = _current_rss() or 0
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._sample, daemon=True)
+
+    def _sample(self) -> None:
+        while not self._stop.wait(self.interval):
+            self.peak = max(self.peak, _current_rss() or 0)
+
+    def __enter__(self) -> "RssSampler":
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self._stop.set()
+        self._thread.join()
+        self.peak = max(self.peak, _current_rss() or 0)
+
+# Per-extraction timing record, visible to the worker thread through the copied context
+_extraction: ContextVar[Optional[Dict[str, Optional[float]]]] = ContextVar("bench_extraction", default=None)
+
+class ThreadPoolProbe:
+    """Counts busy extraction threads by wrapping the parser's blocking helpers."""
+
+    def __init__(self):
+        self.busy = 0
+        self.peak_busy = 0
+        self._lock = threading.Lock()
+        self._local = threading.local()
+
+    def _wrap(self, helper):
+        @functools.wraps(helper)
+        def wrapper(*args, **kwargs):
+            record = _extraction.get()
+            if record is not None and record["started"] is None:
+                record["started"] = time.perf_counter()
+            depth = getattr(self._local, "depth", 0) # Helpers call each other; count the outermost only
+            self._local.depth = depth + 1
+            if not depth:
+                with self._lock:
+                    self.busy += 1
+                    self.peak_busy = max(self.peak_busy, self.busy)
+            try:
+                return helper(*args, **kwargs)
+            finally:
+                self._local.depth = depth
+                if not depth:
+                    with self._lock:
+                        self.busy -= 1
+        return wrapper
+
+    @contextmanager
+    def installed(self) -> Iterator["ThreadPoolProbe"]:
+        originals = {name: getattr(pdf_parser, name) for name in _THREAD_HELPERS}
+        try:
+            for name, helper in originals.items():
+                setattr(pdf_parser, name, self._wrap(helper))
+            yield self
+        finally:
+            for name, helper in originals.items():
+                setattr(pdf_parser, name, helper)
+
+async def _extract_once(doc: Document, path: str, content: Optional[bytes]) -> Dict[str, float]:
+    record = {"submitted": time.perf_counter(), "started": None}
+    _extraction.set(record) # Each gathered task runs in its own context copy
+    if path == "bytes":
+        text = await extract_text(doc.filename, content)
+    else:
+        text = await extract_text_from_file(doc.path, doc.filename)
+    finished = time.perf_counter()
+    if not text:
+        raise RuntimeError(f"No text extracted from {doc.path} ({path})")
+    return {
+        "latency": finished - record["submitted"],
+        "queue_wait": (record["started"] or record["submitted"]) - record["submitted"],
+        "characters": len(text),
+    }
+
+async def _run_case(doc: Document, path: str, concurrency: int, repeat: int, warmup: int, threads: int, probe: ThreadPoolProbe) -> Dict[str, object]:
+    content = doc.path.read_bytes() if path == "bytes" else None # Reading is not part of extraction
+    runs = []
+    for run in range(warmup + repeat):
+        probe.peak_busy = 0
+        with RssSampler() as rss:
+            started = time.perf_counter()
+            extractions = await asyncio.gather(*(_extract_once(doc, path, content) for _ in range(concurrency)))
+            wall = time.perf_counter() - started
+        if run >= warmup:
+            runs.append({"wall": wall, "extractions": extractions, "peak_busy": probe.peak_busy, "rss": rss})
+
+    walls = [r["wall"] for r in runs]
+    latencies = [e["latency"] for r in runs for e in r["extractions"]]
+    waits = [e["queue_wait"] for r in runs for e in r["extractions"]]
+    wall = statistics.median(walls)
+    file_mb = doc.path.stat().st_size / (1024 * 1024)
+    peak_busy = max(r["peak_busy"] for r in runs)
+    return {
+        "kind": doc.kind, "path": path, "pages": doc.pages, "density": doc.density, "concurrency": concurrency,
+        "file_mb": round(file_mb, 3),
+        "characters": runs[0]["extractions"][0]["characters"],
+        "wall_s": wall,
+        "wall_s_min": min(walls),
+        "pages_per_s": concurrency * doc.pages / wall,
+        "mb_per_s": concurrency * file_mb / wall,
+        "latency_p50_s": statistics.median(latencies),
+        "latency_max_s": max(latencies),
+        "queue_wait_mean_s": statistics.fmean(waits),
+        "queue_wait_max_s": max(waits),
+        "peak_busy_threads": peak_busy,
+        "thread_pool_size": threads,
+        "thread_pool_saturation": peak_busy / threads,
+        "peak_rss_mb": max(r["rss"].peak for r in runs) / (1024 * 1024),
+        "rss_growth_mb": max(r["rss"].peak - r["rss"].baseline for r in runs) / (1024 * 1024),
+    }
+
+async def _run(corpus: List[Document], paths: List[str], concurrencies: List[int], repeat: int, warmup: int, threads: int) -> List[dict]:
+    # A known pool size so saturation is comparable between machines and runs
+    asyncio.get_running_loop().set_default_executor(ThreadPoolExecutor(max_workers=threads))
+    probe = ThreadPoolProbe()
+    results = []
+    with probe.installed():
+        for doc in corpus:
+            for path in paths:
+                for concurrency in concurrencies:
+                    results.append(await _run_case(doc, path, concurrency, repeat, warmup, threads, probe))
+                    r = results[-1]
+                    print(
+                        f"{r['kind']:<5}{r['path']:<7}{r['density']:<8}{r['pages']:>6}{r['concurrency']:>5}"
+                        f"{r['wall_s'] * 1000:>12.1f}{r['pages_per_s']:>12.1f}{r['mb_per_s']:>9.2f}"
+                        f"{r['queue_wait_max_s'] * 1000:>11.1f}{r['peak_busy_threads']:>6}{r['peak_rss_mb']:>10.1f}",
+                        flush=True,
+                    )
+    pdf_parser.shutdown_extraction_pool()
+    return results
+
+def _case_key(result: dict) -> tuple:
+    return (result["kind"], result["path"], result["density"], result["pages"], result["concurrency"])
+
+def compare(previous: dict, results: List[dict]) -> None:
+    """Prints pages/s of this run against an earlier results file, case by case."""
+    before = {_case_key(r): r for r in previous.get("results", [])}
+    print(f"\ncompared with {previous.get('metadata', {}).get('commit') or 'previous run'}:")
+    if not any(_case_key(r) in before for r in results):
+        print("no cases in common")
+    for r in results:
+        old = before.get(_case_key(r))
+        if old:
+            change = (r["pages_per_s"] / old["pages_per_s"] - 1) * 100
+            print(f"{' '.join(str(part) for part in _case_key(r)):<36}{old['pages_per_s']:>12.1f} -> {r['pages_per_s']:>10.1f} pages/s ({change:+.1f}%)")
+
+def _commit() -> Optional[str]:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def _csv(cast):
+    return lambda value: [cast(part) for part in value.split(",") if part]
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--pages", type=_csv(int), default=[1, 10, 100, 1000])
+    parser.add_argument("--densities", type=_csv(str), default=["sparse", "normal", "dense"])
+    parser.add_argument("--kinds", type=_csv(str), default=["pdf", "txt"])
+    parser.add_argument("--paths", type=_csv(str), default=["bytes", "file"], help="bytes: extract_text, file: extract_text_from_file")
+    parser.add_argument("--concurrency", type=_csv(int), default=[1, 4], help="Concurrent extractions of the same document")
+    parser.add_argument("--repeat", type=int, default=3, help="Measured runs per case (the median is reported)")
+    parser.add_argument("--warmup", type=int, default=1, help="Unmeasured runs per case")
+    parser.add_argument("--threads", type=int, default=min(32, (os.cpu_count() or 1) + 4), help="Default thread pool size")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--corpus-dir", type=Path, help="Keep generated documents here and reuse them across runs")
+    parser.add_argument("--json", type=Path, help="Write results to this JSON file")
+    parser.add_argument("--compare", type=Path, help="Earlier --json output to compare pages/s against")
+    args = parser.parse_args(argv)
+    unknown = set(args.densities) - set(DENSITIES)
+    if unknown:
+        parser.error(f"Unknown densities {sorted(unknown)}; expected {sorted(DENSITIES)}")
+
+    logging.getLogger().setLevel(logging.WARNING) # Per-extraction INFO logs would dominate small cases
+    previous = json.loads(args.compare.read_text()) if args.compare else None
+
+    print(f"{'kind':<5}{'path':<7}{'density':<8}{'pages':>6}{'conc':>5}{'wall ms':>12}{'pages/s':>12}{'MB/s':>9}{'wait ms':>11}{'busy':>6}{'RSS MB':>10}")
+    with tempfile.TemporaryDirectory() as tmp:
+        corpus = build_corpus(args.corpus_dir or Path(tmp), args.kinds, args.pages, args.densities, args.seed)
+        results = asyncio.run(_run(corpus, args.paths, args.concurrency, args.repeat, args.warmup, args.threads))
+
+    output = {
+        "metadata": {
+            "commit": _commit(),
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+            "python": platform.python_version(),
+            "pymupdf": fitz.VersionBind,
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+            "threads": args.threads,
+            "extraction_workers": pdf_parser.EXTRACTION_WORKERS,
+            "parallel_extraction_min_pages": pdf_parser.PARALLEL_EXTRACTION_MIN_PAGES,
+            "repeat": args.repeat,
+            "seed": args.seed,
+        },
+        "results": results,
+    }
+    if previous:
+        compare(previous, results)
+    if args.json:
+        args.json.write_text(json.dumps(output, indent=2))
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
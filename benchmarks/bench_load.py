@@ -0,0 +1,282 @@
+# benchmarks/bench_load.py
+"""
+End-to-end load test of the HTTP API against a fake Groq upstream.
+
+Starts benchmarks/fake_groq.py and the app (uvicorn) as subprocesses, with
+throwaway data directories, then runs a fixed number of concurrent virtual
+users for a fixed duration. Each user uploads a document and then issues a
+weighted mix of requests to /upload, /assistant/chat/{session_id} and
+/assistant/generate/{session_id}, back to back (closed loop). Reports
+throughput and p50/p95/p99 latency per endpoint.
+
+Questions and contract details are unique per request so the app's response
+cache does not flatter the results; pass --repeat to measure cache hits.
+Other app settings (e.g. LLM_MAX_CONCURRENCY) are taken from the environment.
+
+Usage:
+    python -m benchmarks.bench_load --concurrency 16 --duration 30 [--json results.json]
+    python -m benchmarks.bench_load --mix chat=8,generate=1,upload=1 --upstream-latency 0.5 --error-rate 0.05
+    python -m benchmarks.bench_load --target http://127.0.0.1:8000   # against an app that is already running
+"""
+import os
+import sys
+import json
+import math
+import time
+import random
+import socket
+import asyncio
+import argparse
+import tempfile
+import itertools
+import subprocess
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional
+
+import httpx
+
+REPO_ROOT = Path(__file__).resolve().parent.parent
+OPERATIONS = ("chat", "generate", "upload")
+
+_CLAUSE = (
+    "{n}. The Tenant shall pay rent of {amount} USD on the first day of each month. "
+    "Either party may terminate this agreement with {days} days written notice. "
+    "The deposit is refundable within 30 days after the premises are returned in good condition.\n"
+)
+
+def percentile(samples: List[float], q: float) -> float:
+    """Nearest-rank percentile of a list of samples (0 when empty)."""
+    if not samples:
+        return 0.0
+    ordered = sorted(samples)
+    return ordered[max(1, math.ceil(q / 100 * len(ordered))) - 1]
+
+@dataclass
+class OperationStats:
+    latencies: List[float] = field(default_factory=list)
+    errors: int = 0
+    statuses: Dict[int, int] = field(default_factory=dict)
+
+    def record(self, seconds: float, status: int, ok: bool) -> None:
+        self.latencies.append(seconds)
+        self.statuses[status] = self.statuses.get(status, 0) + 1
+        if not ok:
+            self.errors += 1
+
+    def summary(self, elapsed: float) -> Dict[str, object]:
+        ms = [s * 1000 for s in self.latencies]
+        return {
+            "requests": len(ms),
+            "errors": self.errors,
+            "throughput_rps": len(ms) / elapsed if elapsed else 0.0,
+            "p50_ms": percentile(ms, 50),
+            "p95_ms": percentile(ms, 95),
+            "p99_ms": percentile(ms, 99),
+            "mean_ms": sum(ms) / len(ms) if ms else 0.0,
+            "max_ms": max(ms, default=0.0),
+            "statuses": {str(code): count for code, count in sorted(self.statuses.items())},
+        }
+
+def parse_mix(spec: str) -> Dict[str, float]:
+    mix = {}
+    for part in spec.split(","):
+        name, _, weight = part.partition("=")
+        if name.strip() not in OPERATIONS:
+            raise argparse.ArgumentTypeError(f"Unknown operation '{name}'; expected one of {OPERATIONS}")
+        mix[name.strip()] = float(weight or 1)
+    return mix
+
+def synthetic_document(user: int, size_kb: int) -> bytes:
+    """A plain-text lease of roughly size_kb, different per user so uploads are not deduplicated."""
+    rng = random.Random(user)
+    lines, size = [f"Residential Lease Agreement #{user}\n\n"], 0
+    for n in itertools.count(1):
+        line = _CLAUSE.format(n=n, amount=rng.randint(500, 5000), days=rng.choice((30, 60, 90)))
+        lines.append(line)
+        size += len(line)
+        if size >= size_kb * 1024:
+            break
+    return "".join(lines).encode()
+
+class LoadGenerator:
+    def __init__(self, target: str, mix: Dict[str, float], document_kb: int, repeat: float, seed: int):
+        self.target = target.rstrip("/")
+        self.operations = list(mix)
+        self.weights = [mix[name] for name in self.operations]
+        self.document_kb = document_kb
+        self.repeat = repeat
+        self.random = random.Random(seed)
+        self.stats: Dict[str, OperationStats] = {name: OperationStats() for name in OPERATIONS}
+        self._counter = itertools.count(1)
+        self._uploads = itertools.count(1)
+
+    async def _timed(self, operation: str, request) -> Optional[httpx.Response]:
+        started = time.perf_counter()
+        try:
+            response = await request
+        except httpx.HTTPError:
+            self.stats[operation].record(time.perf_counter() - started, 0, False)
+            return None
+        self.stats[operation].record(time.perf_counter() - started, response.status_code, response.status_code < 400)
+        return response
+
+    async def upload(self, client: httpx.AsyncClient, user: int) -> Optional[str]:
+        """Uploads a document; returns the new session ID from the redirect to the chat page."""
+        document = synthetic_document(user * 100000 + next(self._uploads), self.document_kb)
+        files = {"file": (f"lease_{user}.txt", document, "text/plain")}
+        response = await self._timed("upload", client.post(f"{self.target}/upload", files=files))
+        if response is None or response.status_code != 303:
+            return None
+        return response.headers["location"].rstrip("/").rsplit("/", 1)[-1]
+
+    def _unique(self) -> int:
+        # With --repeat, a share of requests reuses earlier text so the response cache can hit
+        if self.repeat and self.random.random() < self.repeat:
+            return self.random.randint(1, 20)
+        return next(self._counter) + 1000
+
+    async def chat(self, client: httpx.AsyncClient, session_id: str) -> None:
+        question = f"Question {self._unique()}: what notice period applies to termination, and is the deposit refundable?"
+        await self._timed("chat", client.post(f"{self.target}/assistant/chat/{session_id}", data={"user_input": question}))
+
+    async def generate(self, client: httpx.AsyncClient, session_id: str) -> None:
+        contract_type = self.random.choice(("nda", "rental_agreement"))
+        details = f"Parties are ACME Corp and Client {self._unique()} Inc, governed by the laws of Delaware, effective 2025-01-01."
+        data = {"contract_type": contract_type, "details": details}
+        await self._timed("generate", client.post(f"{self.target}/assistant/generate/{session_id}", data=data))
+
+    async def user(self, client: httpx.AsyncClient, user: int, stop_at: float) -> None:
+        session_id = await self.upload(client, user) or os.urandom(16).hex()
+        while time.perf_counter() < stop_at:
+            operation = self.random.choices(self.operations, self.weights)[0]
+            if operation == "upload":
+                session_id = await self.upload(client, user) or session_id
+            elif operation == "chat":
+                await self.chat(client, session_id)
+            else:
+                await self.generate(client, session_id)
+
+    async def run(self, concurrency: int, duration: float, timeout: float) -> float:
+        limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+        async with httpx.AsyncClient(timeout=timeout, limits=limits) as client:
+            started = time.perf_counter()
+            stop_at = started + duration
+            await asyncio.gather(*(self.user(client, user, stop_at) for user in range(concurrency)))
+            return time.perf_counter() - started
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+def _wait_ready(url: str, process: subprocess.Popen, timeout: float = 60) -> None:
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f"{' '.join(process.args)} exited with code {process.returncode}")
+        try:
+            if httpx.get(url, timeout=1).status_code == 200:
+                return
+        except httpx.HTTPError:
+            pass
+        time.sleep(0.2)
+    raise RuntimeError(f"{url} did not become ready within {timeout:.0f}s")
+
+@contextmanager
+def local_stack(args) -> Iterator[Dict[str, str]]:
+    """Runs the fake Groq server and the app on free local ports; yields their URLs."""
+    groq_port, app_port = _free_port(), _free_port()
+    processes: List[subprocess.Popen] = []
+    with tempfile.TemporaryDirectory() as tmp:
+        env = {
+            **os.environ,
+            "GROQ_API_KEY": "fake-benchmark-key",
+            "GROQ_BASE_URL": f"http://127.0.0.1:{groq_port}",
+            # Persistent stores go to a throwaway directory so every run starts cold
+            "CHECKPOINT_DB_PATH": f"{tmp}/checkpoints.sqlite3",
+            "SEARCH_INDEX_PATH": f"{tmp}/search_index.sqlite3",
+            "EXTRACTION_CACHE_DIR": f"{tmp}/extraction_cache",
+            "DOCUMENT_DB_PATH": f"{tmp}/documents.sqlite3",
+            # The fake upstream has no account limits; set these to model real Groq quotas
+            "GROQ_RPM_LIMIT": str(args.rpm_limit),
+            "GROQ_TPM_LIMIT": str(args.tpm_limit),
+        }
+        try:
+            processes.append(subprocess.Popen([
+                sys.executable, "-m", "benchmarks.fake_groq", "--port", str(groq_port),
+                "--latency", str(args.upstream_latency), "--tokens-per-second", str(args.tokens_per_second),
+                "--error-rate", str(args.error_rate), "--error-status", str(args.error_status), "--seed", str(args.seed),
+            ], cwd=REPO_ROOT, env=env))
+            _wait_ready(f"http://127.0.0.1:{groq_port}/stats", processes[-1])
+            processes.append(subprocess.Popen([
+                sys.executable, "-m", "uvicorn", "app.main:app", "--port", str(app_port),
+                "--workers", str(args.workers), "--log-level", "warning", "--no-access-log",
+            ], cwd=REPO_ROOT, env={**env, "PYTHONWARNINGS": "ignore"}))
+            _wait_ready(f"http://127.0.0.1:{app_port}/health", processes[-1])
+            yield {"app": f"http://127.0.0.1:{app_port}", "groq": f"http://127.0.0.1:{groq_port}"}
+        finally:
+            for process in reversed(processes):
+                process.terminate()
+                try:
+                    process.wait(timeout=10)
+                except subprocess.TimeoutExpired:
+                    process.kill()
+
+def _run(args, target: str, upstream: Optional[str]) -> dict:
+    generator = LoadGenerator(target, args.mix, args.document_kb, args.repeat, args.seed)
+    elapsed = asyncio.run(generator.run(args.concurrency, args.duration, args.timeout))
+    results = {
+        "settings": {
+            "concurrency": args.concurrency, "duration_s": args.duration, "mix": args.mix, "document_kb": args.document_kb,
+            "repeat": args.repeat, "workers": args.workers if upstream else None,
+        },
+        "elapsed_s": elapsed,
+        "operations": {name: stats.summary(elapsed) for name, stats in generator.stats.items() if stats.latencies},
+    }
+    total = sum(len(s.latencies) for s in generator.stats.values())
+    results["total"] = {"requests": total, "throughput_rps": total / elapsed if elapsed else 0.0}
+    if upstream:
+        results["upstream"] = httpx.get(f"{upstream}/stats").json()
+    return results
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--target", help="Base URL of a running app; by default a local app and fake Groq are started")
+    parser.add_argument("--concurrency", type=int, default=16, help="Concurrent virtual users")
+    parser.add_argument("--duration", type=float, default=30, help="Seconds to generate load for")
+    parser.add_argument("--mix", type=parse_mix, default=parse_mix("chat=8,generate=1,upload=1"), help="Weighted operation mix")
+    parser.add_argument("--document-kb", type=int, default=64, help="Size of each uploaded document")
+    parser.add_argument("--repeat", type=float, default=0.0, help="Fraction of requests reusing earlier text (cache hits)")
+    parser.add_argument("--timeout", type=float, default=120, help="Per-request client timeout")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--workers", type=int, default=1, help="uvicorn workers for the local app")
+    parser.add_argument("--upstream-latency", type=float, default=0.2, help="Fake Groq time to first token")
+    parser.add_argument("--tokens-per-second", type=float, default=500.0, help="Fake Groq generation speed")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Fraction of fake Groq requests that fail")
+    parser.add_argument("--error-status", type=int, default=503)
+    parser.add_argument("--rpm-limit", type=int, default=0, help="GROQ_RPM_LIMIT for the local app (0 = unlimited)")
+    parser.add_argument("--tpm-limit", type=int, default=0, help="GROQ_TPM_LIMIT for the local app (0 = unlimited)")
+    parser.add_argument("--json", type=Path, help="Write results to this JSON file")
+    args = parser.parse_args(argv)
+
+    if args.target:
+        results = _run(args, args.target, None)
+    else:
+        with local_stack(args) as urls:
+            results = _run(args, urls["app"], urls["groq"])
+
+    print(f"{'endpoint':<10}{'requests':>10}{'errors':>8}{'req/s':>9}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}")
+    for name, r in results["operations"].items():
+        print(f"{name:<10}{r['requests']:>10}{r['errors']:>8}{r['throughput_rps']:>9.2f}{r['p50_ms']:>10.1f}{r['p95_ms']:>10.1f}{r['p99_ms']:>10.1f}")
+    print(f"{'total':<10}{results['total']['requests']:>10}{'':>8}{results['total']['throughput_rps']:>9.2f}")
+    if "upstream" in results:
+        upstream = results["upstream"]
+        print(f"upstream: {upstream['requests']} requests ({upstream['errors']} injected errors, {upstream['streamed']} streamed)")
+    if args.json:
+        args.json.write_text(json.dumps(results, indent=2))
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,106 @@
+# benchmarks/bench_startup.py
+"""
+Measures cold start: importing the app and booting a worker to its first /health.
+
+Each run uses a fresh interpreter, so nothing is cached in memory between
+runs. For every run the benchmark measures:
+- the time to `import app.main`, and which heavy dependencies that import loaded;
+- the time from launching uvicorn until /health first answers 200.
+
+Startup warm-up (WARM_UP_ON_STARTUP) keeps running in the background after
+/health is up and is not part of the boot time.
+
+The run fails (exit code 1) if the median boot time exceeds --budget or
+importing the app loads any of HEAVY_MODULES, so the script can guard
+against import-time regressions.
+
+Usage:
+    python -m benchmarks.bench_startup --runs 5 --budget 1.0 [--json startup.json]
+"""
+import os
+import sys
+import json
+import time
+import socket
+import argparse
+import statistics
+import subprocess
+from pathlib import Path
+
+import httpx
+
+REPO_ROOT = Path(__file__).resolve().parent.parent
+# Dependencies that must not be imported just to boot a worker
+HEAVY_MODULES = ("fitz", "langgraph", "langchain_core", "langchain_groq", "groq")
+DEFAULT_BUDGET_SECONDS = 1.0
+
+_IMPORT_PROBE = f"""
+import json, sys, time
+started = time.perf_counter()
+import app.main
+elapsed = time.perf_counter() - started
+print(json.dumps({{"import_s": elapsed, "heavy_modules": [m for m in {HEAVY_MODULES!r} if m in sys.modules]}}))
+"""
+
+def measure_import(env: dict) -> dict:
+    output = subprocess.run([sys.executable, "-c", _IMPORT_PROBE], cwd=REPO_ROOT, env=env, capture_output=True, text=True, check=True)
+    return json.loads(output.stdout.strip().splitlines()[-1])
+
+def measure_boot(env: dict, timeout: float = 60) -> float:
+    """Seconds from launching a uvicorn worker until /health answers."""
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        port = sock.getsockname()[1]
+    started = time.perf_counter()
+    process = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "app.main:app", "--port", str(port), "--log-level", "warning"],
+        cwd=REPO_ROOT, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+    try:
+        while time.perf_counter() - started < timeout:
+            if process.poll() is not None:
+                raise RuntimeError(f"uvicorn exited with code {process.returncode}")
+            try:
+                if httpx.get(f"http://127.0.0.1:{port}/health", timeout=1).status_code == 200:
+                    return time.perf_counter() - started
+            except httpx.HTTPError:
+                pass
+            time.sleep(0.01)
+        raise RuntimeError(f"/health did not answer within {timeout:.0f}s")
+    finally:
+        process.terminate()
+        process.wait(timeout=10)
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--budget", type=float, default=DEFAULT_BUDGET_SECONDS, help="Maximum median seconds from launch to /health")
+    parser.add_argument("--json", type=Path, help="Write results to this JSON file")
+    args = parser.parse_args(argv)
+
+    # Boot without a Groq key: a worker must come up even when it is missing
+    env = {key: value for key, value in os.environ.items() if key != "GROQ_API_KEY"}
+    env["PYTHONWARNINGS"] = "ignore"
+    imports = [measure_import(env) for _ in range(args.runs)]
+    boots = [measure_boot(env) for _ in range(args.runs)]
+
+    results = {
+        "runs": args.runs,
+        "import_s_median": statistics.median(r["import_s"] for r in imports),
+        "import_s_max": max(r["import_s"] for r in imports),
+        "boot_to_health_s_median": statistics.median(boots),
+        "boot_to_health_s_max": max(boots),
+        "heavy_modules_at_import": sorted({m for r in imports for m in r["heavy_modules"]}),
+        "budget_s": args.budget,
+    }
+    results["within_budget"] = results["boot_to_health_s_median"] <= args.budget and not results["heavy_modules_at_import"]
+
+    print(f"import app.main:   median {results['import_s_median']:.3f}s, max {results['import_s_max']:.3f}s")
+    print(f"launch to /health: median {results['boot_to_health_s_median']:.3f}s, max {results['boot_to_health_s_max']:.3f}s (budget {args.budget:.1f}s)")
+    print(f"heavy modules loaded by import: {', '.join(results['heavy_modules_at_import']) or 'none'}")
+    if args.json:
+        args.json.write_text(json.dumps(results, indent=2))
+    return 0 if results["within_budget"] else 1
+
+if __name__ == "__main__":
+    sys.exit(main())
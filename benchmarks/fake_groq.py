@@ -0,0 +1,158 @@
+# benchmarks/fake_groq.py
+"""
+Local stand-in for Groq's OpenAI-compatible chat completions API.
+
+Answers POST /openai/v1/chat/completions, both plain and streamed (SSE), with
+generated text. Latency, token rate and error rate are configurable, so the
+app can be load tested offline without a Groq key or hitting account limits.
+GET /stats reports what the server has seen.
+
+Usage:
+    python -m benchmarks.fake_groq --port 8900 --latency 0.3 --tokens-per-second 400 --error-rate 0.02
+    GROQ_BASE_URL=http://127.0.0.1:8900 GROQ_API_KEY=fake uvicorn app.main:app
+"""
+import sys
+import json
+import time
+import random
+import asyncio
+import argparse
+import itertools
+from dataclasses import dataclass, asdict
+from typing import AsyncIterator, Dict, List, Optional
+
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, StreamingResponse
+
+from app.utils.tokens import estimate_tokens
+
+_WORDS = (
+    "the parties agree that this clause shall remain in force until terminated by written notice "
+    "subject to applicable law each party retains its rights and obligations under the agreement"
+).split()
+
+@dataclass
+class FakeGroqConfig:
+    latency: float = 0.2 # Seconds before the first token
+    jitter: float = 0.05 # Mean of an exponential delay added to `latency`, for a realistic tail
+    tokens_per_second: float = 500.0 # Generation speed after the first token; 0 means instant
+    completion_tokens: int = 120
+    error_rate: float = 0.0 # Fraction of requests answered with `error_status`
+    error_status: int = 503
+    seed: int = 0
+
+class FakeGroq:
+    """Generates completions and keeps counters for one fake server."""
+
+    def __init__(self, config: FakeGroqConfig):
+        self.config = config
+        self._random = random.Random(config.seed)
+        self._ids = itertools.count(1)
+        self.counters: Dict[str, int] = {"requests": 0, "streamed": 0, "errors": 0, "prompt_tokens": 0, "completion_tokens": 0}
+
+    def _delay(self) -> float:
+        jitter = self._random.expovariate(1 / self.config.jitter) if self.config.jitter > 0 else 0.0
+        return self.config.latency + jitter
+
+    def _tokens(self) -> List[str]:
+        return [f" {self._random.choice(_WORDS)}" for _ in range(self.config.completion_tokens)]
+
+    def _usage(self, prompt_tokens: int) -> Dict[str, int]:
+        completion_tokens = self.config.completion_tokens
+        self.counters["prompt_tokens"] += prompt_tokens
+        self.counters["completion_tokens"] += completion_tokens
+        return {"prompt_tokens": prompt_tokens, "completion_tokens": completion_tokens, "total_tokens": prompt_tokens + completion_tokens}
+
+    def should_fail(self) -> bool:
+        return self._random.random() < self.config.error_rate
+
+    def error_response(self) -> JSONResponse:
+        self.counters["errors"] += 1
+        status = self.config.error_status
+        headers = {"retry-after": "1"} if status == 429 else {}
+        body = {"error": {"message": f"Injected failure ({status})", "type": "fake_groq_error"}}
+        return JSONResponse(body, status_code=status, headers=headers)
+
+    async def completion(self, model: str, prompt_tokens: int) -> Dict:
+        tokens = self._tokens()
+        await asyncio.sleep(self._delay())
+        if self.config.tokens_per_second > 0:
+            await asyncio.sleep(len(tokens) / self.config.tokens_per_second)
+        return {
+            "id": f"chatcmpl-fake-{next(self._ids)}",
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": model,
+            "choices": [{"index": 0, "message": {"role": "assistant", "content": "".join(tokens).strip()}, "finish_reason": "stop"}],
+            "usage": self._usage(prompt_tokens),
+        }
+
+    async def stream(self, model: str, prompt_tokens: int) -> AsyncIterator[str]:
+        completion_id = f"chatcmpl-fake-{next(self._ids)}"
+        created = int(time.time())
+
+        def chunk(delta: Dict, finish_reason=None, **extra) -> str:
+            body = {
+                "id": completion_id, "object": "chat.completion.chunk", "created": created, "model": model,
+                "choices": [{"index": 0, "delta": delta, "finish_reason": finish_reason}], **extra,
+            }
+            return f"data: {json.dumps(body)}\n\n"
+
+        tokens = self._tokens()
+        await asyncio.sleep(self._delay())
+        yield chunk({"role": "assistant", "content": ""})
+        for token in tokens:
+            if self.config.tokens_per_second > 0:
+                await asyncio.sleep(1 / self.config.tokens_per_second)
+            yield chunk({"content": token})
+        # Groq reports usage of a streamed completion in the final chunk's x_groq field
+        yield chunk({}, "stop", x_groq={"id": completion_id, "usage": self._usage(prompt_tokens)})
+        yield "data: [DONE]\n\n"
+
+def create_app(config: Optional[FakeGroqConfig] = None) -> FastAPI:
+    fake = FakeGroq(config or FakeGroqConfig())
+    app = FastAPI(title="Fake Groq")
+    app.state.fake = fake
+
+    @app.post("/openai/v1/chat/completions")
+    async def chat_completions(request: Request):
+        payload = await request.json()
+        fake.counters["requests"] += 1
+        if fake.should_fail():
+            return fake.error_response()
+        model = payload.get("model", "fake-model")
+        prompt_tokens = sum(estimate_tokens(str(m.get("content") or "")) for m in payload.get("messages", []))
+        if payload.get("stream"):
+            fake.counters["streamed"] += 1
+            return StreamingResponse(fake.stream(model, prompt_tokens), media_type="text/event-stream")
+        return await fake.completion(model, prompt_tokens)
+
+    @app.get("/stats")
+    async def stats():
+        return {"config": asdict(fake.config), **fake.counters}
+
+    return app
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8900)
+    parser.add_argument("--latency", type=float, default=FakeGroqConfig.latency)
+    parser.add_argument("--jitter", type=float, default=FakeGroqConfig.jitter)
+    parser.add_argument("--tokens-per-second", type=float, default=FakeGroqConfig.tokens_per_second)
+    parser.add_argument("--completion-tokens", type=int, default=FakeGroqConfig.completion_tokens)
+    parser.add_argument("--error-rate", type=float, default=FakeGroqConfig.error_rate)
+    parser.add_argument("--error-status", type=int, default=FakeGroqConfig.error_status)
+    parser.add_argument("--seed", type=int, default=FakeGroqConfig.seed)
+    args = parser.parse_args(argv)
+
+    import uvicorn
+    config = FakeGroqConfig(
+        latency=args.latency, jitter=args.jitter, tokens_per_second=args.tokens_per_second,
+        completion_tokens=args.completion_tokens, error_rate=args.error_rate, error_status=args.error_status, seed=args.seed,
+    )
+    uvicorn.run(create_app(config), host=args.host, port=args.port, log_level="warning")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,44 @@
+# tests/conftest.py
+import pytest
+
+from app.routes import assistant, batch, home, metrics
+from app.services import digest, ingestion, langgraph_flow, resilience, summarization
+from app.services.document_store import DocumentStore
+from app.services.extraction_cache import ExtractionCache
+from app.services.llm_scheduler import TokenBucket, llm_scheduler
+
+@pytest.fixture(autouse=True)
+def unthrottled_llm_scheduler(monkeypatch):
+    """Fake LLMs have no rate limits; keep the shared scheduler from pacing test calls."""
+    monkeypatch.setattr(llm_scheduler, "requests", TokenBucket(0))
+    monkeypatch.setattr(llm_scheduler, "tokens", TokenBucket(0))
+
+@pytest.fixture(autouse=True)
+def fresh_circuit_breaker(monkeypatch):
+    """Failures simulated by one test must not open the shared breaker for the next."""
+    monkeypatch.setattr(resilience, "llm_breaker", resilience.CircuitBreaker())
+    monkeypatch.setattr(resilience, "llm_latency", resilience.LatencyTracker())
+
+@pytest.fixture(autouse=True)
+def no_document_digest(monkeypatch):
+    """Ingestion and overview questions would otherwise start background LLM calls; digest tests opt back in."""
+    monkeypatch.setattr(digest, "DOCUMENT_DIGEST_ENABLED", False)
+
+@pytest.fixture(autouse=True)
+def isolated_document_store(tmp_path, monkeypatch):
+    """Tests must never touch the shared document database or upload directory a running server uses."""
+    store = DocumentStore(path=tmp_path / "docs.sqlite3")
+    for module in (home, assistant, ingestion, langgraph_flow, metrics):
+        monkeypatch.setattr(module, "document_store", store)
+    monkeypatch.setattr(home, "UPLOAD_DIR", tmp_path / "uploads")
+    monkeypatch.setattr(batch, "UPLOAD_DIR", tmp_path / "uploads")
+    yield store
+    store.close()
+
+@pytest.fixture(autouse=True)
+def isolated_extraction_cache(tmp_path, monkeypatch):
+    """Give each test an empty extraction cache; chat turns load and store indexes in it."""
+    cache = ExtractionCache(tmp_path / "extraction_cache")
+    for module in (ingestion, langgraph_flow, digest, summarization, metrics):
+        monkeypatch.setattr(module, "extraction_cache", cache)
+    return cache
@@ -0,0 +1,139 @@
+# tests/test_batch_analysis.py
+import json
+import asyncio
+import itertools
+import pytest
+from fastapi.testclient import TestClient
+from langchain_core.language_models.fake_chat_models import GenericFakeChatModel
+
+from app.main import app
+from app.routes import batch
+from app.services import batch_analysis, ingestion, langgraph_flow, llm_cache
+from app.services.document_store import DocumentStore
+from app.services.extraction_cache import ExtractionCache
+from app.services.ingestion import IngestionJob
+from app.services.search_index import CorpusIndex
+
+@pytest.fixture(autouse=True)
+def isolated_stores(tmp_path, monkeypatch):
+    """Ingest into throwaway document, search and extraction stores."""
+    monkeypatch.setattr(ingestion, "document_store", DocumentStore(path=tmp_path / "documents.sqlite3"))
+    monkeypatch.setattr(ingestion, "corpus_index", CorpusIndex(tmp_path / "search_index.sqlite3"))
+    monkeypatch.setattr(ingestion, "extraction_cache", ExtractionCache(tmp_path / "extraction_cache"))
+    monkeypatch.setattr(llm_cache, "response_cache", llm_cache.LLMResponseCache(path=None))
+
+def _txt_job(tmp_path, name, text):
+    path = tmp_path / name
+    path.write_text(text)
+    return IngestionJob(session_id=f"s_{name}", filename=name, file_path=path, sha256=name)
+
+def test_batch_endpoint_streams_one_result_per_document(monkeypatch):
+    monkeypatch.setattr(langgraph_flow, "chat_llm", GenericFakeChatModel(messages=itertools.cycle(["Delaware law."])))
+    files = [("files", (f"contract_{i}.txt", f"Contract {i}. Governed by the laws of Delaware.".encode(), "text/plain")) for i in range(3)]
+
+    response = TestClient(app).post("/batch/analyze", files=files, data={"questions": ["Which law governs?", "Who are the parties?"]})
+
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("application/x-ndjson")
+    events = [json.loads(line) for line in response.text.splitlines()]
+    documents = [e for e in events if e["type"] == "document"]
+    assert sorted(d["filename"] for d in documents) == ["contract_0.txt", "contract_1.txt", "contract_2.txt"]
+    assert all(d["status"] == "done" and len(d["answers"]) == 2 for d in documents)
+    assert documents[0]["answers"][0] == {"question": "Which law governs?", "answer": "Delaware law."}
+    assert events[-1]["type"] == "done" and events[-1]["documents"] == 3 and events[-1]["failed"] == 0
+
+def _multipart(parts):
+    """Encodes (name, filename or None, content) parts in order, which httpx's files= would reorder."""
+    body = b""
+    for name, filename, content in parts:
+        disposition = f'form-data; name="{name}"' + (f'; filename="{filename}"' if filename else "")
+        body += f"--b0undary\r\nContent-Disposition: {disposition}\r\n\r\n".encode() + content + b"\r\n"
+    return body + b"--b0undary--\r\n", {"content-type": "multipart/form-data; boundary=b0undary"}
+
+def test_batch_endpoint_requires_questions():
+    files = [("files", ("a.txt", b"text", "text/plain"))]
+    response = TestClient(app).post("/batch/analyze", files=files, data={"questions": ["  "]})
+    assert response.status_code == 400
+
+def test_llm_calls_are_capped_and_failures_do_not_stop_the_batch(tmp_path, monkeypatch):
+    in_flight, peak = 0, 0
+
+    async def slow_answer(question, text, session_id, document_hash=None, bypass_cache=False):
+        nonlocal in_flight, peak
+        in_flight += 1
+        peak = max(peak, in_flight)
+        await asyncio.sleep(0.01)
+        in_flight -= 1
+        return f"{session_id}: {question}"
+
+    monkeypatch.setattr(langgraph_flow, "answer_document_question", slow_answer)
+    jobs = [_txt_job(tmp_path, f"doc{i}.txt", f"Document {i} text.") for i in range(6)]
+    rejected = IngestionJob(session_id="s_big", filename="big.pdf", file_path=tmp_path / "big.pdf", sha256="", status="failed", error="Too large")
+
+    async def collect():
+        return [e async for e in batch_analysis.analyze_batch(jobs + [rejected], ["Q1", "Q2", "Q3"], llm_concurrency=2)]
+
+    events = asyncio.run(collect())
+
+    assert peak == 2
+    documents = {e["filename"]: e for e in events if e["type"] == "document"}
+    assert documents["big.pdf"]["status"] == "failed" and documents["big.pdf"]["answers"] == []
+    assert documents["doc3.txt"]["answers"][1] == {"question": "Q2", "answer": "s_doc3.txt: Q2"}
+    assert events[-1] == {"type": "done", "documents": 7, "failed": 1, "elapsed_s": events[-1]["elapsed_s"]}
+
+def test_questions_must_precede_the_files():
+    body, headers = _multipart([("files", "a.txt", b"text"), ("questions", None, b"Which law governs?")])
+    response = TestClient(app).post("/batch/analyze", content=body, headers=headers)
+    assert response.status_code == 400
+
+def test_oversized_batch_is_rejected_before_reading(monkeypatch):
+    monkeypatch.setattr(batch, "BATCH_MAX_BYTES", 100)
+    body, headers = _multipart([("questions", None, b"Q"), ("files", "a.txt", b"x" * 200)])
+    response = TestClient(app).post("/batch/analyze", content=body, headers=headers)
+    assert response.status_code == 413
+
+def test_files_past_the_limits_are_reported_and_end_the_batch(monkeypatch, tmp_path):
+    monkeypatch.setattr(langgraph_flow, "chat_llm", GenericFakeChatModel(messages=itertools.cycle(["Answer."])))
+    monkeypatch.setattr(batch, "BATCH_MAX_DOCUMENTS", 2)
+    monkeypatch.setattr(batch, "MAX_UPLOAD_BYTES", 20)
+    body, headers = _multipart([
+        ("questions", None, b"Which law governs?"),
+        ("files", "small.txt", b"Delaware law."),
+        ("files", "big.txt", b"x" * 50),
+        ("files", "extra.txt", b"Not read."),
+    ])
+
+    response = TestClient(app).post("/batch/analyze", content=body, headers=headers)
+
+    events = [json.loads(line) for line in response.text.splitlines()]
+    documents = {e["filename"]: e for e in events if e["type"] == "document"}
+    assert documents["small.txt"]["status"] == "done"
+    assert "upload limit" in documents["big.txt"]["error"]
+    assert "At most 2 documents" in documents["extra.txt"]["error"]
+    assert events[-1]["documents"] == 3 and events[-1]["failed"] == 2
+    assert not list((tmp_path / "uploads").glob("*")) # Every saved upload was removed
+
+def test_documents_are_analyzed_while_later_ones_are_still_arriving(tmp_path, monkeypatch):
+    async def quick_answer(question, text, session_id, document_hash=None, bypass_cache=False):
+        return "ok"
+
+    monkeypatch.setattr(langgraph_flow, "answer_document_question", quick_answer)
+
+    async def collect():
+        first_reported = asyncio.Event()
+
+        async def uploads():
+            yield _txt_job(tmp_path, "first.txt", "First document.")
+            await first_reported.wait() # The second upload only "arrives" after the first is answered
+            yield _txt_job(tmp_path, "second.txt", "Second document.")
+
+        events = []
+        async for event in batch_analysis.analyze_batch(uploads(), ["Q"]):
+            events.append(event)
+            first_reported.set()
+        return events
+
+    events = asyncio.run(asyncio.wait_for(collect(), timeout=5))
+
+    assert [e.get("filename") for e in events] == ["first.txt", "second.txt", None]
+    assert events[-1]["documents"] == 2
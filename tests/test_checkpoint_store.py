@@ -0,0 +1,90 @@
+# tests/test_checkpoint_store.py
+import asyncio
+import pytest
+from langchain_core.messages import AIMessage, HumanMessage
+from langgraph.graph import StateGraph, END
+
+from app.services.checkpoint_store import SqliteCheckpointSaver
+from app.services.langgraph_flow import AgentState
+
+def _echo_graph(saver):
+    """Tiny graph with the same state shape as the chat flow."""
+    async def reply(state):
+        return {"messages": [AIMessage(content=f"echo: {state['messages'][-1].content}")]}
+    workflow = StateGraph(AgentState)
+    workflow.add_node("reply", reply)
+    workflow.set_entry_point("reply")
+    workflow.add_edge("reply", END)
+    return workflow.compile(checkpointer=saver)
+
+def _run_turns(graph, thread_id, n):
+    config = {"configurable": {"thread_id": thread_id}}
+    async def run():
+        for i in range(n):
+            await graph.ainvoke({"messages": [HumanMessage(content=f"turn {i}")]}, config=config)
+    asyncio.run(run())
+
+@pytest.fixture
+def db_path(tmp_path):
+    return tmp_path / "checkpoints.sqlite3"
+
+def test_history_survives_restart(db_path):
+    _run_turns(_echo_graph(SqliteCheckpointSaver(db_path)), "t1", 3)
+
+    reopened = SqliteCheckpointSaver(db_path)
+    state = reopened.get_tuple({"configurable": {"thread_id": "t1"}}).checkpoint["channel_values"]
+    assert [m.content for m in state["messages"]][-2:] == ["turn 2", "echo: turn 2"]
+    assert len(state["messages"]) == 6
+
+def test_keeps_only_latest_checkpoints(db_path):
+    saver = SqliteCheckpointSaver(db_path, keep_latest=2)
+    _run_turns(_echo_graph(saver), "t1", 5)
+    assert len(list(saver.list({"configurable": {"thread_id": "t1"}}))) == 2
+
+def test_idle_threads_expire(db_path):
+    saver = SqliteCheckpointSaver(db_path, ttl_seconds=60)
+    graph = _echo_graph(saver)
+    _run_turns(graph, "old", 1)
+    _run_turns(graph, "new", 1)
+
+    with saver._lock:
+        saver._connection().execute("UPDATE threads SET updated_at = 0 WHERE thread_id = 'old'")
+        saver._conn.commit()
+
+    assert saver.expire_idle_threads() == 1
+    assert saver.get_tuple({"configurable": {"thread_id": "old"}}) is None
+    assert saver.get_tuple({"configurable": {"thread_id": "new"}}) is not None
+
+def test_cache_serves_latest_and_respects_byte_cap(db_path):
+    saver = SqliteCheckpointSaver(db_path, cache_max_bytes=4096)
+    graph = _echo_graph(saver)
+    for thread_id in ("a", "b", "c", "d", "e"):
+        _run_turns(graph, thread_id, 2)
+
+    assert 0 < saver.cache.resident_bytes <= 4096
+    hits = saver.cache.hits
+    saver.get_tuple({"configurable": {"thread_id": "e"}})
+    assert saver.cache.hits == hits + 1
+
+def test_delete_thread(db_path):
+    saver = SqliteCheckpointSaver(db_path)
+    _run_turns(_echo_graph(saver), "gone", 1)
+    saver.delete_thread("gone")
+    assert saver.get_tuple({"configurable": {"thread_id": "gone"}}) is None
+    assert saver.stats()["threads"] == 0
+
+def test_workers_sharing_the_file_see_each_others_turns(db_path):
+    """Two savers on one file stand in for two worker processes."""
+    worker_a, worker_b = SqliteCheckpointSaver(db_path), SqliteCheckpointSaver(db_path)
+    graph_a, graph_b = _echo_graph(worker_a), _echo_graph(worker_b)
+    config = {"configurable": {"thread_id": "t1"}}
+
+    _run_turns(graph_a, "t1", 1)
+    worker_a.get_tuple(config) # Cached on worker A
+    _run_turns(graph_b, "t1", 1) # Next turn lands on worker B
+
+    state = worker_a.get_tuple(config).checkpoint["channel_values"]
+    assert len(state["messages"]) == 4 # Not the stale cached copy
+    hits = worker_a.cache.hits
+    worker_a.get_tuple(config)
+    assert worker_a.cache.hits == hits + 1 # Revalidated once, then served from cache again
@@ -0,0 +1,31 @@
+# tests/test_contract_templates.py
+import pytest
+
+from app.utils.contract_templates import extract_jurisdiction, get_contract_sections, get_drafting_options
+
+@pytest.mark.parametrize("details, expected", [
+    ("Parties are ACME Corp and Beta Inc, jurisdiction: Delaware", "Delaware"),
+    ("governing law is the laws of Texas.", "Texas"),
+    ("jurisdiction: California and the term is two years", "California"),
+    ("Jurisdiction is the State of New York and payment is due monthly", "State of New York"),
+    ("This NDA should be governed by New York law.", "New York"),
+    ("Governed by the laws of the State of New York, two-year term", "State of New York"),
+    ("ACME and Beta, under Delaware law", "Delaware"),
+    ("Under the laws of England and Wales", "England and Wales"),
+    ("California law applies.", "California"),
+    ("Confidential under applicable law", None),
+    ("Use is governed by Acme policies", None),
+    ("Parties are Gamma LLC and Delta Ltd", None),
+])
+def test_extract_jurisdiction(details, expected):
+    assert extract_jurisdiction(details) == expected
+
+def test_drafting_options():
+    assert [o.name for o in get_drafting_options("NDA", "A mutual NDA between ACME and Beta")] == ["mutual"]
+    assert [o.name for o in get_drafting_options("nda", "One-way: ACME discloses to Beta")] == ["one-way"]
+    assert get_drafting_options("nda", "ACME and Beta") == []
+    assert get_drafting_options("rental_agreement", "mutual agreement") == []
+
+def test_contract_sections_match_loose_type_names():
+    assert get_contract_sections("Rental Agreement") is get_contract_sections("rental_agreement")
+    assert get_contract_sections("lease_option") is None
@@ -0,0 +1,118 @@
+# tests/test_digest.py
+import json
+import asyncio
+import pytest
+from langchain_core.language_models.fake_chat_models import GenericFakeChatModel
+from langchain_core.messages import AIMessage, HumanMessage
+
+from app.services import digest, ingestion, langgraph_flow, llm_cache
+from app.services.extraction_cache import ExtractionCache, document_hash
+from app.services.ingestion import IngestionJob
+from app.services.search_index import CorpusIndex
+
+LEASE = "Lease between ACME Corp (Landlord) and Beta LLC (Tenant). Governed by the laws of Delaware. " + "Filler clause text. " * 200
+DIGEST_REPLY = json.dumps({
+    "parties": ["ACME Corp (Landlord)", "Beta LLC (Tenant)"],
+    "effective_date": "2024-01-01",
+    "expiration": None,
+    "term": "12 months",
+    "governing_law": "Delaware",
+    "obligations": ["Tenant pays rent monthly"],
+    "outline": ["1. Premises", "2. Rent"],
+})
+
+@pytest.fixture(autouse=True)
+def isolated_stores(tmp_path, monkeypatch):
+    cache = ExtractionCache(tmp_path / "extraction_cache")
+    monkeypatch.setattr(digest, "extraction_cache", cache)
+    monkeypatch.setattr(ingestion, "extraction_cache", cache)
+    monkeypatch.setattr(ingestion, "corpus_index", CorpusIndex(tmp_path / "search_index.sqlite3"))
+    monkeypatch.setattr(llm_cache, "response_cache", llm_cache.LLMResponseCache(path=None))
+
+def test_parse_digest_tolerates_fences_and_loose_types():
+    parsed = digest.parse_digest(f"Here you go:\n```json\n{DIGEST_REPLY}\n```")
+    assert parsed.parties == ["ACME Corp (Landlord)", "Beta LLC (Tenant)"]
+    assert parsed.expiration is None and parsed.governing_law == "Delaware"
+    assert digest.DocumentDigest.from_dict({"parties": "ACME", "term": ""}).parties == ["ACME"]
+    assert digest.parse_digest("I cannot help with that.") is None
+
+def test_ingestion_generates_the_digest_once(tmp_path, monkeypatch):
+    monkeypatch.setattr(digest, "DOCUMENT_DIGEST_ENABLED", True)
+    monkeypatch.setattr(langgraph_flow, "chat_llm", GenericFakeChatModel(messages=iter([DIGEST_REPLY]))) # A second LLM call would fail
+    path = tmp_path / "lease.txt"
+    path.write_text(LEASE)
+
+    async def ingest_twice():
+        for session_id in ("s1", "s2"):
+            await ingestion.ingest_document(IngestionJob(session_id=session_id, filename="lease.txt", file_path=path, sha256="abc"))
+            await asyncio.gather(*digest._digest_tasks.values())
+        return await digest.load_digest(document_hash(LEASE))
+
+    stored = asyncio.run(ingest_twice())
+    assert stored.term == "12 months"
+
+def test_basic_questions_use_the_digest_and_few_excerpts(monkeypatch, isolated_document_store):
+    asyncio.run(digest.ensure_digest(GenericFakeChatModel(messages=iter([DIGEST_REPLY])), LEASE))
+    sent = []
+    async def fake_ainvoke(llm, messages, **kwargs):
+        sent.append(messages)
+        return AIMessage(content="ACME Corp and Beta LLC.")
+    monkeypatch.setattr(langgraph_flow, "cached_ainvoke", fake_ainvoke)
+    monkeypatch.setattr(langgraph_flow, "chat_llm", GenericFakeChatModel(messages=iter([])))
+    isolated_document_store.put("lease", LEASE)
+    state = {"messages": [HumanMessage(content="Who are the parties?")], "document_key": document_hash(LEASE)}
+
+    asyncio.run(langgraph_flow.call_llm(state, {"configurable": {}}))
+    prompt = sent[-1][-1].content
+    assert "key facts" in prompt and "Parties: ACME Corp (Landlord); Beta LLC (Tenant)" in prompt
+    assert len(prompt) < len(LEASE) # Only a few excerpts ride along
+
+    sent.clear()
+    state["messages"] = [HumanMessage(content="Is there a pet clause?")]
+    asyncio.run(langgraph_flow.call_llm(state, {"configurable": {}}))
+    assert "key facts" not in sent[-1][-1].content
+
+@pytest.mark.parametrize("question, expected", [
+    ("Who are the parties?", True),
+    ("Can you summarize this lease?", True),
+    ("What kind of agreement is this?", True),
+    ("What is the termination notice period?", False),
+    ("Which party pays for repairs?", False),
+    ("What are the tenant's obligations under section 4?", False),
+    ("Is the jurisdiction clause enforceable?", False),
+])
+def test_only_overview_questions_use_the_digest(question, expected):
+    assert digest.answers_from_digest(question) is expected
+
+def test_batch_ingestion_skips_the_digest(tmp_path, monkeypatch):
+    monkeypatch.setattr(digest, "DOCUMENT_DIGEST_ENABLED", True)
+    monkeypatch.setattr(langgraph_flow, "chat_llm", GenericFakeChatModel(messages=iter([]))) # Any LLM call would fail
+    path = tmp_path / "lease.txt"
+    path.write_text(LEASE)
+
+    asyncio.run(ingestion.ingest_document(IngestionJob(session_id="b1", filename="lease.txt", file_path=path, sha256="abc"), with_digest=False))
+    assert not digest._digest_tasks
+
+def test_long_documents_are_digested_on_their_first_overview_question(tmp_path, monkeypatch, isolated_document_store):
+    monkeypatch.setattr(digest, "DOCUMENT_DIGEST_ENABLED", True)
+    monkeypatch.setattr(digest, "digest_fits_one_prompt", lambda llm, text: False)
+    monkeypatch.setattr(langgraph_flow, "chat_llm", GenericFakeChatModel(messages=iter([])))
+    path = tmp_path / "lease.txt"
+    path.write_text(LEASE)
+    started = []
+    monkeypatch.setattr(digest, "start_digest", lambda llm, text, key, session_id=None: started.append(key))
+    monkeypatch.setattr(langgraph_flow, "start_digest", lambda llm, text, key, session_id=None: started.append(key))
+    async def fake_ainvoke(llm, messages, **kwargs):
+        return AIMessage(content="An answer.")
+    monkeypatch.setattr(langgraph_flow, "cached_ainvoke", fake_ainvoke)
+
+    asyncio.run(ingestion.ingest_document(IngestionJob(session_id="long", filename="lease.txt", file_path=path, sha256="abc")))
+    assert started == [] # Would need a map-reduce summary first
+
+    key = isolated_document_store.document_key("long")
+    state = {"messages": [HumanMessage(content="What is the rent?")], "document_key": key}
+    asyncio.run(langgraph_flow.call_llm(state, {"configurable": {}}))
+    assert started == []
+    state["messages"] = [HumanMessage(content="Who are the parties?")]
+    asyncio.run(langgraph_flow.call_llm(state, {"configurable": {}}))
+    assert started == [key]
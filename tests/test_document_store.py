@@ -0,0 +1,100 @@
+# tests/test_document_store.py
+import pytest
+
+from app.services.document_store import DocumentStore
+
+@pytest.fixture
+def db_path(tmp_path):
+    return tmp_path / "documents.sqlite3"
+
+@pytest.fixture
+def store(db_path):
+    return DocumentStore(max_bytes=3500, idle_ttl_seconds=3600, path=db_path)
+
+def test_behaves_like_a_dict(store):
+    store["a"] = "text a"
+    store["empty"] = ""
+    assert store["a"] == "text a"
+    assert store.get("empty") == ""
+    assert store.get("missing") is None
+    assert "a" in store and "missing" not in store
+    assert store.pop("a") == "text a"
+    assert store.pop("a", None) is None
+    with pytest.raises(KeyError):
+        store["a"]
+
+def test_lru_documents_spill_and_reload(store):
+    for key in ("a", "b", "c"):
+        store[key] = key * 1000
+    store.get("a") # "a" becomes most recently used, so "b" is evicted next
+    store["d"] = "d" * 1000
+
+    stats = store.stats()
+    assert stats["resident_bytes"] <= 3500
+    assert stats["evictions"] >= 1
+    assert "b" in store
+    assert stats["resident_documents"] + stats["spilled_documents"] == len(store) == 4
+
+    assert store["b"] == "b" * 1000 # Loaded back from the database transparently
+    assert store.stats()["disk_loads"] == 1
+
+def test_idle_documents_spill(tmp_path, monkeypatch):
+    clock = [1000.0]
+    monkeypatch.setattr("app.services.document_store.time.monotonic", lambda: clock[0])
+    store = DocumentStore(max_bytes=10**6, idle_ttl_seconds=60, path=tmp_path / "documents.sqlite3")
+
+    store["old"] = "old text"
+    clock[0] += 120
+    store["new"] = "new text"
+
+    assert store.stats()["resident_documents"] == 1
+    assert store["old"] == "old text"
+
+def test_clear_removes_stored_documents(store, db_path):
+    for key in ("a", "b", "c", "d"):
+        store[key] = key * 1000
+    store.clear()
+    assert len(store) == 0
+    assert len(DocumentStore(path=db_path)) == 0
+    assert store.resident_bytes == 0
+
+def test_workers_share_documents(db_path):
+    """Two stores on one file stand in for two worker processes."""
+    worker_a, worker_b = DocumentStore(path=db_path), DocumentStore(path=db_path)
+
+    worker_a["s1"] = "uploaded on A"
+    assert "s1" in worker_b and worker_b["s1"] == "uploaded on A"
+
+    worker_b["s1"] = "replaced on B"
+    assert worker_a["s1"] == "replaced on B" # Stale resident copy is not served
+    assert worker_b.pop("s1") == "replaced on B"
+    assert "s1" not in worker_a and worker_a.get("s1") is None
+
+def test_identical_documents_are_stored_once(store):
+    store["s1"] = "same contract"
+    store["s2"] = "same contract"
+    assert store.document_key("s1") == store.document_key("s2")
+    assert store.stats()["resident_documents"] + store.stats()["spilled_documents"] == 1
+
+    store.pop("s1")
+    assert store["s2"] == "same contract" # Still referenced by s2
+    store["s2"] = "revised contract"
+    assert store.stats()["resident_documents"] + store.stats()["spilled_documents"] == 1 # The unreferenced text is gone
+
+def test_unused_sessions_expire(db_path, monkeypatch):
+    clock = [1_000_000.0]
+    monkeypatch.setattr("app.services.document_store.time.time", lambda: clock[0])
+    store = DocumentStore(path=db_path, retention_seconds=3600)
+    expired = []
+    store.add_expiry_listener(expired.extend)
+    store["old"] = "old text"
+    store["kept"] = "kept text"
+    clock[0] += 1800
+    assert store["kept"] == "kept text" # Using a session keeps it alive
+
+    clock[0] += 2400
+    store["new"] = "new text"
+    assert "old" not in store and store.get("old") is None
+    assert expired == ["old"]
+    assert store["kept"] == "kept text"
+    assert store.stats()["resident_documents"] + store.stats()["spilled_documents"] == 2
@@ -0,0 +1,67 @@
+# tests/test_extraction_cache.py
+import os
+from app.services.extraction_cache import ExtractionCache, cache_key
+
+def test_cache_key_depends_on_type():
+    assert cache_key("ab" * 32, "a.PDF") == "ab" * 32 + ".pdf"
+    assert cache_key("ab" * 32, "a.pdf") != cache_key("ab" * 32, "a.txt")
+
+def test_text_round_trip_and_persistence(tmp_path):
+    key = cache_key("cd" * 32, "contract.pdf")
+    cache = ExtractionCache(tmp_path)
+    assert cache.get_text(key) is None
+    cache.put_text(key, "Governing law: Delaware.")
+
+    reopened = ExtractionCache(tmp_path)
+    assert reopened.get_text(key) == "Governing law: Delaware."
+    assert reopened.stats() == {"hits": 1, "misses": 0}
+
+def test_index_is_built_once(tmp_path, monkeypatch):
+    key = cache_key("ef" * 32, "lease.txt")
+    cache = ExtractionCache(tmp_path)
+    first = cache.get_or_build_index(key, "Rent is due monthly. The deposit is refundable.")
+
+    monkeypatch.setattr("app.services.extraction_cache.chunk_text", lambda text: (_ for _ in ()).throw(AssertionError("rebuilt")))
+    second = cache.get_or_build_index(key, "ignored")
+    assert second.search("deposit")[0][0].text == first.search("deposit")[0][0].text
+
+def test_corrupt_text_entry_is_a_miss_and_removed(tmp_path):
+    key = cache_key("12" * 32, "contract.pdf")
+    cache = ExtractionCache(tmp_path)
+    cache.put_text(key, "Governing law: Delaware.")
+    path = cache._path(key, "txt.z")
+    path.write_bytes(b"not zlib data")
+
+    assert cache.get_text(key) is None
+    assert not path.exists()
+    assert cache.stats() == {"hits": 0, "misses": 1}
+
+def test_truncated_index_is_rebuilt(tmp_path):
+    key = cache_key("34" * 32, "lease.txt")
+    cache = ExtractionCache(tmp_path)
+    cache.get_or_build_index(key, "Rent is due monthly.")
+    path = cache._path(key, "index.pkl")
+    path.write_bytes(path.read_bytes()[:10])
+
+    assert cache.get_or_build_index(key, "Rent is due monthly.").search("rent")
+
+def test_writes_leave_no_temporary_files(tmp_path):
+    cache = ExtractionCache(tmp_path)
+    for i in range(3):
+        cache.put_text(cache_key(f"{i:02d}" * 32, "a.txt"), "text")
+    assert not list(tmp_path.rglob("*.tmp"))
+
+def test_least_recently_used_entries_are_evicted_over_budget(tmp_path):
+    cache = ExtractionCache(tmp_path)
+    keys = [cache_key(f"{i:02d}" * 32, "a.txt") for i in range(3)]
+    for key in keys[:2]:
+        cache.put_text(key, os.urandom(1000).hex())
+    os.utime(cache._path(keys[0], "txt.z"), (1, 1))
+    os.utime(cache._path(keys[1], "txt.z"), (2, 2))
+    cache.get_text(keys[0]) # Reading marks it recently used
+    cache.max_bytes = int(2.5 * cache._path(keys[0], "txt.z").stat().st_size) # Room for two entries
+
+    cache.put_text(keys[2], os.urandom(1000).hex())
+
+    assert cache.get_text(keys[1]) is None
+    assert cache.get_text(keys[0]) is not None and cache.get_text(keys[2]) is not None
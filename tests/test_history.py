@@ -0,0 +1,50 @@
+# tests/test_history.py
+import asyncio
+from langchain_core.messages import AIMessage, HumanMessage
+
+from app.services import llm_cache
+from app.services.history import message_tokens, messages_to_fold, recent_window_start, summarize_messages
+
+def _turns(n, words=40):
+    messages = []
+    for i in range(n):
+        messages.append(HumanMessage(content=f"question {i} " + "word " * words))
+        messages.append(AIMessage(content=f"answer {i} " + "word " * words))
+    return messages
+
+def test_recent_window_fits_budget():
+    messages = _turns(10)
+    budget = 300
+    start = recent_window_start(messages, budget)
+    assert 0 < start < len(messages)
+    assert sum(message_tokens(m) for m in messages[start:]) <= budget
+    assert sum(message_tokens(m) for m in messages[start - 1:]) > budget
+
+def test_no_fold_while_under_budget():
+    assert messages_to_fold(_turns(2), budget=10_000) == 0
+    assert messages_to_fold([], budget=10) == 0
+
+def test_fold_leaves_headroom():
+    messages = _turns(10)
+    fold = messages_to_fold(messages, budget=300)
+    kept = sum(message_tokens(m) for m in messages[fold:])
+    assert fold > recent_window_start(messages, 300) # Folds more than the bare minimum
+    assert kept <= 150
+
+def test_repeated_summaries_are_served_from_the_response_cache(monkeypatch):
+    monkeypatch.setattr(llm_cache, "response_cache", llm_cache.LLMResponseCache(path=None))
+
+    class CountingLLM:
+        model_name = "test-model"
+        temperature = 0.2
+        calls = 0
+
+        async def ainvoke(self, messages, *args, **kwargs):
+            self.calls += 1
+            return AIMessage(content="The user asked about notice periods.")
+
+    llm = CountingLLM()
+    summaries = [asyncio.run(summarize_messages(llm, None, _turns(2))) for _ in range(2)]
+
+    assert summaries == ["The user asked about notice periods."] * 2
+    assert llm.calls == 1
@@ -0,0 +1,185 @@
+# tests/test_langgraph_flow.py
+import asyncio
+import pytest
+from langchain_core.language_models.fake_chat_models import GenericFakeChatModel
+from langchain_core.messages import AIMessage, HumanMessage
+
+from app.services import langgraph_flow, llm_cache
+from app.services.checkpoint_store import SqliteCheckpointSaver
+from app.utils.lru import LRUCache
+
+@pytest.fixture(autouse=True)
+def isolated_graph(tmp_path, monkeypatch):
+    """Compile the graph against a throwaway checkpoint database."""
+    graph = langgraph_flow.workflow.compile(checkpointer=SqliteCheckpointSaver(tmp_path / "checkpoints.sqlite3"))
+    monkeypatch.setattr(langgraph_flow, "app_graph", graph)
+    return graph
+
+@pytest.fixture(autouse=True)
+def isolated_response_cache(monkeypatch):
+    """Start every test with an empty LLM response cache."""
+    monkeypatch.setattr(llm_cache, "response_cache", llm_cache.LLMResponseCache(path=None))
+
+
+# --- Test streaming ---
+
+def test_stream_chat_flow_commits_message(monkeypatch):
+    """Streamed tokens add up to the final message, which is saved in the checkpoint."""
+    fake_llm = GenericFakeChatModel(messages=iter(["Streaming works fine"]))
+    monkeypatch.setattr(langgraph_flow, "chat_llm", fake_llm)
+
+    async def collect():
+        return [event async for event in langgraph_flow.stream_chat_flow("Hi", "stream_test_session")]
+
+    events = asyncio.run(collect())
+    tokens = "".join(e["content"] for e in events if e["type"] == "token")
+
+    assert len(events) > 2 # Tokens arrive incrementally, not as one blob
+    assert tokens == "Streaming works fine"
+    assert events[-1] == {"type": "done", "response": "Streaming works fine"}
+
+    snapshot = asyncio.run(langgraph_flow.app_graph.aget_state({"configurable": {"thread_id": "stream_test_session"}}))
+    assert snapshot.values["messages"][-1].content == "Streaming works fine"
+
+
+# --- Test retrieval in call_llm ---
+
+class RecordingLLM:
+    """Minimal async chat model stand-in that records the prompts it receives."""
+    def __init__(self, reply: str = "ok"):
+        self.reply = reply
+        self.calls = []
+
+    async def ainvoke(self, messages, *args, **kwargs):
+        self.calls.append(messages)
+        return AIMessage(content=self.reply)
+
+def test_call_llm_sends_only_relevant_chunks(monkeypatch, isolated_document_store):
+    from app.utils.pdf_parser import PAGE_BREAK
+
+    llm = RecordingLLM()
+    monkeypatch.setattr(langgraph_flow, "chat_llm", llm)
+    filler = "lorem ipsum dolor sit amet " * 100
+    document = PAGE_BREAK.join([filler, "Termination requires ninety days written notice.", filler])
+    isolated_document_store.put("retrieval_session", document)
+    state = {"messages": [HumanMessage(content="How much notice is needed for termination?")], "document_key": langgraph_flow.document_hash(document)}
+    asyncio.run(langgraph_flow.call_llm(state, {"configurable": {"thread_id": "retrieval_session"}}))
+
+    prompt = llm.calls[0][-1].content
+    assert "ninety days written notice" in prompt
+    assert "page 2" in prompt
+    assert len(prompt) < len(document)
+
+def test_other_worker_loads_cached_indexes(monkeypatch, isolated_document_store, isolated_extraction_cache):
+    """A worker that did not ingest the document loads its indexes from the extraction cache instead of rebuilding them."""
+    llm = RecordingLLM()
+    monkeypatch.setattr(langgraph_flow, "chat_llm", llm)
+    document = "Termination requires ninety days written notice. " + "lorem ipsum dolor sit amet " * 200
+    key = langgraph_flow.document_hash(document)
+    isolated_extraction_cache.get_or_build_index(key, document)
+    isolated_extraction_cache.get_or_build_structure(key, document)
+    isolated_document_store.put("other_worker_session", document, key)
+    monkeypatch.setattr(langgraph_flow, "document_indexes", LRUCache(4))
+    monkeypatch.setattr(langgraph_flow, "document_structures", LRUCache(4))
+    monkeypatch.setattr("app.services.extraction_cache.chunk_text", lambda text: (_ for _ in ()).throw(AssertionError("rebuilt")))
+    monkeypatch.setattr("app.services.extraction_cache.StructureIndex", lambda text: (_ for _ in ()).throw(AssertionError("rebuilt")))
+
+    state = {"messages": [HumanMessage(content="How much notice is needed for termination?")], "document_key": key}
+    asyncio.run(langgraph_flow.call_llm(state, {"configurable": {"thread_id": "other_worker_session"}}))
+
+    assert "ninety days written notice" in llm.calls[0][-1].content
+
+def test_document_indexes_are_bounded_and_reloaded_from_the_cache(monkeypatch):
+    monkeypatch.setattr(langgraph_flow, "document_indexes", LRUCache(2))
+    monkeypatch.setattr(langgraph_flow, "document_structures", LRUCache(2))
+    for key in ("a", "b", "c"):
+        asyncio.run(langgraph_flow._document_indexes(f"document {key}", key))
+    assert len(langgraph_flow.document_indexes) == 2
+    assert "a" not in langgraph_flow.document_indexes # Least recently used
+
+    monkeypatch.setattr("app.services.extraction_cache.chunk_text", lambda text: (_ for _ in ()).throw(AssertionError("rebuilt")))
+    index, _ = asyncio.run(langgraph_flow._document_indexes("document a", "a"))
+    assert langgraph_flow.document_indexes.get("a") is index
+
+def test_checkpoints_keep_the_document_key_not_its_text(monkeypatch, isolated_graph, isolated_document_store):
+    monkeypatch.setattr(langgraph_flow, "chat_llm", RecordingLLM())
+    document = "Termination requires ninety days written notice. " + "lorem ipsum dolor sit amet " * 200
+    isolated_document_store.put("keyed_session", document)
+    key = isolated_document_store.document_key("keyed_session")
+    config = {"configurable": {"thread_id": "keyed_session"}}
+
+    asyncio.run(langgraph_flow.run_chat_flow("How much notice is needed for termination?", "keyed_session", key))
+
+    async def saved():
+        return [repr(saved.checkpoint) + repr(saved.pending_writes) async for saved in isolated_graph.checkpointer.alist(config)]
+    checkpoints = asyncio.run(saved())
+    assert checkpoints and not any("ninety days written notice" in checkpoint for checkpoint in checkpoints)
+    assert asyncio.run(isolated_graph.aget_state(config)).values["document_key"] == key
+    assert "ninety days written notice" in langgraph_flow.chat_llm.calls[-1][-1].content
+
+# --- Test history budgeting ---
+
+def test_long_sessions_keep_prompt_size_flat(monkeypatch):
+    llm = RecordingLLM(reply="answer " * 40)
+    monkeypatch.setattr(langgraph_flow, "chat_llm", llm)
+    monkeypatch.setattr(langgraph_flow, "HISTORY_TOKEN_BUDGET", 300)
+
+    for turn in range(12):
+        asyncio.run(langgraph_flow.run_chat_flow(f"question {turn} " + "detail " * 40, "history_session"))
+
+    chat_prompts = [call for call in llm.calls if "LegalMind" in call[0].content] # Skip summarization calls
+    sizes = [sum(len(m.content) for m in prompt) for prompt in chat_prompts]
+    assert max(sizes[6:]) < 2 * sizes[3] # Bounded, not growing linearly with turns
+
+    snapshot = asyncio.run(langgraph_flow.app_graph.aget_state({"configurable": {"thread_id": "history_session"}}))
+    assert snapshot.values["history_summary"]
+    assert snapshot.values["summarized_message_count"] > 0
+    assert any("Summary of the earlier conversation" in m.content for m in chat_prompts[-1])
+
+
+# --- Test clause-level contract generation ---
+
+def test_contract_boilerplate_is_generated_once(monkeypatch):
+    from app.utils.contract_templates import NDA_SECTIONS
+
+    llm = RecordingLLM(reply="clause text")
+    monkeypatch.setattr(langgraph_flow, "chat_llm", llm)
+
+    draft = asyncio.run(langgraph_flow.run_contract_flow("NDA", "Parties are ACME Corp and Beta Inc, jurisdiction: Delaware", "contract_a"))
+    assert len(llm.calls) == len(NDA_SECTIONS)
+    # Clauses are assembled in template order
+    positions = [draft.index(f"{n}. {section.title}") for n, section in enumerate(NDA_SECTIONS, start=1)]
+    assert positions == sorted(positions)
+
+    # Party details only go to party-specific clauses
+    for section, messages in zip(NDA_SECTIONS, llm.calls):
+        prompt = messages[-1].content
+        assert ("ACME Corp" in prompt) != section.boilerplate
+        if section.boilerplate:
+            assert "Delaware" in prompt
+
+    # A second contract for other parties in the same jurisdiction reuses every boilerplate clause
+    llm.calls.clear()
+    asyncio.run(langgraph_flow.run_contract_flow("nda", "Parties are Gamma LLC and Delta Ltd, jurisdiction: Delaware", "contract_b"))
+    assert len(llm.calls) == sum(not section.boilerplate for section in NDA_SECTIONS)
+
+def test_mutual_nda_reaches_boilerplate_clauses(monkeypatch):
+    from app.utils.contract_templates import NDA_SECTIONS
+
+    llm = RecordingLLM(reply="clause text")
+    monkeypatch.setattr(langgraph_flow, "chat_llm", llm)
+
+    asyncio.run(langgraph_flow.run_contract_flow("nda", "Mutual NDA between ACME Corp and Beta Inc, governed by New York law", "contract_mutual"))
+    for section, messages in zip(NDA_SECTIONS, llm.calls):
+        prompt = messages[-1].content
+        if section.boilerplate:
+            assert "each party both discloses and receives" in prompt and "New York" in prompt
+            assert "ACME Corp" not in prompt
+
+    # A one-way NDA in the same jurisdiction does not reuse the mutual boilerplate
+    llm.calls.clear()
+    asyncio.run(langgraph_flow.run_contract_flow("nda", "NDA between Gamma LLC and Delta Ltd, governed by New York law", "contract_one_way"))
+    assert len(llm.calls) == len(NDA_SECTIONS)
+
+def test_contract_unknown_type():
+    assert "not supported" in asyncio.run(langgraph_flow.run_contract_flow("lease_option", "details", "contract_c"))
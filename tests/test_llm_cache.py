@@ -0,0 +1,112 @@
+# tests/test_llm_cache.py
+import asyncio
+import threading
+import pytest
+from langchain_core.messages import AIMessage, HumanMessage, SystemMessage
+
+from app.services import langgraph_flow, llm_cache
+from app.services.llm_cache import LLMResponseCache, cache_key, cached_ainvoke, normalize_prompt
+from app.utils.contract_templates import get_contract_sections
+
+class CountingLLM:
+    """Async chat model stand-in that counts upstream calls."""
+    model_name = "test-model"
+    temperature = 0.2
+
+    def __init__(self):
+        self.calls = 0
+
+    async def ainvoke(self, messages, *args, **kwargs):
+        self.calls += 1
+        return AIMessage(content=f"answer {self.calls}")
+
+@pytest.fixture
+def cache(monkeypatch):
+    cache = LLMResponseCache(max_entries=10, path=None)
+    monkeypatch.setattr(llm_cache, "response_cache", cache)
+    return cache
+
+
+def test_normalize_prompt_ignores_whitespace_and_case():
+    assert normalize_prompt("  What is   an NDA?\n") == normalize_prompt("what is an nda?")
+
+def test_cache_key_depends_on_model_temperature_and_document():
+    messages = [SystemMessage(content="sys"), HumanMessage(content="Q")]
+    base = cache_key("m", 0.2, messages)
+    assert cache_key("m", 0.2, [SystemMessage(content="sys"), HumanMessage(content=" q ")]) == base
+    assert cache_key("other", 0.2, messages) != base
+    assert cache_key("m", 0.7, messages) != base
+    assert cache_key("m", 0.2, messages, document_hash="abc") != base
+    # The role is part of the key, not just the text
+    assert cache_key("m", 0.2, [HumanMessage(content="sys"), HumanMessage(content="Q")]) != base
+
+def test_lru_eviction():
+    cache = LLMResponseCache(max_entries=2, path=None)
+    cache.put("a", "1")
+    cache.put("b", "2")
+    assert cache.get("a") == "1" # Makes "b" the least recently used
+    cache.put("c", "3")
+    assert cache.get("b") is None
+    assert cache.get("a") == "1"
+    assert cache.stats()["evictions"] == 1
+
+def test_persists_across_instances(tmp_path):
+    path = tmp_path / "responses.sqlite3"
+    LLMResponseCache(path=path).put("key", "stored answer")
+    assert LLMResponseCache(path=path).get("key") == "stored answer"
+
+def test_disk_lookups_run_off_the_event_loop(tmp_path):
+    path = tmp_path / "responses.sqlite3"
+    LLMResponseCache(path=path).put("key", "stored answer")
+    cache = LLMResponseCache(path=path)
+    threads = []
+    connect = cache._connection
+    cache._connection = lambda: threads.append(threading.get_ident()) or connect()
+
+    async def lookups():
+        return threading.get_ident(), await cache.aget("key"), await cache.aget("key"), await cache.aget("missing")
+
+    loop_thread, first, second, missing = asyncio.run(lookups())
+
+    assert (first, second, missing) == ("stored answer", "stored answer", None)
+    assert len(threads) == 2 and loop_thread not in threads # The repeat was a memory hit
+    assert cache.stats()["hits"] == 2 and cache.stats()["misses"] == 1
+
+def test_cached_ainvoke_serves_repeats_from_cache(cache):
+    llm = CountingLLM()
+    first = asyncio.run(cached_ainvoke(llm, [HumanMessage(content="What is an NDA?")]))
+    second = asyncio.run(cached_ainvoke(llm, [HumanMessage(content="what is an  NDA?")]))
+    assert llm.calls == 1
+    assert first.content == second.content == "answer 1"
+    assert cache.stats()["hits"] == 1
+
+def test_cached_ainvoke_bypass_refreshes_entry(cache):
+    llm = CountingLLM()
+    messages = [HumanMessage(content="Q")]
+    asyncio.run(cached_ainvoke(llm, messages))
+    fresh = asyncio.run(cached_ainvoke(llm, messages, bypass=True))
+    assert llm.calls == 2
+    assert fresh.content == "answer 2"
+    assert asyncio.run(cached_ainvoke(llm, messages)).content == "answer 2"
+
+def test_failed_calls_are_not_cached(cache):
+    class FailingLLM(CountingLLM):
+        async def ainvoke(self, messages, *args, **kwargs):
+            raise RuntimeError("upstream down")
+
+    with pytest.raises(RuntimeError):
+        asyncio.run(cached_ainvoke(FailingLLM(), [HumanMessage(content="Q")]))
+    assert cache.stats()["entries"] == 0
+
+def test_contract_generation_uses_cache(cache, monkeypatch):
+    llm = CountingLLM()
+    monkeypatch.setattr(langgraph_flow, "chat_llm", llm)
+    first = asyncio.run(langgraph_flow.run_contract_flow("NDA", "Parties: A and B", "s1"))
+    calls_per_contract = llm.calls
+    second = asyncio.run(langgraph_flow.run_contract_flow("NDA", "Parties: A and B", "s2"))
+    assert first == second
+    assert llm.calls == calls_per_contract
+    # Bypass redrafts only the party-specific clauses
+    asyncio.run(langgraph_flow.run_contract_flow("NDA", "Parties: A and B", "s3", bypass_cache=True))
+    party_clauses = sum(not section.boilerplate for section in get_contract_sections("nda"))
+    assert llm.calls == calls_per_contract + party_clauses
@@ -0,0 +1,149 @@
+# tests/test_llm_scheduler.py
+import time
+import asyncio
+import pytest
+
+from app.services import resilience
+from app.services.llm_scheduler import LLMScheduler, Priority, TokenBucket
+from app.services.resilience import call_with_resilience
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_token_bucket_refills_over_time():
+    clock = FakeClock()
+    bucket = TokenBucket(60, clock=clock) # One per second
+    bucket.consume(60)
+    assert bucket.wait_time(1) == pytest.approx(1.0)
+    clock.now = 0.5
+    assert bucket.wait_time(1) == pytest.approx(0.5)
+    clock.now = 10
+    assert bucket.wait_time(10) == 0
+    # Requests larger than the whole budget run once it is full
+    assert bucket.wait_time(1000) == pytest.approx(50.0)
+
+def test_token_bucket_zero_is_unlimited():
+    bucket = TokenBucket(0)
+    bucket.consume(10**9)
+    assert bucket.wait_time(10**9) == 0
+
+def test_concurrency_is_bounded():
+    scheduler = LLMScheduler(rpm=0, tpm=0, max_concurrency=2)
+    running, peak = 0, 0
+
+    async def call():
+        nonlocal running, peak
+        async with scheduler.slot():
+            running += 1
+            peak = max(peak, running)
+            await asyncio.sleep(0.01)
+            running -= 1
+
+    async def scenario():
+        await asyncio.gather(*(call() for _ in range(6)))
+
+    asyncio.run(scenario())
+    assert peak == 2
+    assert scheduler.active == 0
+    assert scheduler.stats()["queue_wait"]["interactive"]["requests"] == 6
+
+def test_interactive_requests_jump_the_queue():
+    scheduler = LLMScheduler(rpm=0, tpm=0, max_concurrency=1)
+    order = []
+
+    async def call(name, priority):
+        async with scheduler.slot(priority):
+            order.append(name)
+
+    async def scenario():
+        blocker = await scheduler.acquire()
+        tasks = [asyncio.create_task(call("batch", Priority.BATCH)), asyncio.create_task(call("chat", Priority.INTERACTIVE))]
+        await asyncio.sleep(0)
+        assert scheduler.queued() == 2
+        scheduler.release(blocker)
+        await asyncio.gather(*tasks)
+
+    asyncio.run(scenario())
+    assert order == ["chat", "batch"]
+
+def test_requests_wait_for_rate_limit():
+    scheduler = LLMScheduler(rpm=600, tpm=0, max_concurrency=10) # Ten requests per second
+    scheduler.requests.level = 0
+
+    async def scenario():
+        started = time.monotonic()
+        async with scheduler.slot():
+            return time.monotonic() - started
+
+    assert asyncio.run(scenario()) >= 0.08
+    assert scheduler.stats()["queue_wait"]["interactive"]["max_wait_seconds"] >= 0.08
+
+def test_actual_usage_corrects_token_budget():
+    scheduler = LLMScheduler(rpm=0, tpm=6000, max_concurrency=1)
+
+    async def scenario():
+        async with scheduler.slot(estimated_tokens=1000) as grant:
+            grant.actual_tokens = 200
+
+    asyncio.run(scenario())
+    assert scheduler.tokens.level == pytest.approx(5800, abs=5)
+
+def test_cancelled_waiter_does_not_leak_slot():
+    scheduler = LLMScheduler(rpm=0, tpm=0, max_concurrency=1)
+
+    async def scenario():
+        blocker = await scheduler.acquire()
+        waiter = asyncio.create_task(scheduler.acquire())
+        await asyncio.sleep(0)
+        waiter.cancel()
+        await asyncio.gather(waiter, return_exceptions=True)
+        scheduler.release(blocker)
+        async with scheduler.slot():
+            return scheduler.active
+
+    assert asyncio.run(scenario()) == 1
+    assert scheduler.active == 0
+    assert scheduler.queued() == 0
+
+def test_retries_release_their_slot_during_backoff(monkeypatch):
+    monkeypatch.setattr(resilience, "retry_delay", lambda attempt, error=None: 0.1)
+    scheduler = LLMScheduler(rpm=0, tpm=0, max_concurrency=1)
+    outcomes = [ConnectionError("reset"), "ok"]
+
+    async def upstream():
+        outcome = outcomes.pop(0)
+        if isinstance(outcome, Exception):
+            raise outcome
+        return outcome
+
+    async def scenario():
+        call = asyncio.create_task(call_with_resilience(lambda grant: scheduler.run(grant, upstream), admit=scheduler.acquire))
+        await asyncio.sleep(0.02) # First try failed; backing off
+        async with scheduler.slot(): # Would wait for the backoff if the failed try still held the slot
+            other_wait = scheduler.stats()["queue_wait"]["interactive"]["max_wait_seconds"]
+        return await call, other_wait
+
+    result, other_wait = asyncio.run(scenario())
+    assert result == "ok"
+    assert other_wait < 0.05
+    assert scheduler.stats()["queue_wait"]["interactive"]["requests"] == 3 # Each try was admitted separately
+    assert scheduler.active == 0
+
+def test_queue_wait_does_not_count_towards_attempt_timeout():
+    scheduler = LLMScheduler(rpm=0, tpm=0, max_concurrency=1)
+
+    async def upstream():
+        return "ok"
+
+    async def scenario():
+        blocker = await scheduler.acquire()
+        asyncio.get_running_loop().call_later(0.1, scheduler.release, blocker)
+        return await call_with_resilience(lambda grant: scheduler.run(grant, upstream), admit=scheduler.acquire, attempt_timeout=0.05, max_retries=0)
+
+    assert asyncio.run(scenario()) == "ok"
+    assert scheduler.active == 0
@@ -0,0 +1,90 @@
+# tests/test_metrics.py
+import asyncio
+import subprocess
+import sys
+import threading
+from pathlib import Path
+
+from fastapi.testclient import TestClient
+from prometheus_client import REGISTRY
+
+from app.main import app
+from app.routes.metrics import ServiceStatsCollector, prometheus_metrics
+from app.services import metrics
+from app.services.metrics import timed_node
+
+def _node_count(name: str) -> float:
+    return REGISTRY.get_sample_value("legalmind_graph_node_duration_seconds_count", {"node": name}) or 0.0
+
+def test_timed_node_records_duration():
+    async def node(state, config):
+        return {"seen": config["configurable"]["thread_id"]}
+
+    wrapped = timed_node("test_node", node)
+    before = _node_count("test_node")
+
+    result = asyncio.run(wrapped({}, {"configurable": {"thread_id": "t1"}}))
+
+    assert result == {"seen": "t1"}
+    assert wrapped.__name__ == "node"
+    assert _node_count("test_node") == before + 1
+
+def test_service_stats_use_loop_snapshot():
+    snapshot = {"llm_active": 2, "llm_queued": 5, "llm_coalesced": 3, "circuit_open": 1, "ingestion_queued": 4}
+
+    text = metrics.render(ServiceStatsCollector(snapshot)).decode()
+
+    assert "legalmind_llm_queued_calls 5.0" in text
+    assert "legalmind_llm_coalesced_total 3.0" in text
+    assert "legalmind_llm_circuit_open 1.0" in text
+    assert 'legalmind_cache_hit_ratio{cache="extraction"}' in text
+
+def test_scheduler_state_is_read_on_the_event_loop(monkeypatch):
+    from app.services.llm_cache import response_cache
+    from app.services.llm_scheduler import llm_scheduler
+
+    threads = {}
+    for name, owner in (("scheduler", llm_scheduler), ("response_cache", response_cache)):
+        def stats(name=name, original=owner.stats):
+            threads[name] = threading.get_ident()
+            return original()
+        monkeypatch.setattr(owner, "stats", stats)
+
+    async def scrape():
+        loop_thread = threading.get_ident()
+        response = await prometheus_metrics()
+        return loop_thread, response
+
+    loop_thread, response = asyncio.run(scrape())
+
+    assert response.status_code == 200
+    assert threads["scheduler"] == loop_thread
+    assert threads["response_cache"] != loop_thread # SQLite-backed stats are rendered off the loop
+
+def test_multiprocess_mode_sums_across_workers(tmp_path):
+    worker = (
+        "from app.services import metrics\n"
+        "metrics.GRAPH_NODE_DURATION.labels(node='mp').observe(0.1)\n"
+        "print(metrics.render().decode())\n"
+    )
+    env = {"PROMETHEUS_MULTIPROC_DIR": str(tmp_path), "PATH": ""}
+    for _ in range(2):
+        result = subprocess.run(
+            [sys.executable, "-c", worker], env=env, capture_output=True, text=True, check=True,
+            cwd=Path(__file__).resolve().parents[1],
+        )
+
+    assert 'legalmind_graph_node_duration_seconds_count{node="mp"} 2.0' in result.stdout
+
+def test_metrics_endpoint_exposes_request_and_service_metrics():
+    client = TestClient(app)
+    assert client.get("/health").status_code == 200
+
+    response = client.get("/metrics")
+
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/plain")
+    assert 'legalmind_http_request_duration_seconds_bucket{le="0.005",method="GET",route="/health",status="200"}' in response.text
+    assert "legalmind_document_store_resident_bytes" in response.text
+    assert "legalmind_cache_hit_ratio" in response.text
+    assert "legalmind_llm_queue_wait_seconds" in response.text
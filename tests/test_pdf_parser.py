@@ -0,0 +1,67 @@
+# tests/test_pdf_parser.py
+import asyncio
+import fitz
+import pytest
+
+from app.utils.pdf_parser import PAGE_BREAK, extract_text_from_file
+
+@pytest.fixture
+def sample_pdf(tmp_path):
+    """A small real PDF with one line of text per page."""
+    path = tmp_path / "sample.pdf"
+    doc = fitz.open()
+    for i in range(3):
+        page = doc.new_page()
+        page.insert_text((72, 72), f"Page {i + 1} clause text")
+    doc.save(path)
+    doc.close()
+    return path
+
+def test_extract_pdf_from_file(sample_pdf):
+    text = asyncio.run(extract_text_from_file(sample_pdf, "sample.pdf"))
+    pages = text.split(PAGE_BREAK)
+    assert len(pages) == 3
+    assert pages[1].strip() == "Page 2 clause text"
+
+def test_extract_txt_from_file(tmp_path):
+    path = tmp_path / "notes.txt"
+    path.write_bytes("Clause 1. Payment terms \xe2\x80\x94 net 30.".encode("latin-1"))
+    assert asyncio.run(extract_text_from_file(path, "notes.txt")) == "Clause 1. Payment terms — net 30."
+
+def test_extract_from_file_empty_and_unsupported(tmp_path):
+    empty = tmp_path / "empty.pdf"
+    empty.write_bytes(b"")
+    assert asyncio.run(extract_text_from_file(empty, "empty.pdf")) == ""
+
+    docx = tmp_path / "doc.docx"
+    docx.write_bytes(b"PK\x03\x04")
+    assert asyncio.run(extract_text_from_file(docx, "doc.docx")) is None
+
+def test_parallel_extraction_matches_serial(tmp_path, monkeypatch):
+    from app.utils import pdf_parser
+
+    path = tmp_path / "long.pdf"
+    doc = fitz.open()
+    for i in range(9):
+        doc.new_page().insert_text((72, 72), f"Section {i + 1} text")
+    doc.save(path)
+    doc.close()
+
+    serial = asyncio.run(extract_text_from_file(path, "long.pdf"))
+
+    monkeypatch.setattr(pdf_parser, "PARALLEL_EXTRACTION_MIN_PAGES", 4)
+    monkeypatch.setattr(pdf_parser, "EXTRACTION_WORKERS", 2)
+    try:
+        parallel = asyncio.run(extract_text_from_file(path, "long.pdf"))
+    finally:
+        pdf_parser.shutdown_extraction_pool()
+
+    assert parallel == serial
+    offsets = pdf_parser.page_offsets(parallel)
+    assert len(offsets) == 9
+    assert parallel[offsets[4]:].startswith("Section 5 text")
+
+def test_page_ranges_cover_all_pages():
+    from app.utils.pdf_parser import _page_ranges
+    assert _page_ranges(10, 4) == [(0, 3), (3, 6), (6, 9), (9, 10)]
+    assert _page_ranges(2, 8) == [(0, 1), (1, 2)]
@@ -0,0 +1,185 @@
+# tests/test_resilience.py
+import json
+import time
+import asyncio
+import pytest
+from groq import AsyncGroq
+from langchain_core.language_models.fake_chat_models import GenericFakeChatModel
+
+from app.services import langgraph_flow, llm_cache, resilience
+from app.services.checkpoint_store import SqliteCheckpointSaver
+from app.services.llm_scheduler import llm_scheduler
+from app.services.resilience import CircuitBreaker, CircuitOpenError, DeadlineExceeded, LatencyTracker, call_with_resilience
+
+@pytest.fixture(autouse=True)
+def fast_backoff(monkeypatch):
+    monkeypatch.setattr(resilience, "LLM_RETRY_BASE_DELAY_SECONDS", 0.001)
+
+class Upstream:
+    """Scripted upstream: each call pops the next outcome (an exception, a delay in seconds, or a result)."""
+    def __init__(self, *outcomes):
+        self.outcomes = list(outcomes)
+        self.calls = 0
+
+    async def __call__(self):
+        self.calls += 1
+        outcome = self.outcomes.pop(0) if len(self.outcomes) > 1 else self.outcomes[0]
+        if isinstance(outcome, BaseException):
+            raise outcome
+        if isinstance(outcome, float):
+            await asyncio.sleep(outcome)
+            return "slow"
+        return outcome
+
+
+def test_retries_retryable_errors():
+    upstream = Upstream(ConnectionError("reset"), TimeoutError(), "ok")
+    assert asyncio.run(call_with_resilience(upstream)) == "ok"
+    assert upstream.calls == 3
+
+def test_does_not_retry_other_errors():
+    upstream = Upstream(ValueError("bad request"), "ok")
+    with pytest.raises(ValueError):
+        asyncio.run(call_with_resilience(upstream))
+    assert upstream.calls == 1
+
+def test_gives_up_after_max_retries():
+    upstream = Upstream(ConnectionError("down"))
+    with pytest.raises(ConnectionError):
+        asyncio.run(call_with_resilience(upstream, max_retries=2))
+    assert upstream.calls == 3
+
+def test_stalled_attempt_is_timed_out_and_retried():
+    upstream = Upstream(5.0, "ok")
+    started = time.monotonic()
+    assert asyncio.run(call_with_resilience(upstream, attempt_timeout=0.05)) == "ok"
+    assert time.monotonic() - started < 1
+
+def test_deadline_exceeded():
+    upstream = Upstream(5.0)
+    with pytest.raises(DeadlineExceeded):
+        asyncio.run(call_with_resilience(upstream, deadline=0.1, attempt_timeout=0.05, max_retries=10))
+
+def test_hedged_request_beats_stalled_one(monkeypatch):
+    monkeypatch.setattr(resilience, "LLM_HEDGE_MIN_DELAY_SECONDS", 0.02)
+    latency = LatencyTracker()
+    for _ in range(resilience.LLM_HEDGE_MIN_SAMPLES):
+        latency.record(0.01)
+    upstream = Upstream(5.0, "fast")
+    started = time.monotonic()
+    assert asyncio.run(call_with_resilience(upstream, hedge=True, latency=latency)) == "fast"
+    assert upstream.calls == 2
+    assert time.monotonic() - started < 1
+
+def test_circuit_breaker_opens_and_recovers():
+    now = [0.0]
+    breaker = CircuitBreaker(failure_threshold=2, reset_seconds=10, clock=lambda: now[0])
+    upstream = Upstream(ConnectionError("down"))
+
+    for _ in range(2):
+        with pytest.raises(ConnectionError):
+            asyncio.run(call_with_resilience(upstream, max_retries=0, breaker=breaker))
+    assert breaker.state == "open"
+    with pytest.raises(CircuitOpenError):
+        asyncio.run(call_with_resilience(upstream, breaker=breaker))
+    assert upstream.calls == 2 # Failed fast without calling upstream
+
+    now[0] = 11 # Half-open: one trial call goes through and closes the circuit
+    assert asyncio.run(call_with_resilience(Upstream("ok"), breaker=breaker)) == "ok"
+    assert breaker.state == "closed"
+
+class StatusError(Exception):
+    def __init__(self, status_code):
+        super().__init__(f"HTTP {status_code}")
+        self.status_code = status_code
+
+def test_circuit_breaker_ignores_client_errors():
+    breaker = CircuitBreaker(failure_threshold=2)
+    for status_code in (400, 401, 400):
+        with pytest.raises(StatusError):
+            asyncio.run(call_with_resilience(Upstream(StatusError(status_code)), breaker=breaker))
+    assert breaker.state == "closed" and breaker.failures == 0
+
+    for _ in range(2):
+        with pytest.raises(StatusError):
+            asyncio.run(call_with_resilience(Upstream(StatusError(503)), max_retries=0, breaker=breaker))
+    assert breaker.state == "open"
+
+def test_chat_reports_open_circuit(tmp_path, monkeypatch):
+    monkeypatch.setattr(langgraph_flow, "app_graph", langgraph_flow.workflow.compile(checkpointer=SqliteCheckpointSaver(tmp_path / "c.sqlite3")))
+    monkeypatch.setattr(llm_cache, "response_cache", llm_cache.LLMResponseCache(path=None))
+    monkeypatch.setattr(langgraph_flow, "chat_llm", GenericFakeChatModel(messages=iter(["Should not be called"])))
+    resilience.llm_breaker.opened_at = time.monotonic()
+    response = asyncio.run(langgraph_flow.run_chat_flow("Hello", "breaker_session"))
+    assert response == langgraph_flow.UPSTREAM_UNAVAILABLE_MESSAGE
+
+
+# --- Streaming: failures before the first token are retried without duplicating tokens ---
+
+class FlakyStreamingModel(GenericFakeChatModel):
+    failures_left: int = 1
+
+    async def _astream(self, *args, **kwargs):
+        if self.failures_left:
+            self.failures_left -= 1
+            raise ConnectionError("connection reset before first token")
+        async for chunk in super()._astream(*args, **kwargs):
+            yield chunk
+
+def test_stream_retries_before_first_token(tmp_path, monkeypatch):
+    monkeypatch.setattr(langgraph_flow, "app_graph", langgraph_flow.workflow.compile(checkpointer=SqliteCheckpointSaver(tmp_path / "c.sqlite3")))
+    monkeypatch.setattr(llm_cache, "response_cache", llm_cache.LLMResponseCache(path=None))
+    monkeypatch.setattr(langgraph_flow, "chat_llm", FlakyStreamingModel(messages=iter(["Recovered answer"])))
+
+    async def collect():
+        return [event async for event in langgraph_flow.stream_chat_flow("Hi", "flaky_session")]
+
+    events = asyncio.run(collect())
+    assert "".join(e["content"] for e in events if e["type"] == "token") == "Recovered answer"
+    assert events[-1] == {"type": "done", "response": "Recovered answer"}
+    assert llm_scheduler.active == 0 # The failed try's slot and the stream's were both released
+    assert llm_scheduler.stats()["queue_wait"]["interactive"]["requests"] >= 2
+
+
+# --- Against a local fake Groq server ---
+
+COMPLETION = {
+    "id": "chatcmpl-test", "object": "chat.completion", "created": 0, "model": "fake",
+    "choices": [{"index": 0, "message": {"role": "assistant", "content": "from the fake server"}, "finish_reason": "stop"}],
+    "usage": {"prompt_tokens": 5, "completion_tokens": 4, "total_tokens": 9},
+}
+
+async def start_fake_groq(statuses):
+    """Minimal HTTP server answering chat completions with the scripted status codes (then 200s)."""
+    seen = []
+
+    async def handle(reader, writer):
+        head = await reader.readuntil(b"\r\n\r\n")
+        length = next((int(line.split(b":")[1]) for line in head.split(b"\r\n") if line.lower().startswith(b"content-length")), 0)
+        await reader.readexactly(length)
+        status = statuses.pop(0) if statuses else 200
+        seen.append(status)
+        body = json.dumps(COMPLETION if status == 200 else {"error": {"message": "unavailable"}}).encode()
+        writer.write(
+            f"HTTP/1.1 {status} X\r\nContent-Type: application/json\r\nContent-Length: {len(body)}\r\nRetry-After: 0\r\nConnection: close\r\n\r\n".encode() + body
+        )
+        await writer.drain()
+        writer.close()
+
+    server = await asyncio.start_server(handle, "127.0.0.1", 0)
+    return server, f"http://127.0.0.1:{server.sockets[0].getsockname()[1]}", seen
+
+def test_retries_against_fake_server():
+    async def scenario():
+        server, url, seen = await start_fake_groq([503, 429])
+        async with server:
+            client = AsyncGroq(api_key="test", base_url=url, max_retries=0)
+            completion = await call_with_resilience(lambda: client.chat.completions.create(
+                messages=[{"role": "user", "content": "hi"}], model="fake",
+            ))
+            await client.close()
+        return completion, seen
+
+    completion, seen = asyncio.run(scenario())
+    assert completion.choices[0].message.content == "from the fake server"
+    assert seen == [503, 429, 200]
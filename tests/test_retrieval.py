@@ -0,0 +1,34 @@
+# tests/test_retrieval.py
+from app.services.retrieval import BM25Index, chunk_text, format_chunks
+from app.utils.pdf_parser import PAGE_BREAK
+
+def test_chunk_text_keeps_page_numbers():
+    text = PAGE_BREAK.join(["alpha " * 50, "beta " * 50, "gamma " * 50])
+    chunks = chunk_text(text, chunk_size=20, overlap=5)
+
+    assert {c.page for c in chunks} == {1, 2, 3}
+    assert all("beta" in c.text for c in chunks if c.page == 2)
+    assert [c.index for c in chunks] == list(range(len(chunks)))
+
+def test_chunk_text_without_pages():
+    chunks = chunk_text("one two three four five", chunk_size=2, overlap=0)
+    assert [c.text for c in chunks] == ["one two", "three four", "five"]
+    assert all(c.page is None for c in chunks)
+
+def test_bm25_ranks_relevant_chunk_first():
+    pages = [
+        "The tenant shall pay rent on the first day of each month.",
+        "This agreement is governed by the laws of the State of New York.",
+        "The security deposit is refundable within thirty days.",
+    ]
+    index = BM25Index(chunk_text(PAGE_BREAK.join(pages)))
+
+    chunk, score = index.search("which laws govern this agreement", k=1)[0]
+    assert chunk.page == 2
+    assert score > 0
+
+def test_select_falls_back_to_opening_chunks():
+    index = BM25Index(chunk_text(PAGE_BREAK.join(["first page", "second page", "third page"])))
+    selected = index.select("summarize", k=2)
+    assert [c.page for c in selected] == [1, 2]
+    assert format_chunks(selected).startswith("[Excerpt 1, page 1]\nfirst page")
@@ -3,12 +3,20 @@ import pytest
 from fastapi.testclient import TestClient
 from pathlib import Path
 import io
+import json
+import time
+import asyncio
 
 # Adjust import path based on your project structure
 # If running pytest from root, this should work:
 from app.main import app
 # Mock the document store for isolated testing
-from app.routes import home, assistant
+from app.routes import home, assistant, search
+from app.services import ingestion, langgraph_flow
+from app.services.checkpoint_store import SqliteCheckpointSaver
+from app.services.document_store import DocumentStore
+from app.services.extraction_cache import document_hash
+from app.services.search_index import CorpusIndex
 
 @pytest.fixture(scope="module")
 def client():
@@ -16,13 +24,20 @@ def client():
     return TestClient(app)
 
 @pytest.fixture(autouse=True)
-def reset_document_store():
-    """Clear the in-memory document store before each test."""
-    home.document_store.clear()
-    assistant.document_store.clear() # Ensure assistant uses the same store reference
-    yield # Run the test
-    home.document_store.clear()
-    assistant.document_store.clear()
+def isolated_checkpoints(tmp_path, monkeypatch):
+    """Compile the chat graph against a throwaway checkpoint database (the startup warm-up reuses it)."""
+    saver = SqliteCheckpointSaver(tmp_path / "checkpoints.sqlite3")
+    monkeypatch.setattr(langgraph_flow, "memory", saver)
+    monkeypatch.setattr(langgraph_flow, "app_graph", langgraph_flow.workflow.compile(checkpointer=saver))
+
+@pytest.fixture(autouse=True)
+def isolated_corpus_index(tmp_path, monkeypatch):
+    """Point the corpus search index at a throwaway database."""
+    index = CorpusIndex(tmp_path / "search_index.sqlite3")
+    monkeypatch.setattr(home, "corpus_index", index)
+    monkeypatch.setattr(search, "corpus_index", index)
+    monkeypatch.setattr(ingestion, "corpus_index", index)
+    return index
 
 
 def test_read_root(client: TestClient):
@@ -40,19 +55,19 @@ def test_upload_form(client: TestClient):
 def test_handle_upload_pdf_success(client: TestClient, monkeypatch):
     """Test successful PDF upload and text extraction."""
     # Mock the extract_text function to avoid actual parsing
-    async def mock_extract_text(filename: str, content: bytes):
+    async def mock_extract_text(file_path: Path, filename: str, progress=None):
          assert filename == "test.pdf"
-         assert content == b"fake pdf content"
+         assert file_path.read_bytes() == b"fake pdf content" # Extraction reads the streamed file
          return "Extracted text from PDF."
 
-    monkeypatch.setattr("app.routes.home.extract_text", mock_extract_text)
+    monkeypatch.setattr("app.services.ingestion.extract_text_from_file", mock_extract_text)
 
     file_content = b"fake pdf content"
     files = {'file': ('test.pdf', io.BytesIO(file_content), 'application/pdf')}
 
     # Expect a redirect (307 is default for TestClient, FastAPI uses 303 in code)
     # Allow redirects to follow it to the chat page.
-    response = client.post("/upload", files=files, allow_redirects=False) # Test the redirect itself first
+    response = client.post("/upload", files=files, follow_redirects=False) # Test the redirect itself first
 
     assert response.status_code == 303 # Check for 303 See Other
     assert response.headers["location"].startswith("/assistant/")
@@ -64,20 +79,137 @@ def test_handle_upload_pdf_success(client: TestClient, monkeypatch):
 
 def test_handle_upload_unsupported(client: TestClient, monkeypatch):
      """Test upload of an unsupported file type."""
-     async def mock_extract_text_empty(filename: str, content: bytes):
+     async def mock_extract_text_empty(file_path: Path, filename: str, progress=None):
           assert filename == "test.txt"
           return "" # Simulate unsupported type returning empty string
 
-     monkeypatch.setattr("app.routes.home.extract_text", mock_extract_text_empty)
+     monkeypatch.setattr("app.services.ingestion.extract_text_from_file", mock_extract_text_empty)
 
      files = {'file': ('test.txt', io.BytesIO(b"some text"), 'text/plain')}
-     response = client.post("/upload", files=files, allow_redirects=False)
+     response = client.post("/upload", files=files, follow_redirects=False)
 
      assert response.status_code == 303 # Should still redirect
      session_id = response.headers["location"].split("/")[-1]
      assert session_id in home.document_store
      assert home.document_store[session_id] == "" # Context should be empty
 
+def test_handle_upload_too_large(client: TestClient, monkeypatch):
+    """Uploads over the size limit are rejected and nothing is kept."""
+    monkeypatch.setattr(home, "MAX_UPLOAD_BYTES", 10)
+    monkeypatch.setattr(home, "UPLOAD_CHUNK_SIZE", 4)
+
+    files = {'file': ('big.txt', io.BytesIO(b"x" * 100), 'text/plain')}
+    response = client.post("/upload", files=files, follow_redirects=False)
+
+    assert response.status_code == 413
+    assert len(home.document_store) == 0
+    assert not list(home.UPLOAD_DIR.glob("*_big.txt"))
+
+def test_repeated_upload_uses_extraction_cache(client: TestClient, monkeypatch, isolated_extraction_cache):
+    """The same file uploaded twice is parsed once; both sessions get the text."""
+    calls = []
+    async def mock_extract_text(file_path: Path, filename: str, progress=None):
+        calls.append(filename)
+        return "Standard NDA text."
+
+    monkeypatch.setattr("app.services.ingestion.extract_text_from_file", mock_extract_text)
+
+    session_ids = []
+    for _ in range(2):
+        files = {'file': ('nda.pdf', io.BytesIO(b"same bytes"), 'application/pdf')}
+        response = client.post("/upload", files=files, follow_redirects=False)
+        assert response.status_code == 303
+        session_ids.append(response.headers["location"].split("/")[-1])
+
+    assert calls == ["nda.pdf"]
+    assert isolated_extraction_cache.stats() == {"hits": 1, "misses": 1}
+    assert [home.document_store[s] for s in session_ids] == ["Standard NDA text."] * 2
+    assert not list(home.UPLOAD_DIR.glob("*_nda.pdf")) # Removed after the first parse and on the cache hit
+
+def test_failed_extraction_removes_upload(client: TestClient, monkeypatch):
+    """An upload whose extraction raises is not left behind in the upload directory."""
+    async def failing_extract_text(file_path: Path, filename: str, progress=None):
+        raise ValueError("corrupt file")
+
+    monkeypatch.setattr("app.services.ingestion.extract_text_from_file", failing_extract_text)
+
+    files = {'file': ('broken.pdf', io.BytesIO(b"not a pdf"), 'application/pdf')}
+    client.post("/upload", files=files, follow_redirects=False)
+
+    assert not list(home.UPLOAD_DIR.glob("*_broken.pdf"))
+
+def test_upload_is_processed_in_background(monkeypatch):
+    """With the app's workers running, upload returns before extraction finishes and progress can be polled."""
+    release = None
+
+    async def slow_extract_text(file_path: Path, filename: str, progress=None):
+        progress(1, 2)
+        await release.wait()
+        progress(2, 2)
+        return "Background text."
+
+    monkeypatch.setattr("app.services.ingestion.extract_text_from_file", slow_extract_text)
+
+    with TestClient(app) as live_client: # Runs startup, so ingestion workers are active
+        release = live_client.portal.call(asyncio.Event)
+        files = {'file': ('big.pdf', io.BytesIO(b"pdf bytes"), 'application/pdf')}
+        response = live_client.post("/upload", files=files, follow_redirects=False)
+        assert response.status_code == 303
+        session_id = response.headers["location"].split("/")[-1]
+
+        status = live_client.get(f"/upload/status/{session_id}").json()
+        assert status["status"] == "extracting"
+        assert (status["pages_done"], status["pages_total"]) == (1, 2)
+        assert session_id not in home.document_store
+
+        live_client.portal.call(release.set)
+        for _ in range(100):
+            status = live_client.get(f"/upload/status/{session_id}").json()
+            if status["status"] == "done":
+                break
+            time.sleep(0.01)
+
+    assert status["status"] == "done"
+    assert status["characters"] == len("Background text.")
+    assert home.document_store[session_id] == "Background text."
+
+def test_upload_status_is_shared_between_workers(tmp_path, monkeypatch, isolated_document_store):
+    """A worker process that did not receive the upload reports its progress from the shared store."""
+    other_worker = DocumentStore(path=isolated_document_store.path)
+
+    async def scenario():
+        release = asyncio.Event()
+        async def slow_extract_text(file_path: Path, filename: str, progress=None):
+            progress(1, 3)
+            await release.wait()
+            return "Shared text."
+        monkeypatch.setattr("app.services.ingestion.extract_text_from_file", slow_extract_text)
+
+        queue = ingestion.IngestionQueue(workers=1)
+        queue.start()
+        upload = tmp_path / "shared.pdf"
+        upload.write_bytes(b"pdf bytes")
+        await queue.submit(ingestion.IngestionJob(session_id="shared_session", filename="shared.pdf", file_path=upload, sha256="abc"))
+        seen = []
+        for _ in range(200):
+            status = await asyncio.to_thread(other_worker.get_job, "shared_session")
+            seen.append((status["status"], status["pages_done"]))
+            if seen[-1] == ("extracting", 1):
+                release.set()
+            if status["status"] == "done":
+                break
+            await asyncio.sleep(0.01)
+        await queue.stop()
+        return seen, status
+
+    seen, status = asyncio.run(scenario())
+    assert ("extracting", 1) in seen
+    assert status["status"] == "done" and status["finished_at"] is not None
+    other_worker.close()
+
+def test_upload_status_unknown_session(client: TestClient):
+    assert client.get("/upload/status/unknown").status_code == 404
+
 def test_chat_page(client: TestClient):
     """Test accessing the chat page directly (without upload context)."""
     # Fake a session ID
@@ -105,10 +237,10 @@ async def test_handle_chat_post(client: TestClient, monkeypatch):
     home.document_store[session_id] = "Document context for chat." # Add context
 
     # Mock the langgraph flow function
-    async def mock_run_chat_flow(user_input, sid, doc_context):
+    async def mock_run_chat_flow(user_input, sid, document_key, bypass_cache=False):
         assert user_input == "Hello AI!"
         assert sid == session_id
-        assert doc_context == "Document context for chat."
+        assert document_key == document_hash("Document context for chat.")
         return "AI says hello back!"
 
     monkeypatch.setattr("app.routes.assistant.run_chat_flow", mock_run_chat_flow)
@@ -126,7 +258,7 @@ async def test_handle_chat_generate_contract(client: TestClient, monkeypatch):
     """Test triggering contract generation via chat."""
     session_id = "test_contract_session"
 
-    async def mock_run_contract_flow(contract_type, details, sid):
+    async def mock_run_contract_flow(contract_type, details, sid, bypass_cache=False):
          assert contract_type == "NDA"
          assert details == "Parties are X and Y."
          assert sid == session_id
@@ -148,3 +280,39 @@ def test_health_check(client: TestClient):
      response = client.get("/health")
      assert response.status_code == 200
      assert response.json() == {"status": "ok"}
+
+def test_handle_chat_stream(client: TestClient, monkeypatch):
+    """Test the NDJSON streaming chat endpoint."""
+    session_id = "test_stream_session"
+    home.document_store[session_id] = "Streamed document context."
+
+    async def mock_stream_chat_flow(user_input, sid, document_key, bypass_cache=False):
+        assert user_input == "Stream please"
+        assert document_key == document_hash("Streamed document context.")
+        yield {"type": "token", "content": "Hello "}
+        yield {"type": "token", "content": "there"}
+        yield {"type": "done", "response": "Hello there"}
+
+    monkeypatch.setattr("app.routes.assistant.stream_chat_flow", mock_stream_chat_flow)
+
+    response = client.post(f"/assistant/chat/{session_id}/stream", data={"user_input": "Stream please"})
+
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("application/x-ndjson")
+    events = [json.loads(line) for line in response.text.splitlines() if line]
+    assert [e["type"] for e in events] == ["token", "token", "done"]
+    assert events[-1]["response"] == "Hello there"
+
+def test_search_endpoint(client: TestClient, isolated_corpus_index):
+    """Test corpus-wide search and document deletion."""
+    isolated_corpus_index.add_document("sess1", "nda.pdf", "Governing law is the State of Delaware.")
+    home.document_store["sess1"] = "Governing law is the State of Delaware."
+
+    response = client.get("/search", params={"q": "delaware"})
+    assert response.status_code == 200
+    assert [r["doc_id"] for r in response.json()["results"]] == ["sess1"]
+
+    assert client.delete("/documents/sess1").status_code == 200
+    assert "sess1" not in home.document_store
+    assert client.get("/search", params={"q": "delaware"}).json()["results"] == []
+    assert client.delete("/documents/sess1").status_code == 404
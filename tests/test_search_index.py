@@ -0,0 +1,82 @@
+# tests/test_search_index.py
+import pytest
+
+from app.services.document_store import DocumentStore
+from app.services.search_index import CorpusIndex, _to_match_query
+from app.utils.pdf_parser import PAGE_BREAK
+
+@pytest.fixture
+def index(tmp_path):
+    return CorpusIndex(tmp_path / "index.sqlite3")
+
+def test_search_across_documents(index):
+    index.add_document("doc1", "nda.pdf", PAGE_BREAK.join(["Parties and recitals.", "Confidential Information means any data disclosed."]))
+    index.add_document("doc2", "lease.pdf", "The tenant shall pay rent monthly.")
+
+    results = index.search("confidential information")
+    assert results[0]["doc_id"] == "doc1"
+    assert results[0]["filename"] == "nda.pdf"
+    assert results[0]["page"] == 2
+    assert "[Confidential]" in results[0]["snippet"]
+    assert index.document_count() == 2
+
+def test_index_persists_and_deletes(index, tmp_path):
+    index.add_document("doc1", "lease.pdf", "Rent is due on the first of the month.")
+
+    reopened = CorpusIndex(tmp_path / "index.sqlite3")
+    assert [r["doc_id"] for r in reopened.search("rent")] == ["doc1"]
+
+    assert reopened.delete_document("doc1") is True
+    assert reopened.search("rent") == []
+    assert reopened.delete_document("doc1") is False
+
+def test_reindexing_replaces_passages(index):
+    index.add_document("doc1", "a.txt", "old wording about arbitration")
+    index.add_document("doc1", "a.txt", "new wording about mediation")
+    assert index.search("arbitration") == []
+    assert len(index.search("mediation")) == 1
+
+def test_match_query_handles_phrases_and_punctuation():
+    assert _to_match_query('"Governing Law"') == '"Governing Law"'
+    assert _to_match_query('"the so-called "Term""') == '"the so-called ""Term"""'
+    assert _to_match_query('"?!"') == ""
+    assert _to_match_query("clause 7.2 (termination)?") == '"clause" OR "7" OR "2" OR "termination"'
+    assert _to_match_query("?!") == ""
+
+def test_identical_uploads_share_passages(index):
+    index.add_document("session_a", "lease.pdf", "Rent is due on the first of the month.")
+    index.add_document("session_b", "lease copy.pdf", "Rent is due on the first of the month.")
+
+    results = index.search("rent")
+    assert len(results) == 1
+    assert results[0]["doc_id"] == "session_b" # The latest upload
+    assert sorted(results[0]["session_ids"]) == ["session_a", "session_b"]
+    assert index.document_count() == 1
+
+    assert index.delete_document("session_b") is True
+    assert [r["doc_id"] for r in index.search("rent")] == ["session_a"]
+    assert index.delete_document("session_a") is True
+    assert index.search("rent") == [] and index.document_count() == 0
+
+def test_phrase_search_keeps_stopwords(index):
+    index.add_document("doc1", "nda.pdf", "This Agreement is governed by the laws of the State of Delaware for the term of the agreement.")
+    index.add_document("doc2", "lease.pdf", "Delaware courts hear disputes; the State may intervene.")
+
+    assert [r["doc_id"] for r in index.search('"State of Delaware"')] == ["doc1"]
+    assert [r["doc_id"] for r in index.search('"term of the agreement"')] == ["doc1"]
+
+def test_expired_sessions_leave_the_search_results(index, tmp_path, monkeypatch):
+    clock = [1_000_000.0]
+    monkeypatch.setattr("app.services.document_store.time.time", lambda: clock[0])
+    store = DocumentStore(path=tmp_path / "docs.sqlite3", retention_seconds=3600)
+    store.add_expiry_listener(index.delete_documents)
+    for session_id, text in (("old", "Rent is due monthly."), ("new", "Notice must be given in writing.")):
+        store[session_id] = text
+        index.add_document(session_id, f"{session_id}.txt", text)
+        clock[0] += 3000
+
+    assert store.get("new") # Any access runs the retention sweep, which expires only "old"
+
+    assert index.search("rent") == []
+    assert [r["doc_id"] for r in index.search("notice")] == ["new"]
+    store.close()
@@ -1,73 +1,58 @@
 # tests/test_services.py
 import pytest
 import os
-from unittest.mock import patch, AsyncMock
+import asyncio
+
+import fitz
+import httpx
+from groq import AsyncGroq
+from langchain_core.messages import HumanMessage
+from langchain_groq import ChatGroq
 
 # Assuming tests are run from the root 'legalmind' directory
-from app.utils.pdf_parser import extract_text_from_pdf, extract_text_from_docx, extract_text
+from app.utils.pdf_parser import PAGE_BREAK, extract_text
 from app.services import groq_client
-# LangGraph testing is complex, focus on simpler units here
+from app.services.llm_cache import cached_ainvoke
+from benchmarks.fake_groq import FakeGroqConfig, create_app
 
 # Fixtures for sample file content
 @pytest.fixture
 def sample_pdf_bytes():
-    # In a real test suite, you might load a small test PDF file
-    # For simplicity, we'll mock the pypdf behavior
-    return b"%PDF-1.4 fake pdf content"
+    """A real two-page PDF built in memory."""
+    doc = fitz.open()
+    for i in range(2):
+        doc.new_page().insert_text((72, 72), f"Page {i + 1} text.")
+    content = doc.tobytes()
+    doc.close()
+    return content
 
 @pytest.fixture
-def sample_docx_bytes():
-    # Similarly, mock python-docx behavior or use a tiny test file
-    return b"PK\x03\x04..." # Fake DOCX header
+def fake_groq_transport():
+    """Routes Groq SDK requests to the in-process fake Groq server instead of the network."""
+    app = create_app(FakeGroqConfig(latency=0, jitter=0, tokens_per_second=0, completion_tokens=5))
+    return app, httpx.ASGITransport(app=app)
 
 # --- Test pdf_parser ---
 
-@pytest.mark.asyncio
-@patch('app.utils.pdf_parser.PdfReader')
-async def test_extract_pdf_success(mock_pdf_reader, sample_pdf_bytes):
-    """Test successful PDF text extraction using mocking."""
-    # Configure the mock PdfReader
-    mock_page = AsyncMock()
-    mock_page.extract_text.return_value = "Page 1 text. "
-    mock_reader_instance = AsyncMock()
-    mock_reader_instance.pages = [mock_page, mock_page] # Simulate 2 pages
-    mock_pdf_reader.return_value = mock_reader_instance
-
-    text = await extract_text_from_pdf(sample_pdf_bytes)
-
-    assert text == "Page 1 text. \nPage 1 text."
-    mock_pdf_reader.assert_called_once() # Check PdfReader was initialized
-
-@pytest.mark.asyncio
-@patch('app.utils.pdf_parser.PdfReader')
-async def test_extract_pdf_error(mock_pdf_reader, sample_pdf_bytes):
-    """Test PDF extraction handling errors."""
-    mock_pdf_reader.side_effect = Exception("PDF parse error")
+def test_extract_pdf_success(sample_pdf_bytes):
+    """Test successful PDF text extraction."""
+    text = asyncio.run(extract_text("contract.pdf", sample_pdf_bytes))
 
-    text = await extract_text_from_pdf(sample_pdf_bytes)
+    assert [page.strip() for page in text.split(PAGE_BREAK)] == ["Page 1 text.", "Page 2 text."]
+
+def test_extract_pdf_error():
+    """Test PDF extraction handling errors."""
+    text = asyncio.run(extract_text("broken.pdf", b"%PDF-1.4 fake pdf content"))
     assert text == "" # Should return empty string on error
 
-@pytest.mark.asyncio
-@patch('app.utils.pdf_parser.Document')
-async def test_extract_docx_success(mock_document, sample_docx_bytes):
-     """Test successful DOCX text extraction using mocking."""
-     mock_para1 = AsyncMock()
-     mock_para1.text = "Paragraph 1."
-     mock_para2 = AsyncMock()
-     mock_para2.text = "Paragraph 2."
-     mock_doc_instance = AsyncMock()
-     mock_doc_instance.paragraphs = [mock_para1, mock_para2]
-     mock_document.return_value = mock_doc_instance
-
-     text = await extract_text_from_docx(sample_docx_bytes)
-     assert text == "Paragraph 1.\nParagraph 2."
-     mock_document.assert_called_once()
-
-@pytest.mark.asyncio
-async def test_extract_unsupported_type(sample_pdf_bytes):
-     """Test the main extract function with an unsupported extension."""
-     text = await extract_text("document.txt", b"some text content")
-     assert text == ""
+def test_extract_txt_success():
+    text = asyncio.run(extract_text("notes.txt", b"Clause 1. Payment terms."))
+    assert text == "Clause 1. Payment terms."
+
+def test_extract_unsupported_type():
+    """Test the main extract function with an unsupported extension (DOCX is not supported)."""
+    text = asyncio.run(extract_text("document.docx", b"PK\x03\x04..."))
+    assert text is None
 
 # --- Test groq_client ---
 
@@ -95,24 +80,45 @@ def test_get_groq_chat_llm_initialization():
      assert llm.model_name == groq_client.MODEL_NAME
 
 
-# Example test for direct async Groq call (requires mocking the API call itself)
-@pytest.mark.asyncio
-@patch('app.services.groq_client.async_groq_client.chat.completions.create', new_callable=AsyncMock)
-async def test_get_groq_completion_mocked(mock_create_completion):
-     """Test the direct async Groq call helper with mocking."""
-     # Configure the mock response
-     mock_choice = AsyncMock()
-     mock_choice.message.content = "Mocked AI Response"
-     mock_completion_result = AsyncMock()
-     mock_completion_result.choices = [mock_choice]
-     mock_create_completion.return_value = mock_completion_result
-
-     prompt = "What is the capital of France?"
-     response = await groq_client.get_groq_completion(prompt)
-
-     assert response == "Mocked AI Response"
-     mock_create_completion.assert_called_once()
-     # You could add more assertions here to check the messages sent to the mock
+def test_missing_api_key_is_reported_once(monkeypatch, caplog):
+     """Without a key, get_chat_llm returns None without retrying initialization or logging on every call."""
+     monkeypatch.setattr(groq_client, "API_KEY", None)
+     monkeypatch.setattr(groq_client, "chat_llm", None)
+     monkeypatch.setattr(groq_client, "_chat_llm_unavailable", False)
+     monkeypatch.setattr(groq_client, "get_groq_chat_llm", lambda: pytest.fail("initialization retried"))
+
+     with caplog.at_level("WARNING", logger=groq_client.__name__):
+         assert groq_client.get_chat_llm() is None
+         assert groq_client.get_chat_llm() is None
+
+     assert [r.levelname for r in caplog.records if r.name == groq_client.__name__] == ["WARNING"]
+
+
+def test_get_groq_completion_against_fake_server(fake_groq_transport, monkeypatch):
+     """Test the direct async Groq call helper end to end against the fake Groq server."""
+     app, transport = fake_groq_transport
+     client = AsyncGroq(api_key="test", base_url="http://fake-groq", http_client=httpx.AsyncClient(transport=transport))
+     monkeypatch.setattr(groq_client, "async_groq_client", client)
+
+     response = asyncio.run(groq_client.get_groq_completion("What is the capital of France?"))
+
+     assert len(response.split()) == 5
+     assert app.state.fake.counters["requests"] == 1
+
+
+def test_chat_model_streams_from_fake_server(fake_groq_transport):
+     """The LangChain chat model path (streamed SSE) works against the fake Groq server."""
+     app, transport = fake_groq_transport
+     llm = ChatGroq(
+         groq_api_key="test", groq_api_base="http://fake-groq", model_name="llama3-8b-8192", max_retries=0,
+         http_async_client=httpx.AsyncClient(transport=transport),
+     )
+
+     response = asyncio.run(cached_ainvoke(llm, [HumanMessage(content="Summarize the lease.")], bypass=True))
+
+     assert len(response.content.split()) == 5
+     assert response.usage_metadata["output_tokens"] == 5
+     assert app.state.fake.counters["streamed"] == 1
 
 
 # --- Test contract_templates ---
@@ -0,0 +1,95 @@
+# tests/test_single_flight.py
+import asyncio
+from langchain_core.language_models.fake_chat_models import GenericFakeChatModel
+
+from app.services import langgraph_flow, llm_cache
+from app.services.checkpoint_store import SqliteCheckpointSaver
+from app.services.single_flight import SingleFlight
+
+def slow_call(result, calls, delay=0.05):
+    """Builds an upstream call that records itself and takes a while to answer."""
+    async def call(publish):
+        calls.append(result)
+        await asyncio.sleep(delay)
+        return result
+    return call
+
+
+def test_concurrent_identical_requests_share_one_call():
+    flights = SingleFlight()
+    calls = []
+
+    async def scenario():
+        call = slow_call("answer", calls)
+        return await asyncio.gather(*(flights.run("same", call) for _ in range(5)))
+
+    assert asyncio.run(scenario()) == ["answer"] * 5
+    assert calls == ["answer"]
+    assert flights.stats() == {"calls": 1, "coalesced": 4, "in_flight": 0}
+
+def test_different_keys_are_not_coalesced():
+    flights = SingleFlight()
+    calls = []
+
+    async def scenario():
+        return await asyncio.gather(flights.run("a", slow_call("a", calls)), flights.run("b", slow_call("b", calls)))
+
+    assert asyncio.run(scenario()) == ["a", "b"]
+    assert sorted(calls) == ["a", "b"]
+
+def test_errors_reach_every_caller_and_are_not_remembered():
+    flights = SingleFlight()
+
+    async def failing(publish):
+        await asyncio.sleep(0.01)
+        raise RuntimeError("upstream down")
+
+    async def scenario():
+        return await asyncio.gather(flights.run("k", failing), flights.run("k", failing), return_exceptions=True)
+
+    results = asyncio.run(scenario())
+    assert all(isinstance(r, RuntimeError) for r in results)
+    assert flights.in_flight() == 0
+
+def test_call_survives_cancelled_leader():
+    flights = SingleFlight()
+    calls = []
+
+    async def scenario():
+        call = slow_call("answer", calls)
+        leader = asyncio.create_task(flights.run("k", call))
+        await asyncio.sleep(0)
+        follower = asyncio.create_task(flights.run("k", call))
+        await asyncio.sleep(0)
+        leader.cancel()
+        return await follower
+
+    assert asyncio.run(scenario()) == "answer"
+    assert calls == ["answer"]
+
+
+class SlowStreamingModel(GenericFakeChatModel):
+    """Fake chat model that pauses between tokens so concurrent requests overlap."""
+    async def _astream(self, *args, **kwargs):
+        async for chunk in super()._astream(*args, **kwargs):
+            await asyncio.sleep(0.01)
+            yield chunk
+
+def test_streaming_consumers_share_tokens(tmp_path, monkeypatch):
+    graph = langgraph_flow.workflow.compile(checkpointer=SqliteCheckpointSaver(tmp_path / "checkpoints.sqlite3"))
+    monkeypatch.setattr(langgraph_flow, "app_graph", graph)
+    monkeypatch.setattr(llm_cache, "response_cache", llm_cache.LLMResponseCache(path=None))
+    monkeypatch.setattr(llm_cache, "llm_flights", SingleFlight())
+    llm = SlowStreamingModel(messages=iter(["Only one upstream answer", "A second answer"]))
+    monkeypatch.setattr(langgraph_flow, "chat_llm", llm)
+
+    async def collect(session_id):
+        return [event async for event in langgraph_flow.stream_chat_flow("What is an NDA?", session_id)]
+
+    async def scenario():
+        return await asyncio.gather(collect("double_submit_a"), collect("double_submit_b"))
+
+    for events in asyncio.run(scenario()):
+        assert "".join(e["content"] for e in events if e["type"] == "token") == "Only one upstream answer"
+        assert events[-1] == {"type": "done", "response": "Only one upstream answer"}
+    assert llm_cache.llm_flights.stats()["coalesced"] == 1
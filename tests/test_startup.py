@@ -0,0 +1,30 @@
+# tests/test_startup.py
+import os
+import sys
+import json
+import subprocess
+from pathlib import Path
+
+from benchmarks.bench_startup import HEAVY_MODULES
+
+REPO_ROOT = Path(__file__).resolve().parent.parent
+
+BOOT_PROBE = f"""
+import json, sys
+from fastapi.testclient import TestClient
+from app.main import app
+client = TestClient(app)
+status = client.get("/health").status_code
+metrics_status = client.get("/metrics").status_code
+print(json.dumps({{"status": status, "metrics_status": metrics_status, "heavy_modules": [m for m in {HEAVY_MODULES!r} if m in sys.modules]}}))
+"""
+
+def test_worker_boots_lazily_without_groq_key():
+    """Importing the app and serving /health or /metrics must not need a key or load the LLM/PDF stack."""
+    env = {key: value for key, value in os.environ.items() if key != "GROQ_API_KEY"}
+    env["WARM_UP_ON_STARTUP"] = "false"
+    result = subprocess.run([sys.executable, "-c", BOOT_PROBE], cwd=REPO_ROOT, env=env, capture_output=True, text=True, timeout=60)
+
+    assert result.returncode == 0, result.stderr
+    probe = json.loads(result.stdout.strip().splitlines()[-1])
+    assert probe == {"status": 200, "metrics_status": 200, "heavy_modules": []}
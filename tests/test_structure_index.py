@@ -0,0 +1,117 @@
+# tests/test_structure_index.py
+import asyncio
+import pytest
+from langchain_core.language_models.fake_chat_models import GenericFakeChatModel
+from langchain_core.messages import AIMessage, HumanMessage
+
+from app.services import langgraph_flow
+from app.services.structure_index import StructureIndex, format_spans
+from app.utils.pdf_parser import PAGE_BREAK
+
+AGREEMENT = PAGE_BREAK.join([
+    """MASTER SERVICES AGREEMENT
+This Agreement is made between ACME Corp (the "Company") and Beta LLC (the "Provider").
+
+TABLE OF CONTENTS
+1. Definitions ........ 1
+7. Confidentiality ........ 2
+
+1. DEFINITIONS
+"Confidential Information" means any non-public information disclosed by either party.
+
+"Services" shall mean the services described in Exhibit A.
+
+2. Services
+2.1 Scope. Provider shall perform the Services.
+1. The Provider shall keep records of the Services.
+""",
+    """7. Confidentiality
+7.1 Obligations. Each party shall protect Confidential Information.
+7.2 Exceptions. Information that is already public is excluded.
+Section 7.2 of this Agreement survives termination.
+8. GOVERNING LAW
+This Agreement is governed by the laws of Delaware.
+
+EXHIBIT A - Statement of Work
+Provider will build a website.
+""",
+])
+
+@pytest.fixture
+def structure():
+    return StructureIndex(AGREEMENT)
+
+def _text(span):
+    return AGREEMENT[span.start:span.end]
+
+def test_sections_nest_and_skip_contents_and_list_items(structure):
+    assert sorted(structure.sections) == ["1", "2", "2.1", "7", "7.1", "7.2", "8"]
+    section_7 = structure.sections["7"]
+    assert section_7.page == 2 and section_7.title == "Confidentiality"
+    assert "7.2 Exceptions" in _text(section_7) and "GOVERNING LAW" not in _text(section_7) # Body, not the contents entry
+    assert _text(structure.sections["7.2"]).startswith("7.2 Exceptions") and "survives termination" in _text(structure.sections["7.2"])
+    assert "keep records" in _text(structure.sections["2.1"]) # A numbered list item is not a new section
+
+def test_definitions_and_exhibits(structure):
+    assert sorted(structure.definitions) == ["company", "confidential information", "provider", "services"]
+    assert _text(structure.definitions["confidential information"]).startswith('"Confidential Information" means')
+    assert _text(structure.definitions["company"]).strip().endswith('(the "Provider").')
+    exhibit = structure.exhibits["exhibit a"]
+    assert exhibit.page == 2 and "build a website" in _text(exhibit)
+    assert "build a website" not in _text(structure.sections["8"]) # Sections stop where the exhibits begin
+
+def test_lookup_resolves_references_in_questions(structure):
+    assert [s.key for s in structure.lookup("What does section 7.2 say?")] == ["7.2"]
+    assert [s.key for s in structure.lookup("Summarize exhibit a")] == ["Exhibit A"]
+    assert structure.lookup("Who pays for travel?") == []
+
+@pytest.mark.parametrize("question, expected", [
+    ("Where is 'Confidential Information' defined?", ["Confidential Information"]),
+    ("What is the meaning of confidential information here?", ["Confidential Information"]),
+    ("What is the definition of Services?", ["Services"]),
+    ("What does 'Provider' mean?", ["Provider"]),
+    ("What is meant by the Company?", ["Company"]),
+    # Naming a defined term is not asking for its definition
+    ("What does the Provider mean to do about confidential information?", []),
+    ("Can the Provider share Confidential Information, meaning with affiliates?", []),
+    ("Which Services are defined in Exhibit A?", []),
+])
+def test_definitions_need_an_explicit_question(structure, question, expected):
+    assert [s.key for s in structure.lookup_definitions(question)] == expected
+
+def test_format_spans_labels_and_fits_budget(structure):
+    rendered = format_spans(AGREEMENT, structure.lookup("Compare section 7.1 and section 8"), max_tokens=40)
+    assert rendered.startswith("[Section 7.1, page 2]\n7.1 Obligations")
+    assert "[Section 8, page 2]" in rendered
+
+def test_chat_injects_only_the_named_section(monkeypatch, isolated_document_store):
+    sent = []
+    async def fake_ainvoke(llm, messages, **kwargs):
+        sent.append(messages)
+        return AIMessage(content="Public information is excluded.")
+    monkeypatch.setattr(langgraph_flow, "cached_ainvoke", fake_ainvoke)
+    monkeypatch.setattr(langgraph_flow, "chat_llm", GenericFakeChatModel(messages=iter([])))
+    isolated_document_store.put("structure_session", AGREEMENT)
+    state = {"messages": [HumanMessage(content="What does section 7.2 say?")], "document_key": langgraph_flow.document_hash(AGREEMENT)}
+
+    asyncio.run(langgraph_flow.call_llm(state, {"configurable": {"thread_id": "structure_session"}}))
+
+    prompt = sent[-1][-1].content
+    assert "[Section 7.2, page 2]" in prompt and "already public" in prompt
+    assert "build a website" not in prompt and "Confidential Information\" means" not in prompt
+
+def test_definition_is_added_to_retrieved_excerpts(monkeypatch, isolated_document_store):
+    sent = []
+    async def fake_ainvoke(llm, messages, **kwargs):
+        sent.append(messages)
+        return AIMessage(content="It covers non-public business information.")
+    monkeypatch.setattr(langgraph_flow, "cached_ainvoke", fake_ainvoke)
+    monkeypatch.setattr(langgraph_flow, "chat_llm", GenericFakeChatModel(messages=iter([])))
+    isolated_document_store.put("definition_session", AGREEMENT)
+    state = {"messages": [HumanMessage(content="What does 'Confidential Information' mean for the exceptions?")], "document_key": langgraph_flow.document_hash(AGREEMENT)}
+
+    asyncio.run(langgraph_flow.call_llm(state, {"configurable": {"thread_id": "definition_session"}}))
+
+    prompt = sent[-1][-1].content
+    assert prompt.index('[Definition of "Confidential Information"') < prompt.index("[Excerpt")
+    assert "already public" in prompt # Retrieval still runs alongside the definition
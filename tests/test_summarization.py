@@ -0,0 +1,76 @@
+# tests/test_summarization.py
+import asyncio
+import itertools
+import pytest
+from langchain_core.language_models.fake_chat_models import GenericFakeChatModel
+from langchain_core.messages import AIMessage, HumanMessage
+
+from app.services import langgraph_flow, llm_cache, summarization
+from app.services.checkpoint_store import SqliteCheckpointSaver
+from app.services.extraction_cache import ExtractionCache
+from app.utils.pdf_parser import PAGE_BREAK
+
+@pytest.fixture(autouse=True)
+def isolated_caches(tmp_path, monkeypatch):
+    monkeypatch.setattr(summarization, "extraction_cache", ExtractionCache(tmp_path / "extraction_cache"))
+    monkeypatch.setattr(llm_cache, "response_cache", llm_cache.LLMResponseCache(path=None))
+
+@pytest.fixture
+def recorded_calls(monkeypatch):
+    """Replaces the LLM call with one that records prompts and answers with a short summary."""
+    calls = []
+    async def fake_ainvoke(llm, messages, **kwargs):
+        calls.append(messages[-1].content)
+        await asyncio.sleep(0)
+        return AIMessage(content=f"summary {len(calls)}")
+    monkeypatch.setattr(summarization, "cached_ainvoke", fake_ainvoke)
+    return calls
+
+def _long_document(pages=12, words_per_page=300):
+    return PAGE_BREAK.join(" ".join(f"clause{p}" for _ in range(words_per_page)) for p in range(1, pages + 1))
+
+def test_split_pages_packs_whole_pages():
+    chunks = summarization.split_pages(_long_document(pages=6, words_per_page=100), max_tokens=450)
+    assert [label for label, _ in chunks] == ["Pages 1-2", "Pages 3-4", "Pages 5-6"]
+    assert "clause3" in chunks[1][1] and "clause2" not in chunks[1][1]
+
+def test_split_pages_cuts_oversized_pages_and_labels_parts():
+    chunks = summarization.split_pages(" ".join(["word"] * 1000), max_tokens=300)
+    assert len(chunks) >= 4
+    assert chunks[0][0] == "Part 1"
+    assert sum(len(text.split()) for _, text in chunks) == 1000
+
+def test_summarize_document_reuses_partial_summaries(recorded_calls):
+    llm = type("Llm", (), {"model_name": "llama3-8b-8192"})()
+    text = _long_document(pages=12, words_per_page=1000)
+
+    summary = asyncio.run(summarization.summarize_document(llm, text, max_tokens=20, concurrency=3))
+    map_calls = sum(1 for prompt in recorded_calls if "of the document:" in prompt)
+    assert map_calls >= 3
+    assert summary.startswith("summary")
+
+    recorded_calls.clear()
+    asyncio.run(summarization.summarize_document(llm, text, max_tokens=20))
+    assert recorded_calls and not any("of the document:" in prompt for prompt in recorded_calls) # Only merges rerun
+
+def test_whole_document_questions_are_map_reduced(tmp_path, monkeypatch, isolated_document_store):
+    monkeypatch.setattr("app.utils.tokens.LLM_CONTEXT_WINDOW", 2048)
+    monkeypatch.setattr(langgraph_flow, "app_graph", langgraph_flow.workflow.compile(checkpointer=SqliteCheckpointSaver(tmp_path / "checkpoints.sqlite3")))
+    fake_llm = GenericFakeChatModel(messages=itertools.cycle(["Short summary."]))
+    monkeypatch.setattr(langgraph_flow, "chat_llm", fake_llm)
+    config = {"configurable": {"thread_id": "long_filing"}}
+    document = _long_document(pages=20, words_per_page=400)
+    isolated_document_store.put("long_filing", document)
+    key = isolated_document_store.document_key("long_filing")
+
+    asyncio.run(langgraph_flow.run_chat_flow("Summarize this filing", "long_filing", key))
+    state = asyncio.run(langgraph_flow.app_graph.aget_state(config)).values
+    assert "Short summary." in state["document_summary"]
+
+    asyncio.run(langgraph_flow.run_chat_flow("What does clause7 say?", "long_filing", key))
+    assert asyncio.run(langgraph_flow.app_graph.aget_state(config)).values["document_summary"] is None
+
+def test_needs_whole_document():
+    assert summarization.needs_whole_document("Can you summarize the lease?")
+    assert summarization.needs_whole_document("Give me an overview of the key terms")
+    assert not summarization.needs_whole_document("Who is the landlord?")
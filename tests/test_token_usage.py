@@ -0,0 +1,114 @@
+# tests/test_token_usage.py
+import asyncio
+import pytest
+from langchain_core.messages import AIMessage, HumanMessage, SystemMessage
+
+from app.services import langgraph_flow, llm_cache, token_usage
+from app.services.checkpoint_store import SqliteCheckpointSaver
+from app.services.history import fit_to_budget, message_tokens
+from app.services.token_usage import TokenUsageLedger, usage_scope
+from app.utils import tokens
+from app.utils.tokens import estimate_tokens, prompt_budget, truncate_to_tokens
+
+@pytest.fixture
+def ledger(monkeypatch):
+    ledger = TokenUsageLedger()
+    monkeypatch.setattr(token_usage, "token_usage", ledger)
+    return ledger
+
+@pytest.fixture
+def isolated_flow(tmp_path, monkeypatch):
+    graph = langgraph_flow.workflow.compile(checkpointer=SqliteCheckpointSaver(tmp_path / "checkpoints.sqlite3"))
+    monkeypatch.setattr(langgraph_flow, "app_graph", graph)
+    monkeypatch.setattr(llm_cache, "response_cache", llm_cache.LLMResponseCache(path=None))
+
+class UsageReportingLLM:
+    """Async chat model stand-in that reports usage like Groq does and records prompts."""
+    model_name = "llama3-8b-8192"
+
+    def __init__(self):
+        self.calls = []
+
+    async def ainvoke(self, messages, *args, **kwargs):
+        self.calls.append(messages)
+        return AIMessage(content="ok", usage_metadata={"input_tokens": 120, "output_tokens": 30, "total_tokens": 150})
+
+
+# --- Estimation and budgets ---
+
+def test_estimate_tokens():
+    assert estimate_tokens("") == 0
+    assert estimate_tokens("The tenant pays rent.") == 5
+    assert estimate_tokens("confidentiality") > estimate_tokens("rent")
+    assert estimate_tokens("word " * 100) == 100
+
+def test_truncate_to_tokens():
+    text = "one two three four five six"
+    assert truncate_to_tokens(text, 3) == "one two three"
+    assert truncate_to_tokens(text, 100) == text
+    assert truncate_to_tokens(text, 0) == ""
+
+def test_prompt_budget_per_model(monkeypatch):
+    assert prompt_budget("llama3-8b-8192", completion_reserve=1000) == 7192
+    assert prompt_budget("mixtral-8x7b-32768", completion_reserve=1000) == 31768
+    assert prompt_budget("unknown-model", completion_reserve=0) == tokens.DEFAULT_CONTEXT_WINDOW
+    monkeypatch.setattr(tokens, "LLM_CONTEXT_WINDOW", 4096)
+    assert prompt_budget("mixtral-8x7b-32768", completion_reserve=1000) == 3096
+
+def test_fit_to_budget_drops_old_turns_then_truncates():
+    system = SystemMessage(content="system prompt")
+    history = [HumanMessage(content="old " * 50), AIMessage(content="older answer " * 50)]
+    question = HumanMessage(content="question " * 500)
+    fitted = fit_to_budget([system] + history + [question], budget=200)
+    assert fitted[0] is system
+    assert len(fitted) == 2 # History dropped before the question is cut
+    assert sum(message_tokens(m) for m in fitted) <= 200
+    assert fit_to_budget([system, question], budget=10_000) == [system, question]
+
+
+# --- Accounting ---
+
+def test_ledger_totals_per_session_and_endpoint(ledger):
+    with usage_scope("s1", "chat"):
+        ledger.record(100, 20)
+        ledger.record(50, 10)
+    with usage_scope("s2", "contract"):
+        ledger.record(10, 5)
+    ledger.record(1, 1) # Outside any scope
+
+    assert ledger.session("s1") == {"calls": 2, "prompt_tokens": 150, "completion_tokens": 30}
+    assert ledger.endpoint("contract") == {"calls": 1, "prompt_tokens": 10, "completion_tokens": 5}
+    assert ledger.endpoint("other")["calls"] == 1
+    assert ledger.stats()["totals"] == {"calls": 4, "prompt_tokens": 161, "completion_tokens": 36}
+
+def test_ledger_is_bounded():
+    ledger = TokenUsageLedger(max_sessions=2)
+    for session_id in ("a", "b", "c"):
+        ledger.record(1, 1, session_id=session_id)
+    assert ledger.stats()["sessions"] == 2
+    assert ledger.session("a")["calls"] == 0
+
+def test_chat_and_contract_usage_is_recorded(ledger, isolated_flow, monkeypatch):
+    llm = UsageReportingLLM()
+    monkeypatch.setattr(langgraph_flow, "chat_llm", llm)
+
+    asyncio.run(langgraph_flow.run_chat_flow("What is an NDA?", "usage_session"))
+    assert ledger.session("usage_session") == {"calls": 1, "prompt_tokens": 120, "completion_tokens": 30}
+    assert ledger.endpoint("chat")["calls"] == 1
+
+    asyncio.run(langgraph_flow.run_contract_flow("NDA", "Parties: A and B", "usage_session"))
+    assert ledger.endpoint("contract")["calls"] == len(llm.calls) - 1
+
+def test_call_llm_keeps_prompt_within_model_budget(isolated_flow, monkeypatch, isolated_document_store):
+    monkeypatch.setattr(tokens, "LLM_CONTEXT_WINDOW", 2048)
+    llm = UsageReportingLLM()
+    monkeypatch.setattr(langgraph_flow, "chat_llm", llm)
+    document = " ".join(f"clause {i} requires notice before termination." for i in range(5000))
+    isolated_document_store.put("budget_session", document)
+    for turn in range(5):
+        asyncio.run(langgraph_flow.run_chat_flow(f"What notice does termination require? ({turn})", "budget_session", isolated_document_store.document_key("budget_session")))
+
+    budget = prompt_budget(llm.model_name)
+    for messages in llm.calls:
+        assert sum(message_tokens(m) for m in messages) <= budget
+    assert "excerpts from the document" in llm.calls[-1][-1].content